@@ -0,0 +1,127 @@
+# benchmarks/donnees_synthetiques.py
+"""Jeux de données synthétiques au format exact des sources brutes lues par `main.py`.
+
+Les données réelles (`data/brutes/`) étant confidentielles, ce module produit
+des fichiers de même schéma et de taille paramétrable :
+
+- CSV des CCF par segment (`;`, `note_ref`, `cod_prd_ref` "2009T1", `Indicateur_moyen_Brut` à virgule décimale) ;
+- historique macro Excel (`date_dernier_mois` "2009-03", PIB, IPL, TCH, Inflation et différences) ;
+- feuille de scénarios Excel (`date` + colonnes `PIB_CENT`, `IPL_PESS`, ...).
+
+Usage : `python -m benchmarks.donnees_synthetiques --dossier /tmp/ccf --trimestres 120 --segments 10`
+"""
+import os
+import argparse
+import numpy as np
+import pandas as pd
+
+from src.ingestion import CHEMIN_SEGMENTS, CHEMIN_MACRO, CHEMIN_SCENARIOS
+
+SCENARIOS_REFERENCE = ["CENT", "PESS", "OPT"]
+# Choc moyen appliqué à chaque scénario de référence (en écarts-types)
+CHOCS_SCENARIOS = {"CENT": 0.0, "PESS": -1.0, "OPT": 0.5}
+FIN_HISTORIQUE = "2023Q4"
+
+
+def noms_scenarios(n_scenarios):
+    """CENT, PESS, OPT puis S04, S05, ... pour les chemins supplémentaires."""
+    return (SCENARIOS_REFERENCE + [f"S{k:02d}" for k in range(4, n_scenarios + 1)])[:n_scenarios]
+
+
+def _trimestres(n_trimestres, fin=FIN_HISTORIQUE):
+    return pd.period_range(end=pd.Period(fin, freq="Q"), periods=n_trimestres, freq="Q")
+
+
+def _code_trimestre(periodes):
+    return [f"{p.year}T{p.quarter}" for p in periodes]
+
+
+def _trajectoires_macro(n, rng, choc=0.0):
+    """PIB (croissance), IPL (indice de prix, intégré), TCH (chômage) et inflation sur `n` trimestres."""
+    pib = 1.0 + 0.3 * choc + np.zeros(n)
+    for t in range(1, n):
+        pib[t] = 0.6 * pib[t - 1] + 0.4 * (1.0 + 0.3 * choc) + rng.normal(0, 0.5)
+    ipl = 100 + np.cumsum(0.4 + 0.8 * choc + rng.normal(0, 1.0, n))
+    tch = 8.0 - 0.5 * choc + np.cumsum(rng.normal(0, 0.15, n)) - 0.3 * (pib - pib.mean())
+    inflation = 2.0 + 0.3 * choc + np.cumsum(rng.normal(0, 0.2, n)) * 0.5
+    return {"PIB": pib, "IPL": ipl, "TCH": tch, "Inflation": inflation}
+
+
+def generer_macro_historique(n_trimestres=60, fin=FIN_HISTORIQUE, graine=0):
+    """Historique macro trimestriel au format du classeur source (une ligne par trimestre)."""
+    rng = np.random.default_rng(graine)
+    periodes = _trimestres(n_trimestres, fin)
+    df = pd.DataFrame({"date_dernier_mois": [f"{p.year}-{p.quarter * 3:02d}" for p in periodes]})
+    for nom, valeurs in _trajectoires_macro(n_trimestres, rng).items():
+        df[nom] = valeurs
+    for nom in ["PIB", "TCH", "Inflation"]:
+        df[f"{nom}_diff1"] = df[nom].diff()
+    return df
+
+
+def generer_segments(macro, n_segments=5, decalage=4, graine=0, segments_tendance=(2, 3)):
+    """CCF par segment, liés au PIB et au chômage retardés, avec virgule décimale.
+
+    Les segments de `segments_tendance` ont une dérive lente (non stationnaires),
+    comme ceux auxquels `main.py` applique le filtre HP. L'historique des segments
+    commence `decalage` trimestres après celui des variables macro.
+    """
+    rng = np.random.default_rng(graine + 1)
+    periodes = [pd.Period(d, freq="M").asfreq("Q") for d in macro["date_dernier_mois"]][decalage:]
+    pib = macro["PIB"].to_numpy()[decalage - 1:-1] if decalage else macro["PIB"].to_numpy()
+    tch = macro["TCH"].diff().fillna(0).to_numpy()[decalage:]
+    n = len(periodes)
+    lignes = []
+    for i in range(1, n_segments + 1):
+        bruit = np.zeros(n)
+        for t in range(1, n):
+            bruit[t] = 0.5 * bruit[t - 1] + rng.normal(0, 0.02)
+        tendance = 0.002 * np.arange(n) if i in segments_tendance else 0.0
+        ccf = 0.25 + 0.05 * (i % 7) - 0.02 * (pib - pib.mean()) + 0.03 * tch + tendance + bruit
+        ccf = np.clip(ccf, 0.0, 1.0)
+        lignes.append(pd.DataFrame({
+            "note_ref": i,
+            "cod_prd_ref": _code_trimestre(periodes),
+            "Indicateur_moyen_Brut": [f"{v:.6f}".replace(".", ",") for v in ccf],
+        }))
+    return pd.concat(lignes, ignore_index=True)
+
+
+def generer_scenarios(n_trimestres=16, n_scenarios=3, debut=None, graine=0):
+    """Feuille de scénarios : une date de fin de trimestre et 4 colonnes par scénario."""
+    rng = np.random.default_rng(graine + 2)
+    debut = debut or (pd.Period(FIN_HISTORIQUE, freq="Q") + 1).start_time
+    df = pd.DataFrame({"date": pd.date_range(debut, periods=n_trimestres, freq="QE")})
+    for scenario in noms_scenarios(n_scenarios):
+        choc = CHOCS_SCENARIOS.get(scenario, rng.uniform(-1.0, 1.0))
+        for nom, valeurs in _trajectoires_macro(n_trimestres, rng, choc).items():
+            df[f"{nom}_{scenario}"] = valeurs
+    return df
+
+
+def ecrire_jeu(dossier=".", n_trimestres=60, n_segments=5, n_trimestres_scenario=16, n_scenarios=3, graine=0):
+    """Écrit les trois sources sous `dossier`, aux chemins lus par `src.ingestion` ; retourne ces chemins."""
+    chemins = {nom: os.path.join(dossier, chemin) for nom, chemin in
+               [("segments", CHEMIN_SEGMENTS), ("macro", CHEMIN_MACRO), ("scenarios", CHEMIN_SCENARIOS)]}
+    for chemin in chemins.values():
+        os.makedirs(os.path.dirname(chemin), exist_ok=True)
+
+    macro = generer_macro_historique(n_trimestres, graine=graine)
+    macro.to_excel(chemins["macro"], index=False)
+    generer_segments(macro, n_segments, graine=graine).to_csv(chemins["segments"], sep=";", index=False)
+    generer_scenarios(n_trimestres_scenario, n_scenarios, graine=graine).to_excel(chemins["scenarios"], index=False)
+    return chemins
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Génère un jeu de données CCF synthétique")
+    parser.add_argument("--dossier", default=".", help="Racine du projet cible (data/ y est créé)")
+    parser.add_argument("--trimestres", type=int, default=60, help="Trimestres d'historique macro")
+    parser.add_argument("--segments", type=int, default=5)
+    parser.add_argument("--trimestres-scenario", type=int, default=16)
+    parser.add_argument("--scenarios", type=int, default=3, help="Nombre de scénarios (CENT, PESS, OPT, S04, ...)")
+    parser.add_argument("--graine", type=int, default=0)
+    args = parser.parse_args()
+    for nom, chemin in ecrire_jeu(args.dossier, args.trimestres, args.segments, args.trimestres_scenario,
+                                  args.scenarios, args.graine).items():
+        print(f"📝 {nom} : {chemin}")
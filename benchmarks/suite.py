@@ -0,0 +1,255 @@
+# benchmarks/suite.py
+"""Suite de benchmarks du pipeline CCF sur données synthétiques, comparée à des temps de référence.
+
+Pour chaque taille de `TAILLES`, un jeu synthétique est écrit dans un dossier
+temporaire (caches et modèles y repartent de zéro), puis chaque étape mesurée
+est répétée à froid : les caches `outputs/cache` sont vidés avant chaque
+répétition. Le temps médian est comparé à `benchmarks/baselines.json`.
+
+Usage :
+    python -m benchmarks.suite                          # petit + moyen, comparaison aux références
+    python -m benchmarks.suite --tailles grand --jobs -1
+    python -m benchmarks.suite --enregistrer            # met à jour les références
+"""
+import os
+import io
+import sys
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+from contextlib import redirect_stdout
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.donnees_synthetiques import ecrire_jeu, noms_scenarios
+from src.ingestion import charger_segments, charger_macro_historique, charger_scenarios
+from src.hp_filter import filtre_hp
+from src.stationarity import segments_non_stationnaires, tester_stationnarite_grille, appliquer_hp_filter_segments
+from src.preprocessing import partitionner, substituer_cycle_hp, fusionner_macro
+from src.modeling import entrainer_modeles_par_segment, preparer_donnees_segment
+from src.partitions import executer_par_partition
+from src.scenario_projection import predict_all_models_scenarios
+from src.monte_carlo import projeter_monte_carlo
+from src.plotting import FileFigures
+from src.instrumentation import JOURNAL, mesurer
+from src.utils import lire_json, ecrire_json_atomique
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+# Au-delà de ce rapport au temps de référence, l'étape est signalée en régression (en deçà de l'inverse, en gain)
+TOLERANCE = 1.3
+
+TAILLES = {
+    "petit": {"n_trimestres": 60, "n_segments": 5, "n_trimestres_scenario": 16, "n_scenarios": 3, "n_chemins": 1000},
+    "moyen": {"n_trimestres": 120, "n_segments": 10, "n_trimestres_scenario": 24, "n_scenarios": 6,
+              "n_chemins": 5000},
+    "grand": {"n_trimestres": 240, "n_segments": 20, "n_trimestres_scenario": 40, "n_scenarios": 12,
+              "n_chemins": 20000},
+}
+
+
+# === Préparation (non mesurée) ===
+
+def preparer_contexte(taille, graine=0):
+    """Écrit le jeu synthétique dans le dossier courant et reproduit les étapes 1 à 7 de `main.py`."""
+    ecrire_jeu(".", graine=graine, **{k: v for k, v in taille.items() if k != "n_chemins"})
+    segment = charger_segments()
+    macro = charger_macro_historique()
+
+    macro["IPL_diff1"] = macro["IPL"].diff()
+    macro["IPL_diff1_hp"] = np.nan
+    cycle_ipl, _ = filtre_hp(macro["IPL_diff1"].dropna())
+    macro.loc[macro["IPL_diff1"].dropna().index, "IPL_diff1_hp"] = cycle_ipl
+
+    segments_hp = segments_non_stationnaires(segment, cache_path=None)
+    segment_hp = substituer_cycle_hp(appliquer_hp_filter_segments(segment.copy(), segments_hp), segments_hp)
+    df = fusionner_macro(segment_hp, macro)
+    return {
+        "taille": taille,
+        "segment": segment,
+        "macro": macro,
+        "segments": dict(partitionner(df)),
+        "scenarios": charger_scenarios(),
+    }
+
+
+def _assurer_modeles(ctx, n_jobs):
+    if not os.path.exists(os.path.join("models", "resume_modelisation.csv")):
+        entrainer_modeles_par_segment(ctx["segments"], n_jobs=n_jobs)
+
+
+# === Étapes mesurées : chacune retourne le nombre de lignes traitées ===
+
+def bench_enrichissement(ctx, n_jobs):
+    return sum(len(preparer_donnees_segment(df_seg)[0]) for df_seg in ctx["segments"].values())
+
+
+def bench_stationnarite(ctx, n_jobs):
+    return len(tester_stationnarite_grille(ctx["macro"], ctx["segment"], n_jobs=n_jobs))
+
+
+def bench_entrainement(ctx, n_jobs):
+    entrainer_modeles_par_segment(ctx["segments"], n_jobs=n_jobs, forcer=True)
+    return sum(len(df_seg) for df_seg in ctx["segments"].values())
+
+
+def bench_projection(ctx, n_jobs):
+    resultats = predict_all_models_scenarios(df_raw=ctx["scenarios"],
+                                             scenarios=noms_scenarios(ctx["taille"]["n_scenarios"]),
+                                             figures=FileFigures(actif=False))
+    return sum(len(df_pred) for preds in resultats.values() for df_pred in preds.values())
+
+
+def bench_monte_carlo(ctx, n_jobs):
+    n_chemins = ctx["taille"]["n_chemins"]
+    fans = projeter_monte_carlo(df_raw=ctx["scenarios"], n_chemins=n_chemins, scenario="CENT",
+                                df_hist=ctx["macro"], figures=FileFigures(actif=False))
+    return n_chemins * len(fans)
+
+
+def bench_pipeline_partitionne(ctx, n_jobs):
+    # Chaque segment de bout en bout (stationnarité, entraînement, projection), sorties par partition
+    shutil.rmtree("models", ignore_errors=True)
+    executer_par_partition(ctx["segment"], ctx["macro"], ctx["scenarios"],
+                           scenarios=noms_scenarios(ctx["taille"]["n_scenarios"]), n_jobs=n_jobs)
+    return len(ctx["segment"])
+
+
+BENCHMARKS = {
+    "enrichissement": bench_enrichissement,
+    "stationnarite": bench_stationnarite,
+    "entrainement": bench_entrainement,
+    "projection": bench_projection,
+    "monte_carlo": bench_monte_carlo,
+    "pipeline_partitionne": bench_pipeline_partitionne,
+}
+# Préalables exécutés une fois, hors mesure (les projections lisent des modèles déjà entraînés)
+PREALABLES = {"projection": _assurer_modeles, "monte_carlo": _assurer_modeles}
+
+
+# === Exécution et comparaison ===
+
+def mesurer_benchmark(nom, fonction, ctx, repetitions=3, n_jobs=1):
+    """Répète `fonction` à froid et résume temps écoulé (médiane, min), temps CPU et pic mémoire."""
+    if nom in PREALABLES:
+        with redirect_stdout(io.StringIO()):
+            PREALABLES[nom](ctx, n_jobs)
+    mesures = []
+    for _ in range(repetitions):
+        shutil.rmtree(os.path.join("outputs", "cache"), ignore_errors=True)
+        JOURNAL.reinitialiser()
+        JOURNAL.actif = True
+        with redirect_stdout(io.StringIO()), mesurer(nom, echantillonner=True) as mesure:
+            mesure["lignes"] = fonction(ctx, n_jobs)
+        mesures.append(mesure)
+    durees = [m["duree_s"] for m in mesures]
+    return {
+        "duree_mediane_s": round(statistics.median(durees), 4),
+        "duree_min_s": round(min(durees), 4),
+        "cpu_median_s": round(statistics.median(m["cpu_s"] for m in mesures), 4),
+        "pic_rss_mo": max(m["pic_rss_mo"] for m in mesures),
+        "lignes": mesures[-1]["lignes"],
+        "repetitions": repetitions,
+    }
+
+
+def executer_suite(tailles=("petit", "moyen"), benchmarks=tuple(BENCHMARKS), repetitions=3, n_jobs=1, graine=0):
+    """Exécute les benchmarks demandés pour chaque taille ; retourne {taille: {benchmark: résultat}}."""
+    resultats = {}
+    repertoire = os.getcwd()
+    for nom_taille in tailles:
+        taille = TAILLES[nom_taille]
+        print(f"\n📏 Taille {nom_taille} : {taille}")
+        dossier = tempfile.mkdtemp(prefix=f"bench_{nom_taille}_")
+        try:
+            os.chdir(dossier)
+            with redirect_stdout(io.StringIO()):
+                ctx = preparer_contexte(taille, graine)
+            resultats[nom_taille] = {}
+            for nom in benchmarks:
+                try:
+                    resultat = mesurer_benchmark(nom, BENCHMARKS[nom], ctx, repetitions, n_jobs)
+                    resultats[nom_taille][nom] = resultat
+                    print(f"⏱️ {nom:<20} {resultat['duree_mediane_s']:>9.3f} s  "
+                          f"({resultat['lignes']} lignes, pic {resultat['pic_rss_mo']} Mo)")
+                except Exception as e:
+                    print(f"❌ {nom} – erreur : {e}")
+        finally:
+            os.chdir(repertoire)
+            shutil.rmtree(dossier, ignore_errors=True)
+    return resultats
+
+
+def environnement():
+    return {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "machine": platform.machine(),
+        "processeur": platform.processor() or platform.machine(),
+        "cpu": os.cpu_count(),
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+    }
+
+
+def comparer(resultats, references, tolerance=TOLERANCE):
+    """Tableau (taille, benchmark, temps, référence, rapport, statut) ; statut « régression » au-delà de `tolerance`.
+
+    Une étape dont le nombre de lignes traitées diffère de la référence est signalée « charge modifiée ».
+    """
+    lignes = []
+    for nom_taille, par_benchmark in resultats.items():
+        for nom, resultat in par_benchmark.items():
+            reference = references.get(nom_taille, {}).get(nom)
+            ligne = {"taille": nom_taille, "benchmark": nom, "duree_mediane_s": resultat["duree_mediane_s"],
+                     "reference_s": None, "rapport": None, "statut": "sans référence"}
+            if reference and reference.get("lignes") != resultat["lignes"]:
+                # Le volume traité a changé : les temps ne sont pas comparables
+                ligne.update({"reference_s": reference["duree_mediane_s"], "statut": "charge modifiée"})
+            elif reference:
+                rapport = resultat["duree_mediane_s"] / max(reference["duree_mediane_s"], 1e-9)
+                statut = "régression" if rapport > tolerance else "gain" if rapport < 1 / tolerance else "stable"
+                ligne.update({"reference_s": reference["duree_mediane_s"], "rapport": round(rapport, 3),
+                              "statut": statut})
+            lignes.append(ligne)
+    return pd.DataFrame(lignes)
+
+
+def enregistrer_references(resultats, chemin=BASELINES):
+    """Fusionne les résultats dans le fichier de références (les autres tailles sont conservées)."""
+    references = lire_json(chemin, defaut={"resultats": {}})
+    for nom_taille, par_benchmark in resultats.items():
+        references["resultats"].setdefault(nom_taille, {}).update(par_benchmark)
+    references["environnement"] = environnement()
+    ecrire_json_atomique(references, chemin)
+    print(f"📌 Références enregistrées : {chemin}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks du pipeline CCF sur données synthétiques")
+    parser.add_argument("--tailles", nargs="+", default=["petit", "moyen"], choices=list(TAILLES))
+    parser.add_argument("--benchmarks", nargs="+", default=list(BENCHMARKS), choices=list(BENCHMARKS))
+    parser.add_argument("--repetitions", type=int, default=3)
+    parser.add_argument("--jobs", type=int, default=1)
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--enregistrer", action="store_true", help="Enregistre les résultats comme références")
+    parser.add_argument("--sortie", default="outputs/benchmarks", help="Dossier des résultats de l'exécution")
+    args = parser.parse_args()
+
+    resultats = executer_suite(args.tailles, args.benchmarks, args.repetitions, args.jobs)
+    table = comparer(resultats, lire_json(BASELINES, defaut={}).get("resultats", {}), args.tolerance)
+    print("\n" + table.to_string(index=False))
+
+    os.makedirs(args.sortie, exist_ok=True)
+    nom = datetime.now().strftime("bench_%Y%m%d_%H%M%S")
+    ecrire_json_atomique({"environnement": environnement(), "arguments": vars(args), "resultats": resultats},
+                         os.path.join(args.sortie, f"{nom}.json"))
+    table.to_csv(os.path.join(args.sortie, f"{nom}.csv"), index=False)
+
+    if args.enregistrer:
+        enregistrer_references(resultats)
+    elif (table["statut"] == "régression").any():
+        sys.exit(1)
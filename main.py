@@ -1,100 +1,407 @@
 import os
-import pandas as pd
-import numpy as np
-import joblib
 import argparse
-from statsmodels.tsa.filters.hp_filter import hpfilter
-
-from src.visualization import visualiser_predictions
-from src.stationarity import (
-    tester_stationnarite_macro,
-    tester_transformations_ipl,
-    tester_stationnarite_segments,
-    appliquer_hp_filter_segments,
-    tester_stationnarite_hp_segments,
-)
-from src.modeling import entrainer_modeles_par_segment
-from src.scenario_projection import predict_all_models_scenarios
 
-# Étape 0 : Lecture des arguments de la ligne de commande
-parser = argparse.ArgumentParser()
-parser.add_argument("--modele", type=str, default="RF", choices=["RF", "OLS"])
-args = parser.parse_args()
+# Les modules de src (donc pandas, scikit-learn, statsmodels, scipy, matplotlib, joblib) sont importés
+# dans chaque étape, au moment où elle s'exécute : `--help` ou une projection depuis les modèles
+# enregistrés ne chargent que ce qu'elles utilisent.
 
-if __name__ == "__main__":
+SCENARIOS = ["CENT", "PESS", "OPT"]
+# Segments fusionnés avec la macro (étapes 5 et 6), relus par `plot` pour tracer l'historique
+ARTEFACT_SEGMENTS = "outputs/cache/segments_prepares"
+# Historique macro préparé (étapes 1 à 3), relu par `project` pour les chocs Monte Carlo
+ARTEFACT_MACRO = "outputs/cache/macro_preparee"
+# Colonne identifiant les segments (même valeur que src.preprocessing.CLE_SEGMENT, importée sans pandas)
+CLE_SEGMENT = "note_ref"
+
+
+# === Étapes ===
+
+def charger_donnees():
+    from src.ingestion import charger_segments, charger_macro_historique
+    from src.hp_filter import filtre_hp
+    from src.instrumentation import mesurer
+    import numpy as np
 
-    # Étape 1 : Chargement des données brutes
-    segment = pd.read_csv("data/brutes/Données_CCF_PAR_SEGMENT.csv", sep=";")
-    macro = pd.read_excel("data/brutes/historique_macro_variables_projet_CCF_FowardLooking_IFRS9.xlsx")
+    # Étape 1 : Chargement des données brutes (typées et mises en cache par src.ingestion)
+    with mesurer("etape_01_chargement", echantillonner=True) as etape:
+        segment = charger_segments()
+        macro = charger_macro_historique()
+        etape["lignes"] = len(segment) + len(macro)
 
     # Étape 2 : Prétraitement des variables macroéconomiques
-    macro["date_dernier_mois"] = pd.to_datetime(macro["date_dernier_mois"], format="%Y-%m")
-    macro["cod_prd_ref"] = macro["date_dernier_mois"].dt.year.astype(str) + "T" + macro["date_dernier_mois"].dt.quarter.astype(str)
-    macro = macro.drop(columns=["date_dernier_mois"])
-    macro = macro[macro["cod_prd_ref"] >= '2009T1']
+    with mesurer("etape_02_pretraitement_macro", echantillonner=True) as etape:
+        macro = macro[macro["cod_prd_ref"] >= '2009T1']
+        etape["lignes"] = len(macro)
 
     # Étape 3 : Calcul de IPL_diff1_hp (composante cyclique avec filtre HP)
-    macro["IPL_diff1"] = macro["IPL"].diff()
-    macro["IPL_diff1_hp"] = np.nan
-    cycle_ipl, _ = hpfilter(macro["IPL_diff1"].dropna(), lamb=1600)
-    macro.loc[macro["IPL_diff1"].dropna().index, "IPL_diff1_hp"] = cycle_ipl
-
-    # Étape 4 : Tests de stationnarité et transformation des segments
-    tester_stationnarite_macro(macro)
-    tester_transformations_ipl(macro)
-    tester_stationnarite_segments(segment)
-    segment = appliquer_hp_filter_segments(segment, [2, 3])
-    tester_stationnarite_hp_segments(segment, [2, 3])
-
-    # Étape 5 : Substitution de la série brute par le cycle HP pour les segments non stationnaires
-    segment["Indicateur_moyen_Brut"] = segment.apply(
-        lambda row: row["cycle_hp"] if row["note_ref"] in [2, 3] else row["Indicateur_moyen_Brut"], axis=1
+    with mesurer("etape_03_filtre_hp_ipl", lignes=len(macro), echantillonner=True):
+        macro["IPL_diff1"] = macro["IPL"].diff()
+        macro["IPL_diff1_hp"] = np.nan
+        cycle_ipl, _ = filtre_hp(macro["IPL_diff1"].dropna())
+        macro.loc[macro["IPL_diff1"].dropna().index, "IPL_diff1_hp"] = cycle_ipl
+    return segment, macro
+
+
+def tester_stationnarite_macro_etape(macro):
+    from src.stationarity import tester_stationnarite_macro, tester_transformations_ipl
+    from src.instrumentation import mesurer
+
+    # Étape 4 : Tests de stationnarité des variables macroéconomiques
+    with mesurer("etape_04_stationnarite_macro", lignes=len(macro), echantillonner=True):
+        tester_stationnarite_macro(macro)
+        tester_transformations_ipl(macro)
+
+
+def tester_stationnarite_segments_etape(segment, macro, n_jobs=1, cle=CLE_SEGMENT):
+    from src.stationarity import (
+        segments_non_stationnaires,
+        tester_stationnarite_segments,
+        tester_stationnarite_grille,
+        appliquer_hp_filter_segments,
+        tester_stationnarite_hp_segments,
     )
+    from src.instrumentation import mesurer
 
-    # Étape 6 : Fusion des données segment + macro
-    segment["cod_prd_ref"] = segment["cod_prd_ref"].astype(str).str.strip()
-    macro["cod_prd_ref"] = macro["cod_prd_ref"].astype(str).str.strip()
-    df = pd.merge(segment, macro, on="cod_prd_ref", how="left")
-    df = df.drop(columns=['cycle_hp', 'PIB_diff1', 'IPL', 'TCH', 'Inflation', 'IPL_diff1'])
+    # Étape 4 bis : Tests de stationnarité des segments, puis du cycle HP des segments non stationnaires
+    with mesurer("etape_04b_stationnarite_segments", lignes=len(segment), echantillonner=True):
+        tester_stationnarite_segments(segment, cle)
+        os.makedirs("outputs/stationnarite", exist_ok=True)
+        table_stationnarite = tester_stationnarite_grille(macro, segment, n_jobs=n_jobs, cle=cle)
+        table_stationnarite.to_csv("outputs/stationnarite/resultats_stationnarite.csv", index=False)
+        segments_hp = segments_non_stationnaires(segment, cle)
+        segment = appliquer_hp_filter_segments(segment.copy(), segments_hp, cle)
+        tester_stationnarite_hp_segments(segment, segments_hp, cle)
+    return segment
 
-    # Étape 7 : Séparation des données par segment
-    segments = {i: df[df["note_ref"] == i].copy() for i in range(1, 6)}
+
+def preparer_segments(segment, macro, cle=CLE_SEGMENT):
+    from src.stationarity import segments_non_stationnaires, appliquer_hp_filter_segments
+    from src.preprocessing import partitionner, substituer_cycle_hp, fusionner_macro
+    from src.ingestion import enregistrer_table
+    from src.instrumentation import mesurer
+
+    # Étape 5 : Substitution de la série brute par le cycle HP pour les segments non stationnaires (ADF)
+    # (cycle déjà calculé si les tests de l'étape 4 bis ont été exécutés)
+    with mesurer("etape_05_substitution_hp", lignes=len(segment), echantillonner=True):
+        segments_hp = segments_non_stationnaires(segment, cle)
+        print(f"🔁 Segments non stationnaires remplacés par leur cycle HP : {segments_hp}")
+        if "cycle_hp" not in segment.columns:
+            segment = appliquer_hp_filter_segments(segment.copy(), segments_hp, cle)
+        segment = substituer_cycle_hp(segment, segments_hp, cle)
+
+    # Étape 6 : Fusion des données segment + macro (enregistrées pour les commandes suivantes)
+    with mesurer("etape_06_fusion", echantillonner=True) as etape:
+        df = fusionner_macro(segment, macro)
+        enregistrer_table(df, ARTEFACT_SEGMENTS)
+        enregistrer_table(macro, ARTEFACT_MACRO)
+        etape["lignes"] = len(df)
+
+    # Étape 7 : Séparation des données par segment (un seul groupby, segments découverts dans les données)
+    with mesurer("etape_07_separation_segments", lignes=len(df), echantillonner=True):
+        return dict(partitionner(df, cle))
+
+
+def entrainer(args, segments):
+    from src.modeling import entrainer_modeles_par_segment
+    from src.instrumentation import mesurer
+    lignes = sum(len(df_seg) for df_seg in segments.values())
+
+    # Étape 7 bis : Optimisation des hyperparamètres RF (config enregistrée à côté de chaque modèle)
+    if args.tuning:
+        from src.tuning import optimiser_hyperparametres
+        with mesurer("etape_07b_optimisation_rf", lignes=lignes, echantillonner=True):
+            optimiser_hyperparametres(segments, n_jobs=args.jobs, budget_s=args.budget_tuning)
 
     # Étape 8 : Entraînement des modèles (RF et OLS) et export du résumé
-    resume = entrainer_modeles_par_segment(segments)
-    print(resume)
+    with mesurer("etape_08_entrainement", lignes=lignes, echantillonner=True):
+        resume = entrainer_modeles_par_segment(segments, n_jobs=args.jobs, forcer=args.forcer)
+        print(resume)
+
+    # Étape 8 bis : Backtest hors échantillon (MAE/RMSE par horizon, RF et OLS)
+    if args.backtest != "aucun":
+        from src.backtesting import backtester_segments
+        with mesurer("etape_08b_backtest", lignes=lignes, echantillonner=True):
+            table_backtest = backtester_segments(segments, mode=args.backtest, n_jobs=args.jobs)
+            print(table_backtest.groupby(["Segment", "Modele"])[["MAE", "RMSE"]].mean().round(4))
+
+
+def projeter(args, figures, segments=None):
+    from src.ingestion import charger_scenarios
+    from src.scenario_projection import predict_all_models_scenarios
+    from src.instrumentation import mesurer
+    import pandas as pd
 
     # Étape 9 : Chargement du fichier de scénarios macroéconomiques
-    df_scenarios = pd.read_excel("data/Scenario_horizon3ans_propre.xlsx")
+    with mesurer("etape_09_chargement_scenarios", echantillonner=True) as etape:
+        df_scenarios = charger_scenarios()
+        etape["lignes"] = len(df_scenarios)
+
+    # Étape 11 : Prédiction des scénarios (segments ayant un modèle enregistré par défaut)
+    with mesurer("etape_11_projection_scenarios", lignes=len(df_scenarios), echantillonner=True):
+        results = predict_all_models_scenarios(
+            df_raw=df_scenarios,
+            scenarios=args.scenarios,
+            figures=figures,
+            segments=segments,
+            incertitude=args.incertitude,
+        )
+
+    # Étape 12 : Export des prédictions dans un fichier CSV par scénario
+    with mesurer("etape_12_export_predictions") as etape:
+        os.makedirs("outputs/predictions", exist_ok=True)
+        etape["lignes"] = 0
+        for scenario_name, segment_preds in results.items():
+            if not segment_preds:
+                continue
+            df_all = pd.concat([df_pred.assign(segment=seg) for seg, df_pred in segment_preds.items()])
+            df_all.to_csv(f"outputs/predictions/predictions_{scenario_name}.csv", index=False)
+            etape["lignes"] += len(df_all)
+            print(f"Fichier exporté : outputs/predictions/predictions_{scenario_name}.csv")
+    return results, df_scenarios
+
+
+def projeter_monte_carlo_etape(args, df_scenarios, macro, figures):
+    from src.monte_carlo import projeter_monte_carlo
+    from src.instrumentation import mesurer
+    import pandas as pd
+
+    # Étape 14 : Projection Monte Carlo (fan charts de CCF par segment)
+    with mesurer("etape_14_monte_carlo", lignes=len(args.scenarios) * args.n_chemins, echantillonner=True):
+        for scenario_name in args.scenarios:
+            fans = projeter_monte_carlo(
+                df_raw=df_scenarios,
+                n_chemins=args.n_chemins,
+                scenario=scenario_name,
+                methode=args.methode_mc,
+                df_hist=macro,
+                figures=figures,
+            )
+            df_fans = pd.concat([df_fan.assign(segment=seg) for seg, df_fan in fans.items()])
+            df_fans.to_csv(f"outputs/predictions/monte_carlo_{scenario_name}.csv", index=False)
+            print(f"Fichier exporté : outputs/predictions/monte_carlo_{scenario_name}.csv")
+
+
+def rendre_figures(figures, n_jobs=1, forcer=False):
+    from src.instrumentation import mesurer
+
+    # Étape 15 : Rendu des figures (processus parallèles, figures inchangées ignorées)
+    if figures.actif:
+        with mesurer("etape_15_rendu_figures", lignes=len(figures.specs), echantillonner=True):
+            figures.rendre(n_jobs=n_jobs, forcer=forcer)
+        print("Visualisation des prédictions terminée. Graphiques sauvegardés dans 'outputs/predictions' et 'outputs/figures'.")
+
+
+# === Pipeline complet (sans sous-commande) ===
+
+def executer_pipeline(args):
+    from src.plotting import FileFigures
+
+    segment, macro = charger_donnees()
+    tester_stationnarite_macro_etape(macro)
+
+    # Figures collectées pendant la projection, tracées en parallèle à l'étape 15
+    figures = FileFigures(actif=not args.no_plots)
+    if args.partitions:
+        df_scenarios = executer_pipeline_partitionne(args, segment, macro, figures)
+    else:
+        df_scenarios = executer_pipeline_par_etape(args, segment, macro, figures)
+
+    if args.n_chemins > 0:
+        projeter_monte_carlo_etape(args, df_scenarios, macro, figures)
+    rendre_figures(figures, n_jobs=args.jobs)
+
+
+def executer_pipeline_partitionne(args, segment, macro, figures):
+    from src.ingestion import charger_scenarios
+    from src.partitions import executer_par_partition
+    from src.instrumentation import mesurer
 
-    # Étape 10 : Chargement des features sélectionnées par segment
-    top_features_dict = {}
-    for i in range(1, 6):
-        path = f"models/features/selected_features_segment_{i}.pkl"
+    # Étapes 5 à 13 par segment : chaque partition est traitée de bout en bout, ses sorties écrites à part
+    with mesurer("etape_05_pipeline_partitionne", lignes=len(segment), echantillonner=True):
+        df_scenarios = charger_scenarios()
+        statuts, resume = executer_par_partition(segment, macro, df_scenarios, scenarios=args.scenarios,
+                                                 cle=args.cle_segment, n_jobs=args.jobs, forcer=args.forcer, modele=args.modele,
+                                                 figures=figures, incertitude=args.incertitude)
+        print(resume)
+    return df_scenarios
+
+
+def executer_pipeline_par_etape(args, segment, macro, figures):
+    from src.visualization import visualiser_predictions
+    from src.instrumentation import mesurer
+
+    segment = tester_stationnarite_segments_etape(segment, macro, n_jobs=args.jobs, cle=args.cle_segment)
+    segments = preparer_segments(segment, macro, cle=args.cle_segment)
+    entrainer(args, segments)
+
+    # Étape 10 (features sélectionnées par segment) : lues avec les modèles compacts lors de la projection
+    results, df_scenarios = projeter(args, figures, segments=list(segments))
+
+    # Étape 13 : Visualisation des prédictions pour chaque segment et scénario
+    with mesurer("etape_13_visualisation"):
+        visualiser_predictions(results, segments, modele=args.modele, figures=figures)
+
+    return df_scenarios
+
+
+# === Sous-commandes : chacune repart des artefacts enregistrés par les précédentes ===
+
+def commande_train(args):
+    """Étapes 1 à 8 : données, cycle HP, fusion et entraînement (modèles dans models/)."""
+    segment, macro = charger_donnees()
+    entrainer(args, preparer_segments(segment, macro, cle=args.cle_segment))
+
+
+def commande_test_stationarity(args):
+    """Étapes 1 à 4 bis : tests de stationnarité macro et segments, grille dans outputs/stationnarite."""
+    segment, macro = charger_donnees()
+    tester_stationnarite_macro_etape(macro)
+    tester_stationnarite_segments_etape(segment, macro, n_jobs=args.jobs, cle=args.cle_segment)
+
+
+def commande_project(args):
+    """Étapes 9 à 12 (et 14) depuis les modèles enregistrés : prédictions CSV, sans tracé."""
+    from src.ingestion import lire_table
+    from src.plotting import FileFigures
+    from src.registry import get_registre
+
+    if not get_registre("models").segments_disponibles():
+        print("❌ Aucun modèle enregistré dans models/ : lancer d'abord `python main.py train`")
+        return
+    figures = FileFigures(actif=False)
+    _, df_scenarios = projeter(args, figures)
+    if args.n_chemins > 0:
         try:
-            top_features_dict[i] = joblib.load(path)
+            macro = lire_table(ARTEFACT_MACRO)
         except FileNotFoundError:
-            print(f"Fichier non trouvé : {path}")
+            print(f"Historique macro non trouvé ({ARTEFACT_MACRO}) : lancer `python main.py train` "
+                  "pour la projection Monte Carlo")
+            return
+        projeter_monte_carlo_etape(args, df_scenarios, macro, figures)
 
-    # Étape 11 : Prédiction des scénarios CENT / PESS / OPT
-    results = predict_all_models_scenarios(
-        df_raw=df_scenarios,
-        top_features_dict=top_features_dict,
-        scenarios=["CENT", "PESS", "OPT"]
-    )
 
-    # Étape 12 : Export des prédictions dans un fichier CSV par scénario
-    os.makedirs("outputs/predictions", exist_ok=True)
-    for scenario_name, segment_preds in results.items():
-        dfs = []
-        for seg, df_pred in segment_preds.items():
-            df_pred = df_pred.copy()
-            df_pred["segment"] = seg
-            dfs.append(df_pred)
-        df_all = pd.concat(dfs)
-        df_all.to_csv(f"outputs/predictions/predictions_{scenario_name}.csv", index=False)
-        print(f"Fichier exporté : outputs/predictions/predictions_{scenario_name}.csv")
+def commande_plot(args):
+    """Étapes 13 et 15 depuis les prédictions exportées (et l'historique enregistré par `train`)."""
+    from src.ingestion import lire_table
+    from src.preprocessing import partitionner
+    from src.plotting import FileFigures
+    from src.scenario_projection import ajouter_figure_projection
+    from src.visualization import visualiser_predictions
+    from src.instrumentation import mesurer
+    import pandas as pd
 
-    # Étape 13 : Visualisation des prédictions pour chaque segment et scénario
-    visualiser_predictions(results, segments, modele=args.modele)
-    print("Visualisation des prédictions terminée. Graphiques sauvegardés dans 'outputs/predictions'.")
+    figures = FileFigures()
+    results = {}
+    for scenario in args.scenarios:
+        chemin = f"outputs/predictions/predictions_{scenario}.csv"
+        if not os.path.exists(chemin):
+            print(f"Fichier non trouvé : {chemin}")
+            continue
+        df_all = pd.read_csv(chemin, parse_dates=["date"])
+        results[scenario] = {seg: df_pred.drop(columns="segment").reset_index(drop=True)
+                             for seg, df_pred in partitionner(df_all, "segment")}
+        for seg, df_pred in results[scenario].items():
+            ajouter_figure_projection(figures, df_pred, scenario, seg)
+
+        chemin_mc = f"outputs/predictions/monte_carlo_{scenario}.csv"
+        if os.path.exists(chemin_mc):
+            from src.monte_carlo import tracer_fan_chart
+            for seg, df_fan in partitionner(pd.read_csv(chemin_mc, parse_dates=["date"]), "segment"):
+                for modele in ["RF", "OLS"]:
+                    tracer_fan_chart(df_fan, scenario, seg, modele=modele, figures=figures)
+
+    # Étape 13 : Visualisation des prédictions avec l'historique de chaque segment
+    try:
+        segments = dict(partitionner(lire_table(ARTEFACT_SEGMENTS), args.cle_segment))
+    except FileNotFoundError:
+        segments = None
+        print(f"Historique non trouvé ({ARTEFACT_SEGMENTS}) : lancer `python main.py train` pour le tracer")
+    if segments:
+        with mesurer("etape_13_visualisation"):
+            visualiser_predictions(results, segments, modele=args.modele, figures=figures)
+    rendre_figures(figures, n_jobs=args.jobs, forcer=args.forcer)
+
+
+COMMANDES = {
+    "train": commande_train,
+    "test-stationarity": commande_test_stationarity,
+    "project": commande_project,
+    "plot": commande_plot,
+}
+
+
+# Étape 0 : Lecture des arguments de la ligne de commande
+def construire_parser():
+    """Options du pipeline complet (sans sous-commande) et des sous-commandes train, test-stationarity,
+    project et plot ; chaque sous-commande ne reçoit que les options qu'elle utilise."""
+    parser = argparse.ArgumentParser(parents=list(options_partagees().values()),
+                                     description="Recalibrage du CCF Forward Looking : pipeline complet "
+                                                 "ou une étape depuis les artefacts enregistrés")
+    parser.add_argument("--no-plots", action="store_true", help="Désactive le tracé des figures")
+    parser.add_argument("--partitions", action="store_true",
+                        help="Traite chaque segment de bout en bout (stationnarité, entraînement, projection) "
+                             "avec sorties par partition dans outputs/partitions")
+
+    # Sans valeur par défaut dans les sous-commandes : une option placée avant la sous-commande
+    # (`--jobs 4 train`) n'est pas écrasée, celle placée après l'emporte
+    options = options_partagees(argparse.SUPPRESS)
+    sous_commandes = parser.add_subparsers(dest="commande", metavar="{train,test-stationarity,project,plot}")
+    sous_commandes.add_parser("train", parents=[options["commun"], options["entrainement"]],
+                              help=commande_train.__doc__)
+    sous_commandes.add_parser("test-stationarity", parents=[options["commun"]], help=commande_test_stationarity.__doc__)
+    sous_commandes.add_parser("project", parents=[options["commun"], options["projection"]],
+                              help=commande_project.__doc__)
+    plot = sous_commandes.add_parser("plot", parents=[options["commun"], options["modele"]], help=commande_plot.__doc__)
+    plot.add_argument("--scenarios", nargs="+", default=argparse.SUPPRESS, help="Scénarios tracés")
+    plot.add_argument("--forcer", action="store_true", default=argparse.SUPPRESS,
+                      help="Retrace toutes les figures, même inchangées")
+    return parser
+
+
+def options_partagees(defaut=None):
+    """Groupes d'options communs au parser principal et aux sous-commandes.
+
+    Avec `defaut=argparse.SUPPRESS`, les options absentes de la ligne de commande ne sont pas
+    écrites dans l'espace de noms (la valeur du parser principal est conservée).
+    """
+    def d(valeur):
+        return valeur if defaut is None else defaut
+
+    commun = argparse.ArgumentParser(add_help=False)
+    commun.add_argument("--jobs", type=int, default=d(1), help="Processus parallèles (-1 = tous les cœurs)")
+    commun.add_argument("--profil", action="store_true", default=d(False),
+                        help="Enregistre un profil cProfile du run dans outputs/runs")
+    commun.add_argument("--cle-segment", type=str, default=d(CLE_SEGMENT),
+                        help="Colonne des données identifiant les segments")
+
+    entrainement = argparse.ArgumentParser(add_help=False)
+    entrainement.add_argument("--forcer", action="store_true", default=d(False),
+                              help="Réentraîne tous les segments même si leurs données sont inchangées")
+    entrainement.add_argument("--backtest", type=str, default=d("expanding"), choices=["expanding", "rolling", "aucun"],
+                              help="Évaluation hors échantillon par origine glissante après l'entraînement")
+    entrainement.add_argument("--tuning", action="store_true", default=d(False),
+                              help="Optimise les hyperparamètres des forêts avant l'entraînement")
+    entrainement.add_argument("--budget-tuning", type=float, default=d(300),
+                              help="Budget total de l'optimisation (secondes)")
+
+    projection = argparse.ArgumentParser(add_help=False)
+    projection.add_argument("--scenarios", nargs="+", default=d(SCENARIOS), help="Scénarios projetés")
+    projection.add_argument("--n-chemins", type=int, default=d(0), help="Nombre de chemins Monte Carlo (0 = désactivé)")
+    projection.add_argument("--methode-mc", type=str, default=d("bootstrap"), choices=["bootstrap", "var"])
+    projection.add_argument("--incertitude", action="store_true", default=d(False),
+                            help="Ajoute aux projections les quantiles des arbres RF et l'intervalle de prédiction OLS")
+
+    modele = argparse.ArgumentParser(add_help=False)
+    modele.add_argument("--modele", type=str, default=d("RF"), choices=["RF", "OLS"])
+    return {"commun": commun, "entrainement": entrainement, "projection": projection, "modele": modele}
+
+
+if __name__ == "__main__":
+    args = construire_parser().parse_args()
+    from src.instrumentation import JOURNAL, profiler, ecrire_rapport
+
+    # Rapport d'exécution (temps, CPU, mémoire, lignes par étape et par segment) dans outputs/runs
+    JOURNAL.actif = True
+    with profiler("outputs/runs/profil.prof", actif=args.profil):
+        COMMANDES.get(args.commande, executer_pipeline)(args)
+    ecrire_rapport(metadonnees={"arguments": vars(args)})
@@ -0,0 +1,209 @@
+# src/backtesting.py
+import os
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.ensemble import RandomForestRegressor
+from threadpoolctl import threadpool_limits
+
+from src.modeling import CONFIG_ENTRAINEMENT, preparer_donnees_segment, repartir_jobs, hyperparametres_rf
+from src.registry import get_registre
+from src.utils import hash_dataframe, hash_objet, lire_json, ecrire_json_atomique
+
+# Horizon de prévision en trimestres (3 ans, comme les scénarios) et taille minimale d'apprentissage
+HORIZON = 12
+TAILLE_MIN = 20
+CACHE_BACKTEST = "outputs/cache/backtest.json"
+
+
+class OLSRecursif:
+    """MCO avec constante, mis à jour ligne par ligne sans nouvel ajustement complet.
+
+    On conserve X'X, X'y et (X'X)⁻¹ ; ajouter ou retirer une observation met à
+    jour l'inverse par la formule de Sherman–Morrison en O(p²). Tant que X'X est
+    singulière (fenêtre trop courte), l'inverse est recalculée par pseudo-inverse.
+    """
+
+    def __init__(self, X, y):
+        X = self._avec_constante(X)
+        self.xtx = X.T @ X
+        self.xty = X.T @ y
+        self._recalculer()
+
+    @staticmethod
+    def _avec_constante(X):
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        return np.column_stack([np.ones(len(X)), X])
+
+    def _recalculer(self):
+        self.inverse = np.linalg.pinv(self.xtx)
+        self._inversible = np.linalg.matrix_rank(self.xtx) == len(self.xtx)
+
+    def _mettre_a_jour(self, x, y, signe):
+        x = np.concatenate(([1.0], np.asarray(x, dtype=float)))
+        self.xtx += signe * np.outer(x, x)
+        self.xty += signe * y * x
+        px = self.inverse @ x
+        denominateur = 1.0 + signe * (x @ px)
+        if not self._inversible or abs(denominateur) < 1e-10:
+            self._recalculer()
+        else:
+            self.inverse -= signe * np.outer(px, px) / denominateur
+
+    def ajouter(self, x, y):
+        self._mettre_a_jour(x, y, 1.0)
+
+    def retirer(self, x, y):
+        self._mettre_a_jour(x, y, -1.0)
+
+    @property
+    def coef(self):
+        return self.inverse @ self.xty
+
+    def predict(self, X):
+        return self._avec_constante(X) @ self.coef
+
+
+def origines_backtest(n, taille_min=TAILLE_MIN, pas=1):
+    """Indices des origines de prévision : le modèle est estimé sur les lignes [.., t)."""
+    return np.arange(taille_min, n, pas)
+
+
+def _fenetre(t, fenetre):
+    return 0 if fenetre is None else max(0, t - fenetre)
+
+
+def backtest_ols(X, y, origines, fenetre=None, horizon=HORIZON):
+    """Prévisions OLS (n_origines, horizon) ; un seul modèle mis à jour d'une origine à la suivante."""
+    n = len(X)
+    previsions = np.full((len(origines), horizon), np.nan)
+    debut, fin = _fenetre(origines[0], fenetre), origines[0]
+    modele = OLSRecursif(X[debut:fin], y[debut:fin])
+    for k, t in enumerate(origines):
+        for j in range(fin, t):
+            modele.ajouter(X[j], y[j])
+        fin = t
+        for j in range(debut, _fenetre(t, fenetre)):
+            modele.retirer(X[j], y[j])
+        debut = max(debut, _fenetre(t, fenetre))
+        borne = min(t + horizon, n)
+        previsions[k, :borne - t] = modele.predict(X[t:borne])
+    return previsions
+
+
+def backtest_rf(X, y, origines, fenetre=None, horizon=HORIZON, params_rf=None, random_state=0):
+    """Prévisions RF (n_origines, horizon) ; une forêt réestimée par origine."""
+    n = len(X)
+    previsions = np.full((len(origines), horizon), np.nan)
+    with threadpool_limits(limits=1):
+        for k, t in enumerate(origines):
+            debut = _fenetre(t, fenetre)
+            modele = RandomForestRegressor(
+                **(params_rf or {}), random_state=random_state, n_jobs=1
+            ).fit(X[debut:t], y[debut:t])
+            borne = min(t + horizon, n)
+            previsions[k, :borne - t] = modele.predict(X[t:borne])
+    return previsions
+
+
+def erreurs_par_horizon(previsions, y, origines):
+    """MAE, RMSE et nombre de prévisions pour chaque horizon h = 1..H."""
+    horizon = previsions.shape[1]
+    indices = origines[:, None] + np.arange(horizon)
+    valides = indices < len(y)
+    erreurs = np.where(valides, previsions - y[np.minimum(indices, len(y) - 1)], np.nan)
+    with np.errstate(invalid="ignore"):
+        return pd.DataFrame({
+            "Horizon": np.arange(1, horizon + 1),
+            "MAE": np.nanmean(np.abs(erreurs), axis=0),
+            "RMSE": np.sqrt(np.nanmean(erreurs ** 2, axis=0)),
+            "N": valides.sum(axis=0),
+        })
+
+
+def _matrices_segment(df_seg, features):
+    """Matrices (X, y) triées par date, calculées une seule fois et partagées par toutes les origines."""
+    df_enrichi, _, _ = preparer_donnees_segment(df_seg)
+    df_enrichi = df_enrichi.sort_values("date", kind="stable")
+    X = df_enrichi[features].fillna(0).to_numpy(dtype=float)
+    y = df_enrichi["Indicateur_moyen_Brut"].to_numpy(dtype=float)
+    return X, y
+
+
+def backtester_segments(segments_dict, mode="expanding", fenetre=None, horizon=HORIZON, taille_min=TAILLE_MIN,
+                        pas=1, n_jobs=1, model_dir="models", config=CONFIG_ENTRAINEMENT,
+                        cache_path=CACHE_BACKTEST, output_dir="outputs/backtesting"):
+    """Évaluation hors échantillon par origine glissante des modèles RF et OLS de chaque segment.
+
+    `mode="expanding"` estime sur tout l'historique avant l'origine ; `mode="rolling"`
+    sur les `fenetre` derniers trimestres (par défaut `taille_min`). Les variables
+    sont celles retenues à l'entraînement. Les forêts de toutes les origines sont
+    réparties sur `n_jobs` processus ; les résultats sont mémorisés par contenu de
+    segment, variables et paramètres. Retourne la table MAE/RMSE par horizon.
+    """
+    if mode not in ("expanding", "rolling"):
+        raise ValueError(f"mode de backtest inconnu : {mode}")
+    fenetre = (fenetre or taille_min) if mode == "rolling" else None
+    parametres = {"mode": mode, "fenetre": fenetre, "horizon": horizon, "taille_min": taille_min, "pas": pas,
+                  "random_state": config["random_state"]}
+    print(f"\n📐 Backtest {mode} : horizon {horizon} trimestres, apprentissage minimal {taille_min}")
+
+    registre = get_registre(model_dir)
+    cache = lire_json(cache_path, defaut={}) if cache_path else {}
+    tables, a_calculer = {}, {}
+    for seg, df_seg in segments_dict.items():
+        try:
+            features = list(registre.features(seg))
+            params_rf = hyperparametres_rf(seg, model_dir, config)
+            cle = hash_objet({"donnees": hash_dataframe(df_seg), "features": features, "rf": params_rf,
+                              **parametres})
+            if cle in cache:
+                tables[seg] = pd.DataFrame(cache[cle])
+                print(f"♻️ Segment {seg} inchangé : backtest réutilisé")
+                continue
+            X, y = _matrices_segment(df_seg, features)
+            origines = origines_backtest(len(X), taille_min, pas)
+            if len(origines) == 0:
+                raise ValueError(f"historique trop court ({len(X)} trimestres) pour taille_min={taille_min}")
+            a_calculer[seg] = (cle, X, y, origines, params_rf)
+        except Exception as e:
+            print(f"❌ Segment {seg} – erreur : {e}")
+
+    # Forêts : les origines de tous les segments sont découpées en paquets répartis sur les processus
+    total = sum(len(calcul[3]) for calcul in a_calculer.values())
+    n_processus, _ = repartir_jobs(n_jobs, total)
+    paquets = [(seg, paquet) for seg, (_, _, _, origines, _) in a_calculer.items()
+               for paquet in np.array_split(origines, min(n_processus, len(origines)))]
+    taches = [(a_calculer[seg][1], a_calculer[seg][2], paquet, fenetre, horizon, a_calculer[seg][4],
+               config["random_state"]) for seg, paquet in paquets]
+    if n_processus == 1:
+        sorties = [backtest_rf(*tache) for tache in taches]
+    else:
+        with ProcessPoolExecutor(max_workers=n_processus) as pool:
+            sorties = [future.result() for future in [pool.submit(backtest_rf, *tache) for tache in taches]]
+    previsions_rf = {}
+    for (seg, _), sortie in zip(paquets, sorties):
+        previsions_rf.setdefault(seg, []).append(sortie)
+
+    for seg, (cle, X, y, origines, _) in a_calculer.items():
+        try:
+            previsions = {"RF": np.concatenate(previsions_rf[seg]),
+                          "OLS": backtest_ols(X, y, origines, fenetre, horizon)}
+            table = pd.concat([erreurs_par_horizon(p, y, origines).assign(Modele=modele)
+                               for modele, p in previsions.items()], ignore_index=True)
+            tables[seg] = table
+            cache[cle] = table.to_dict("list")
+            print(f"✅ Segment {seg} – {len(origines)} origines de prévision")
+        except Exception as e:
+            print(f"❌ Segment {seg} – erreur : {e}")
+    if cache_path and a_calculer:
+        ecrire_json_atomique(cache, cache_path)
+
+    if not tables:
+        return pd.DataFrame(columns=["Segment", "Modele", "Horizon", "MAE", "RMSE", "N"])
+    resultats = pd.concat([table.assign(Segment=seg) for seg, table in sorted(tables.items())], ignore_index=True)
+    resultats = resultats[["Segment", "Modele", "Horizon", "MAE", "RMSE", "N"]]
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+        resultats.to_csv(os.path.join(output_dir, f"backtest_{mode}.csv"), index=False)
+    return resultats
@@ -1,57 +1,211 @@
-
 # src/features.py
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.feature_selection import SelectFromModel
 
-def enrichir_variables_macro(df):
+from src.instrumentation import instrumenter
+
+# Variables macro de base à partir desquelles toutes les features sont dérivées
+SOURCES_MACRO = ["PIB", "TCH_diff1", "Inflation_diff1", "IPL_diff1_hp"]
+ALIAS_MACRO = {"PIB": "PIB", "TCH_diff1": "TCH", "Inflation_diff1": "Inflation", "IPL_diff1_hp": "IPL"}
+
+# Spécification déclarative des features : (nom, opération, entrées, paramètre).
+# Une entrée peut être une variable de base, "date" ou une feature définie plus haut.
+SPEC_FEATURES = (
+    [(f"{src}_lag{k}", "lag", (src,), k) for k in (1, 2) for src in SOURCES_MACRO]
+    + [(f"{ALIAS_MACRO[src]}_ma{w}", "moyenne_mobile", (src,), w) for w in (3, 5) for src in SOURCES_MACRO]
+    + [
+        ("PIB_x_TCH", "produit", ("PIB", "TCH_diff1"), None),
+        ("PIB_x_Inflation", "produit", ("PIB", "Inflation_diff1"), None),
+        ("TCH_x_IPL", "produit", ("TCH_diff1", "IPL_diff1_hp"), None),
+        ("Inflation_x_IPL", "produit", ("Inflation_diff1", "IPL_diff1_hp"), None),
+        ("PIB_x_TCH_ma3", "produit", ("PIB", "TCH_ma3"), None),
+    ]
+    + [(f"{src}_squared", "puissance", (src,), 2) for src in SOURCES_MACRO]
+    + [
+        ("year", "calendrier", ("date",), "year"),
+        ("quarter", "calendrier", ("date",), "quarter"),
+        ("is_covid", "regime", ("date",), ("2020-03-01", "2021-06-30")),
+        ("post_covid", "regime", ("date",), ("2021-07-01", None)),
+        ("PIB_pct_change", "variation", ("PIB",), 1),
+        ("TCH_diff1_abs", "abs", ("TCH_diff1",), None),
+        ("PIB_x_TCH_squared", "produit", ("PIB", "TCH_diff1_squared"), None),
+    ]
+)
+FEATURES_ENTIERES = {"year", "quarter", "is_covid", "post_covid"}
+
+
+def _decaler(a, k):
+    """Équivalent NumPy de `shift(k)` le long de l'axe temporel (dernier axe)."""
+    out = np.full_like(a, np.nan)
+    out[..., k:] = a[..., :-k]
+    return out
+
+
+def _moyenne_mobile(a, fenetre):
+    """Équivalent NumPy de `rolling(fenetre).mean()` le long du dernier axe."""
+    out = np.full_like(a, np.nan)
+    fenetres = np.lib.stride_tricks.sliding_window_view(a, fenetre, axis=-1)
+    out[..., fenetre - 1:] = fenetres.mean(axis=-1)
+    return out
+
+
+def compiler_spec(colonnes=None, spec=SPEC_FEATURES):
+    """Sous-ensemble ordonné de la spécification nécessaire pour produire `colonnes`.
+
+    Les dépendances entre features (ex. PIB_x_TCH_ma3 → TCH_ma3) sont incluses ;
+    `colonnes=None` compile la spécification complète.
+    """
+    par_nom = {entree[0]: entree for entree in spec}
+    if colonnes is None:
+        return list(spec)
+    requises = set()
+    a_visiter = [c for c in colonnes if c in par_nom]
+    while a_visiter:
+        nom = a_visiter.pop()
+        if nom in requises:
+            continue
+        requises.add(nom)
+        a_visiter.extend(e for e in par_nom[nom][2] if e in par_nom)
+    return [entree for entree in spec if entree[0] in requises]
+
+
+def _retards_par_source(spec=SPEC_FEATURES):
+    """Nombre de trimestres passés requis sur chaque variable de base par la spécification."""
+    retards = {}
+    portee = {}
+    for nom, operation, entrees, parametre in spec:
+        if operation == "lag" or operation == "variation":
+            propre = parametre
+        elif operation == "moyenne_mobile":
+            propre = parametre - 1
+        else:
+            propre = 0
+        sources = set()
+        total = propre
+        for entree in entrees:
+            if entree in portee:
+                total = max(total, propre + portee[entree][0])
+                sources |= portee[entree][1]
+            elif entree != "date":
+                sources.add(entree)
+        portee[nom] = (total, sources)
+        for source in sources:
+            retards[source] = max(retards.get(source, 0), total)
+    return retards
+
+
+RETARDS_SOURCES = _retards_par_source()
+
+
+def calculer_features(base, dates, colonnes=None):
+    """Moteur NumPy : calcule les features de `SPEC_FEATURES` en une passe.
+
+    `base` associe chaque variable de `SOURCES_MACRO` à un tableau (..., n_trimestres),
+    par exemple (n_chemins, n_trimestres) ; `dates` est l'axe temporel commun.
+    Les résultats sont écrits dans un seul tableau contigu (n_features, ..., n_trimestres)
+    et retournés sous forme de vues par nom.
+    """
+    etapes = compiler_spec(colonnes)
+    forme = np.shape(base[SOURCES_MACRO[0]])
+    tampon = np.empty((len(etapes),) + forme)
+    dates = pd.DatetimeIndex(pd.to_datetime(dates))
+
+    valeurs = {src: np.asarray(base[src], dtype=float) for src in SOURCES_MACRO}
+    for k, (nom, operation, entrees, parametre) in enumerate(etapes):
+        out = tampon[k]
+        if operation == "lag":
+            out[...] = _decaler(valeurs[entrees[0]], parametre)
+        elif operation == "moyenne_mobile":
+            out[...] = _moyenne_mobile(valeurs[entrees[0]], parametre)
+        elif operation == "produit":
+            np.multiply(valeurs[entrees[0]], valeurs[entrees[1]], out=out)
+        elif operation == "puissance":
+            np.power(valeurs[entrees[0]], parametre, out=out)
+        elif operation == "abs":
+            np.abs(valeurs[entrees[0]], out=out)
+        elif operation == "variation":
+            with np.errstate(divide="ignore", invalid="ignore"):
+                out[...] = valeurs[entrees[0]] / _decaler(valeurs[entrees[0]], parametre) - 1
+        elif operation == "calendrier":
+            out[...] = getattr(dates, parametre).to_numpy(dtype=float)
+        elif operation == "regime":
+            debut, fin = parametre
+            masque = dates >= debut
+            if fin is not None:
+                masque &= dates <= fin
+            out[...] = masque.astype(float)
+        else:
+            raise ValueError(f"Opération inconnue : {operation}")
+        valeurs[nom] = out
+    return {nom: tampon[k] for k, (nom, *_rest) in enumerate(etapes)}
+
+
+def _lignes_valides(base, features):
+    """Dates conservées : mêmes lignes que le `dropna()` appliqué à la spécification complète."""
+    n_dates = np.shape(base[SOURCES_MACRO[0]])[-1]
+    valides = np.ones(n_dates, dtype=bool)
+    for src in SOURCES_MACRO:
+        manquant = np.isnan(np.asarray(base[src], dtype=float).reshape(-1, n_dates)).any(axis=0)
+        retard = RETARDS_SOURCES.get(src, 0)
+        fenetre = np.convolve(manquant.astype(float), np.ones(retard + 1), mode="full")[:n_dates] > 0
+        fenetre[:retard] = True
+        valides &= ~fenetre
+    for valeurs in features.values():
+        valides &= ~np.isnan(valeurs.reshape(-1, n_dates)).any(axis=0)
+    return valides
+
+
+@instrumenter()
+def enrichir_variables_macro(df, colonnes=None):
+    """Ajoute les features de `SPEC_FEATURES` (ou seulement `colonnes`) à un DataFrame trimestriel."""
     df = df.copy()
     df["date"] = pd.to_datetime(df["date"])
-    df["PIB_lag1"] = df["PIB"].shift(1)
-    df["TCH_diff1_lag1"] = df["TCH_diff1"].shift(1)
-    df["Inflation_diff1_lag1"] = df["Inflation_diff1"].shift(1)
-    df["IPL_diff1_hp_lag1"] = df["IPL_diff1_hp"].shift(1)
-    df["PIB_lag2"] = df["PIB"].shift(2)
-    df["TCH_diff1_lag2"] = df["TCH_diff1"].shift(2)
-    df["Inflation_diff1_lag2"] = df["Inflation_diff1"].shift(2)
-    df["IPL_diff1_hp_lag2"] = df["IPL_diff1_hp"].shift(2)
-    df["PIB_ma3"] = df["PIB"].rolling(window=3).mean()
-    df["TCH_ma3"] = df["TCH_diff1"].rolling(window=3).mean()
-    df["Inflation_ma3"] = df["Inflation_diff1"].rolling(window=3).mean()
-    df["IPL_ma3"] = df["IPL_diff1_hp"].rolling(window=3).mean()
-    df["PIB_ma5"] = df["PIB"].rolling(window=5).mean()
-    df["TCH_ma5"] = df["TCH_diff1"].rolling(window=5).mean()
-    df["Inflation_ma5"] = df["Inflation_diff1"].rolling(window=5).mean()
-    df["IPL_ma5"] = df["IPL_diff1_hp"].rolling(window=5).mean()
-    df["PIB_x_TCH"] = df["PIB"] * df["TCH_diff1"]
-    df["PIB_x_Inflation"] = df["PIB"] * df["Inflation_diff1"]
-    df["TCH_x_IPL"] = df["TCH_diff1"] * df["IPL_diff1_hp"]
-    df["Inflation_x_IPL"] = df["Inflation_diff1"] * df["IPL_diff1_hp"]
-    df["PIB_x_TCH_ma3"] = df["PIB"] * df["TCH_diff1"].rolling(3).mean()
-    df["PIB_squared"] = df["PIB"] ** 2
-    df["TCH_diff1_squared"] = df["TCH_diff1"] ** 2
-    df["Inflation_diff1_squared"] = df["Inflation_diff1"] ** 2
-    df["IPL_diff1_hp_squared"] = df["IPL_diff1_hp"] ** 2
-    df["year"] = df["date"].dt.year
-    df["quarter"] = df["date"].dt.quarter
-    df["is_covid"] = ((df["date"] >= "2020-03-01") & (df["date"] <= "2021-06-30")).astype(int)
-    df["post_covid"] = (df["date"] >= "2021-07-01").astype(int)
-    df["PIB_pct_change"] = df["PIB"].pct_change()
-    df["TCH_diff1_abs"] = df["TCH_diff1"].abs()
-    df["PIB_x_TCH_squared"] = df["PIB"] * (df["TCH_diff1"] ** 2)
-
-
-    df = df.dropna().reset_index(drop=True)
+    base = {src: df[src].to_numpy(dtype=float) for src in SOURCES_MACRO}
+    features = calculer_features(base, df["date"], colonnes)
+
+    valides = _lignes_valides(base, features) & df.notna().all(axis=1).to_numpy()
+    nouvelles = {}
+    for nom, valeurs in features.items():
+        valeurs = valeurs.astype(np.int64) if nom in FEATURES_ENTIERES else valeurs
+        if nom in df.columns:
+            df[nom] = valeurs
+        else:
+            nouvelles[nom] = valeurs
+    df = pd.concat([df, pd.DataFrame(nouvelles, index=df.index)], axis=1)
+
+    df = df[valides].reset_index(drop=True)
     print(f"🧪 Données enrichies : {df.shape[1]} variables disponibles.")
     return df
 
-def select_features_via_random_forest(df, target_col="Indicateur_moyen_Brut", n_estimators=100):
+
+@instrumenter()
+def enrichir_variables_macro_batch(base, dates, colonnes=None):
+    """Version vectorisée de `enrichir_variables_macro` pour un lot de chemins.
+
+    `base` associe PIB, TCH_diff1, Inflation_diff1 et IPL_diff1_hp à des tableaux
+    (n_chemins, n_trimestres) ; `dates` est commune à tous les chemins.
+    Retourne le dictionnaire des variables enrichies et les dates conservées,
+    avec les mêmes lignes que la version DataFrame.
+    """
+    dates = pd.to_datetime(pd.Series(dates)).reset_index(drop=True)
+    features = calculer_features(base, dates, colonnes)
+    valides = _lignes_valides(base, features)
+    variables = {src: np.asarray(base[src], dtype=float) for src in SOURCES_MACRO}
+    variables.update(features)
+    variables = {nom: valeurs[..., valides] for nom, valeurs in variables.items()}
+    return variables, dates[valides].reset_index(drop=True)
+
+
+def select_features_via_random_forest(df, target_col="Indicateur_moyen_Brut", n_estimators=100,
+                                      strategie="impurete", seuil="mean"):
+    # scikit-learn n'est chargé que pour la sélection, pas pour l'enrichissement des scénarios
+    from src.selection import calculer_importances, selectionner
+
     X = df.drop(columns=["date", target_col])
-    y = df[target_col].astype(str).str.replace(",", ".").astype(float)
+    y = df[target_col]
     X = X.select_dtypes(include=[np.number]).fillna(0)
-    model = RandomForestRegressor(n_estimators=n_estimators, random_state=0)
-    selector = SelectFromModel(model).fit(X, y)
-    selected_vars = list(X.columns[selector.get_support()])
+    importances, _ = calculer_importances(X, y, strategie=strategie, n_estimators=n_estimators, random_state=0,
+                                          seuil=seuil)
+    selected_vars = selectionner(importances, seuil)
     print(f"🎯 Variables sélectionnées ({len(selected_vars)}):", selected_vars)
     return selected_vars
@@ -0,0 +1,129 @@
+# src/hp_filter.py
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from src.instrumentation import instrumenter
+
+LAMBDA_TRIMESTRIEL = 1600
+
+
+@lru_cache(maxsize=64)
+def _factorisation_hp(n, lamb):
+    """Factorisation de Cholesky en bande de (I + λ D'D), mise en cache par (n, λ).
+
+    D est l'opérateur de différence seconde : la matrice est pentadiagonale, on ne
+    stocke que ses 3 sur-diagonales et sa diagonale (forme bande supérieure).
+    """
+    # scipy.linalg est chargé au premier filtrage, pas à l'import (démarrage de `main.py project`)
+    from scipy.linalg import cholesky_banded
+
+    bandes = np.zeros((3, n))
+    # Coefficients de D'D le long des diagonales 0, 1 et 2
+    diag = np.full(n, 6.0)
+    diag[[0, -1]] = 1.0
+    diag[[1, -2]] = 4.0 if n == 3 else 5.0
+    sur1 = np.full(n - 1, -4.0)
+    sur1[[0, -1]] = -2.0
+    sur2 = np.ones(n - 2)
+    bandes[2] = 1.0 + lamb * diag
+    bandes[1, 1:] = lamb * sur1
+    bandes[0, 2:] = lamb * sur2
+    return cholesky_banded(bandes, lower=False)
+
+
+def _habiller(x, tendance):
+    """Retourne (cycle, tendance) dans le type d'entrée (Series, DataFrame ou tableau)."""
+    cycle = np.asarray(x, dtype=float) - tendance
+    if isinstance(x, pd.Series):
+        return pd.Series(cycle, index=x.index, name=x.name), pd.Series(tendance, index=x.index, name=x.name)
+    if isinstance(x, pd.DataFrame):
+        return (pd.DataFrame(cycle, index=x.index, columns=x.columns),
+                pd.DataFrame(tendance, index=x.index, columns=x.columns))
+    return cycle, tendance
+
+
+@instrumenter()
+def filtre_hp(x, lamb=LAMBDA_TRIMESTRIEL, axe=0):
+    """Filtre de Hodrick-Prescott bilatéral, (cycle, tendance) comme `statsmodels.hpfilter`.
+
+    `x` peut être une série, un DataFrame (une colonne par série) ou un tableau
+    NumPy ; toutes les séries alignées le long de `axe` sont filtrées en une seule
+    résolution avec un second membre matriciel. La factorisation est réutilisée
+    tant que la longueur et λ ne changent pas.
+    """
+    valeurs = np.asarray(x, dtype=float)
+    valeurs = np.moveaxis(valeurs, axe, 0)
+    n = valeurs.shape[0]
+    if n < 3:
+        tendance = valeurs.copy()
+    else:
+        from scipy.linalg import cho_solve_banded
+        seconds_membres = valeurs.reshape(n, -1)
+        tendance = cho_solve_banded((_factorisation_hp(n, float(lamb)), False), seconds_membres)
+        tendance = tendance.reshape(valeurs.shape)
+    tendance = np.moveaxis(tendance, 0, axe)
+    return _habiller(x, tendance)
+
+
+class FiltreHPUnilateral:
+    """Filtre HP unilatéral (temps réel) : la tendance en t n'utilise que les observations ≤ t.
+
+    Implémenté par le filtre de Kalman du modèle y_t = τ_t + ε_t, Δ²τ_t = η_t avec
+    Var(ε)/Var(η) = λ ; la tendance filtrée en t coïncide avec le dernier point du
+    filtre bilatéral appliqué à l'historique jusqu'en t. L'état est conservé, si bien
+    que de nouveaux trimestres (ex. horizon d'un scénario) se filtrent sans
+    reprendre tout l'historique. Plusieurs séries de même calendrier sont traitées ensemble.
+    """
+
+    _DIFFUS = 1e10
+
+    def __init__(self, lamb=LAMBDA_TRIMESTRIEL):
+        self.lamb = float(lamb)
+        self._transition = np.array([[2.0, -1.0], [1.0, 0.0]])
+        self._etat = None
+        self._cov = np.eye(2) * self._DIFFUS
+
+    def dupliquer(self, n_series):
+        """Copie du filtre dont l'état courant (série unique) est répliqué sur `n_series` séries."""
+        copie = FiltreHPUnilateral(self.lamb)
+        copie._cov = self._cov.copy()
+        if self._etat is not None:
+            copie._etat = np.repeat(self._etat[:1], n_series, axis=0)
+        return copie
+
+    def mettre_a_jour(self, observations):
+        """Filtre de nouvelles observations (m,) ou (m, n_series) ; retourne (cycle, tendance)."""
+        obs = np.asarray(observations, dtype=float)
+        une_serie = obs.ndim == 1
+        obs = obs.reshape(len(obs), -1)
+        if self._etat is None:
+            self._etat = np.zeros((obs.shape[1], 2))
+
+        T, Q = self._transition, np.diag([1.0, 0.0])
+        tendance = np.empty_like(obs)
+        for t in range(len(obs)):
+            # Prédiction
+            etat = self._etat @ T.T
+            cov = T @ self._cov @ T.T + Q
+            # Correction : le gain ne dépend pas des données, il est commun à toutes les séries
+            gain = cov[:, 0] / (cov[0, 0] + self.lamb)
+            self._etat = etat + np.outer(obs[t] - etat[:, 0], gain)
+            self._cov = cov - np.outer(gain, cov[0, :])
+            tendance[t] = self._etat[:, 0]
+
+        cycle = obs - tendance
+        if une_serie:
+            return cycle[:, 0], tendance[:, 0]
+        return cycle, tendance
+
+
+@instrumenter()
+def filtre_hp_unilateral(x, lamb=LAMBDA_TRIMESTRIEL, axe=0):
+    """Version temps réel de `filtre_hp` pour des séries complètes (mêmes types d'entrée)."""
+    valeurs = np.moveaxis(np.asarray(x, dtype=float), axe, 0)
+    forme = valeurs.shape
+    _, tendance = FiltreHPUnilateral(lamb).mettre_a_jour(valeurs.reshape(forme[0], -1))
+    tendance = np.moveaxis(tendance.reshape(forme), 0, axe)
+    return _habiller(x, tendance)
@@ -0,0 +1,160 @@
+# src/inference.py
+import os
+import numpy as np
+
+# Nombre d'observations évaluées à la fois par le parcours vectorisé des arbres
+TAILLE_BLOC = 4096
+
+
+class ForetCompacte:
+    """Forêt de régression réduite à ses tableaux de nœuds, tous arbres concaténés.
+
+    Les feuilles pointent sur elles-mêmes. Toutes les observations descendent tous
+    les arbres niveau par niveau en opérations NumPy, sans boucle Python par arbre ;
+    à chaque niveau seuls les couples (arbre, observation) non arrivés en feuille avancent.
+    """
+
+    def __init__(self, feature, seuil, gauche, droite, valeur, racines, features):
+        self.feature = feature
+        self.seuil = seuil
+        self.gauche = gauche
+        self.droite = droite
+        self.valeur = valeur
+        self.racines = racines
+        self.features = list(features)
+        self._feuille = self.gauche == np.arange(len(self.gauche))
+
+    @classmethod
+    def depuis_sklearn(cls, model_rf, features):
+        feature, seuil, gauche, droite, valeur, racines = [], [], [], [], [], []
+        decalage = 0
+        for arbre in model_rf.estimators_:
+            t = arbre.tree_
+            n = t.node_count
+            feuille = t.children_left == -1
+            indices = np.arange(n) + decalage
+            racines.append(decalage)
+            feature.append(np.where(feuille, 0, t.feature))
+            seuil.append(t.threshold)
+            gauche.append(np.where(feuille, indices, t.children_left + decalage))
+            droite.append(np.where(feuille, indices, t.children_right + decalage))
+            valeur.append(t.value[:, 0, 0])
+            decalage += n
+        return cls(
+            np.concatenate(feature).astype(np.int32),
+            np.concatenate(seuil).astype(np.float64),
+            np.concatenate(gauche).astype(np.int32),
+            np.concatenate(droite).astype(np.int32),
+            np.concatenate(valeur).astype(np.float64),
+            np.asarray(racines, dtype=np.int32),
+            features,
+        )
+
+    def feuilles(self, X):
+        """Indice de la feuille atteinte par chaque observation dans chaque arbre : (n_arbres, n_obs)."""
+        # Même convention que scikit-learn : comparaison en float32 au seuil float64
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        n_obs, n_features = X.shape
+        X = X.ravel()
+        # Couples (arbre, observation) aplatis ; seuls ceux encore dans un nœud interne avancent
+        noeuds = np.repeat(self.racines, n_obs)
+        decalages = np.tile(np.arange(n_obs, dtype=np.int64) * n_features, len(self.racines))
+        actifs = np.arange(len(noeuds))
+        courants = noeuds
+        while len(actifs):
+            a_gauche = X[decalages + self.feature[courants]] <= self.seuil[courants]
+            courants = np.where(a_gauche, self.gauche[courants], self.droite[courants])
+            noeuds[actifs] = courants
+            internes = ~self._feuille[courants]
+            actifs, courants, decalages = actifs[internes], courants[internes], decalages[internes]
+        return noeuds.reshape(len(self.racines), n_obs)
+
+    def predict_arbres(self, X):
+        """Prédiction de chaque arbre : tableau (n_arbres, n_obs)."""
+        X = np.asarray(X, dtype=float)
+        sorties = [self.valeur[self.feuilles(X[debut:debut + TAILLE_BLOC])]
+                   for debut in range(0, len(X), TAILLE_BLOC)]
+        return np.concatenate(sorties, axis=1) if sorties else np.empty((len(self.racines), 0))
+
+    def predict(self, X):
+        return self.predict_arbres(X).mean(axis=0)
+
+
+class OLSCompact:
+    """Régression linéaire réduite à sa constante et à ses coefficients ordonnés.
+
+    `tirages` (n_tirages, 1 + n_features), optionnel, contient des coefficients
+    réestimés par bootstrap (constante en tête) pour les bandes de confiance.
+    `cov` (1 + n_features, 1 + n_features, constante en tête), `scale` (σ²) et
+    `ddl` (degrés de liberté résiduels), optionnels, servent aux intervalles de prédiction.
+    """
+
+    def __init__(self, constante, coef, features, tirages=None, cov=None, scale=None, ddl=None):
+        self.constante = float(constante)
+        self.coef = np.asarray(coef, dtype=float)
+        self.features = list(features)
+        self.tirages = None if tirages is None else np.asarray(tirages, dtype=float)
+        self.cov = None if cov is None else np.asarray(cov, dtype=float)
+        self.scale = None if scale is None else float(scale)
+        self.ddl = None if ddl is None else float(ddl)
+
+    @classmethod
+    def depuis_statsmodels(cls, model_ols, features):
+        params = model_ols.params
+        colonnes = ["const"] + list(features)
+        return cls(params["const"], params[list(features)].to_numpy(), features,
+                   cov=model_ols.cov_params().loc[colonnes, colonnes].to_numpy(),
+                   scale=model_ols.scale, ddl=model_ols.df_resid)
+
+    def predict(self, X):
+        return self.constante + np.asarray(X, dtype=float) @ self.coef
+
+    def bandes(self, X, percentiles=(5, 95)):
+        """Percentiles des prédictions sur les tirages bootstrap : (len(percentiles), n_obs)."""
+        if self.tirages is None:
+            raise ValueError("modèle exporté sans tirages bootstrap")
+        X = np.asarray(X, dtype=float)
+        predictions = self.tirages[:, :1] + self.tirages[:, 1:] @ X.T
+        return np.percentile(predictions, percentiles, axis=0)
+
+    def ecarts_types_prediction(self, X):
+        """Écart-type de prédiction √(σ² + x'Σx) de chaque observation (constante incluse) : (n_obs,)."""
+        if self.cov is None:
+            raise ValueError("modèle exporté sans matrice de covariance")
+        X = np.asarray(X, dtype=float)
+        Xc = np.concatenate([np.ones((len(X), 1)), X], axis=1)
+        return np.sqrt(self.scale + np.einsum("ij,jk,ik->i", Xc, self.cov, Xc))
+
+
+def exporter_segment_compact(path, model_rf, features_rf, model_ols, features_ols, tirages_ols=None):
+    """Écrit les modèles d'un segment au format d'inférence compact (.npz, sans pickle)."""
+    foret = ForetCompacte.depuis_sklearn(model_rf, features_rf)
+    ols = OLSCompact.depuis_statsmodels(model_ols, features_ols)
+    ols.tirages = None if tirages_ols is None else np.asarray(tirages_ols, dtype=float)
+    optionnels = {} if ols.tirages is None else {"ols_tirages": ols.tirages}
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = path + ".tmp.npz"
+    np.savez(
+        tmp,
+        rf_feature=foret.feature, rf_seuil=foret.seuil, rf_gauche=foret.gauche, rf_droite=foret.droite,
+        rf_valeur=foret.valeur, rf_racines=foret.racines,
+        features_rf=np.asarray(foret.features, dtype=str),
+        ols_constante=ols.constante, ols_coef=ols.coef, ols_cov=ols.cov, ols_scale=ols.scale, ols_ddl=ols.ddl,
+        features_ols=np.asarray(ols.features, dtype=str),
+        **optionnels,
+    )
+    os.replace(tmp, path)
+    return foret, ols
+
+
+def charger_segment_compact(path):
+    """Charge (forêt, OLS) depuis un fichier compact ; seul NumPy est nécessaire."""
+    with np.load(path) as d:
+        foret = ForetCompacte(
+            d["rf_feature"], d["rf_seuil"], d["rf_gauche"], d["rf_droite"], d["rf_valeur"],
+            d["rf_racines"], d["features_rf"].tolist(),
+        )
+        # Tirages et covariance absents des fichiers exportés avant leur introduction
+        optionnels = {nom: d[f"ols_{nom}"] for nom in ("tirages", "cov", "scale", "ddl") if f"ols_{nom}" in d.files}
+        ols = OLSCompact(d["ols_constante"], d["ols_coef"], d["features_ols"].tolist(), **optionnels)
+    return foret, ols
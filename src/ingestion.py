@@ -0,0 +1,138 @@
+# src/ingestion.py
+import os
+import glob
+import hashlib
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401
+    FORMAT_CACHE = "parquet"
+except ImportError:
+    FORMAT_CACHE = "pkl"
+
+CACHE_DIR = "data/cache"
+# À incrémenter quand la normalisation change, pour invalider les caches existants
+VERSION_NORMALISATION = 1
+
+CHEMIN_SEGMENTS = "data/brutes/Données_CCF_PAR_SEGMENT.csv"
+CHEMIN_MACRO = "data/brutes/historique_macro_variables_projet_CCF_FowardLooking_IFRS9.xlsx"
+CHEMIN_SCENARIOS = "data/Scenario_horizon3ans_propre.xlsx"
+
+
+def hash_fichier(path, taille_bloc=1 << 20):
+    """Empreinte SHA-256 du contenu brut d'un fichier."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for bloc in iter(lambda: f.read(taille_bloc), b""):
+            h.update(bloc)
+    return h.hexdigest()
+
+
+def _chemin_cache(nom, empreinte, cache_dir):
+    return os.path.join(cache_dir, f"{nom}_v{VERSION_NORMALISATION}_{empreinte[:16]}.{FORMAT_CACHE}")
+
+
+def _lire_cache(chemin):
+    if FORMAT_CACHE == "parquet":
+        return pd.read_parquet(chemin, memory_map=True)
+    return pd.read_pickle(chemin)
+
+
+def _ecrire_cache(df, chemin):
+    tmp = chemin + ".tmp"
+    if FORMAT_CACHE == "parquet":
+        df.to_parquet(tmp, index=False)
+    else:
+        df.to_pickle(tmp)
+    os.replace(tmp, chemin)
+
+
+def enregistrer_table(df, base):
+    """Écrit une table intermédiaire au format des caches, sous `base.parquet` (ou `.pkl`) ; retourne le chemin."""
+    chemin = f"{base}.{FORMAT_CACHE}"
+    os.makedirs(os.path.dirname(chemin) or ".", exist_ok=True)
+    _ecrire_cache(df, chemin)
+    return chemin
+
+
+def lire_table(base):
+    """Relit une table écrite par `enregistrer_table` (FileNotFoundError si elle n'existe pas)."""
+    return _lire_cache(f"{base}.{FORMAT_CACHE}")
+
+
+def charger_avec_cache(nom, path, lecteur, cache_dir=CACHE_DIR):
+    """Lit `path` avec `lecteur` une seule fois par version du fichier source.
+
+    Le résultat normalisé est stocké en Parquet (ou pickle si pyarrow est absent)
+    sous une clé dérivée de l'empreinte du fichier ; les versions obsolètes sont supprimées.
+    """
+    empreinte = hash_fichier(path)
+    chemin = _chemin_cache(nom, empreinte, cache_dir)
+    if os.path.exists(chemin):
+        return _lire_cache(chemin)
+
+    df = lecteur(path)
+    os.makedirs(cache_dir, exist_ok=True)
+    for ancien in glob.glob(os.path.join(cache_dir, f"{nom}_v*.*")):
+        os.remove(ancien)
+    _ecrire_cache(df, chemin)
+    print(f"📦 {path} mis en cache : {chemin}")
+    return df
+
+
+def convertir_numerique(serie):
+    """Convertit une série de nombres à virgule décimale (ex. "0,42") en float.
+
+    Les cellules vides restent manquantes ; les valeurs non vides illisibles deviennent
+    NaN et sont signalées (nombre et exemples) au moment de la lecture du fichier source.
+    """
+    if pd.api.types.is_numeric_dtype(serie):
+        return serie.astype(float)
+    texte = serie.astype(str).str.strip().str.replace(",", ".", regex=False)
+    valeurs = pd.to_numeric(texte, errors="coerce")
+    illisibles = valeurs.isna() & serie.notna() & (texte != "")
+    if illisibles.any():
+        exemples = ", ".join(repr(v) for v in serie[illisibles].astype(str).unique()[:3])
+        print(f"⚠️ {serie.name} : {int(illisibles.sum())} valeur(s) non numérique(s) remplacée(s) par NaN ({exemples})")
+    return valeurs
+
+
+def lire_segments(path):
+    df = pd.read_csv(path, sep=";")
+    df["note_ref"] = df["note_ref"].astype(int)
+    df["cod_prd_ref"] = df["cod_prd_ref"].astype(str).str.strip()
+    df["Indicateur_moyen_Brut"] = convertir_numerique(df["Indicateur_moyen_Brut"])
+    return df
+
+
+def lire_macro_historique(path):
+    df = pd.read_excel(path)
+    date = pd.to_datetime(df["date_dernier_mois"], format="%Y-%m")
+    df["cod_prd_ref"] = date.dt.year.astype(str) + "T" + date.dt.quarter.astype(str)
+    df = df.drop(columns=["date_dernier_mois"])
+    colonnes = [c for c in df.columns if c != "cod_prd_ref"]
+    df[colonnes] = df[colonnes].apply(convertir_numerique)
+    return df
+
+
+def lire_scenarios(path):
+    df = pd.read_excel(path)
+    df["date"] = pd.to_datetime(df["date"])
+    colonnes = [c for c in df.columns if c != "date"]
+    df[colonnes] = df[colonnes].apply(convertir_numerique)
+    return df
+
+
+def charger_segments(path=CHEMIN_SEGMENTS, cache_dir=CACHE_DIR):
+    """CCF par segment : note_ref entier, cod_prd_ref nettoyé, Indicateur_moyen_Brut numérique."""
+    return charger_avec_cache("segments", path, lire_segments, cache_dir)
+
+
+def charger_macro_historique(path=CHEMIN_MACRO, cache_dir=CACHE_DIR):
+    """Historique macro trimestriel indexé par cod_prd_ref (ex. "2009T1")."""
+    return charger_avec_cache("macro_historique", path, lire_macro_historique, cache_dir)
+
+
+def charger_scenarios(path=CHEMIN_SCENARIOS, cache_dir=CACHE_DIR):
+    """Feuille de scénarios (date + colonnes PIB_CENT, IPL_PESS, ...)."""
+    return charger_avec_cache("scenarios", path, lire_scenarios, cache_dir)
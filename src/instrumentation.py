@@ -0,0 +1,240 @@
+# src/instrumentation.py
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import threading
+import functools
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+from src.utils import ecrire_json_atomique
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Contexte transmis aux mesures imbriquées (ex. calculs internes à un segment)
+CONTEXTE_HERITE = ("segment", "scenario")
+COLONNES_RAPPORT = ["nom", "parent", "profondeur", "segment", "lignes", "debut_s", "duree_s", "cpu_s",
+                    "rss_debut_mo", "rss_fin_mo", "pic_rss_mo"]
+
+
+def rss_courant():
+    """Mémoire résidente du processus courant, en octets (0 si indisponible)."""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return 0
+
+
+def _mo(octets):
+    return round(octets / 2 ** 20, 1)
+
+
+class _EchantillonneurRSS(threading.Thread):
+    """Relève la mémoire résidente à intervalle régulier pour en garder le pic."""
+
+    def __init__(self, intervalle=0.02):
+        super().__init__(daemon=True)
+        self.intervalle = intervalle
+        self.pic = rss_courant()
+        self._arret = threading.Event()
+
+    def run(self):
+        while not self._arret.wait(self.intervalle):
+            self.pic = max(self.pic, rss_courant())
+
+    def arreter(self):
+        self._arret.set()
+        self.join()
+        return max(self.pic, rss_courant())
+
+
+class Journal:
+    """Mesures du run courant (une ligne par étape, segment ou appel instrumenté).
+
+    Inactif par défaut : seuls `main.py` et les benchmarks l'activent, un processus
+    de longue durée (serveur) n'accumule donc aucune mesure.
+    """
+
+    def __init__(self):
+        self.actif = False
+        self.mesures = []
+        self.debut = time.perf_counter()
+        self._verrou = threading.Lock()
+        self._pile = threading.local()
+
+    def pile(self):
+        if not hasattr(self._pile, "mesures"):
+            self._pile.mesures = []
+        return self._pile.mesures
+
+    def ajouter(self, mesure):
+        with self._verrou:
+            self.mesures.append(mesure)
+
+    def etendre(self, mesures):
+        """Ajoute des mesures venues d'un autre processus, rattachées au bloc en cours."""
+        if not self.actif:
+            return
+        pile = self.pile()
+        for mesure in mesures:
+            if pile:
+                if mesure.get("profondeur", 0) == 0:
+                    mesure["parent"] = pile[-1]["nom"]
+                mesure["profondeur"] = mesure.get("profondeur", 0) + len(pile)
+        with self._verrou:
+            self.mesures.extend(mesures)
+
+    def reinitialiser(self):
+        with self._verrou:
+            self.mesures = []
+            self.debut = time.perf_counter()
+
+
+JOURNAL = Journal()
+
+
+@contextmanager
+def mesurer(nom, lignes=None, echantillonner=False, **contexte):
+    """Mesure un bloc : temps écoulé, temps CPU, mémoire résidente (début, fin, pic) et lignes traitées.
+
+    Le dictionnaire produit est renvoyé par le `with`, ce qui permet de renseigner
+    `lignes` une fois connu. Avec `echantillonner=True`, le pic de mémoire est
+    relevé en continu par un thread ; sinon il est approché par le maximum début/fin.
+    """
+    if not JOURNAL.actif:
+        yield {}
+        return
+    pile = JOURNAL.pile()
+    herite = {cle: pile[-1][cle] for cle in CONTEXTE_HERITE if pile and cle in pile[-1]}
+    mesure = {"nom": nom, "parent": pile[-1]["nom"] if pile else None, "profondeur": len(pile), "lignes": lignes,
+              **herite, **contexte}
+    pile.append(mesure)
+    echantillonneur = _EchantillonneurRSS() if echantillonner else None
+    if echantillonneur:
+        echantillonneur.start()
+    rss_debut = rss_courant()
+    debut, cpu_debut = time.perf_counter(), time.process_time()
+    try:
+        yield mesure
+    finally:
+        duree, cpu = time.perf_counter() - debut, time.process_time() - cpu_debut
+        rss_fin = rss_courant()
+        pic = echantillonneur.arreter() if echantillonneur else max(rss_debut, rss_fin)
+        pile.pop()
+        mesure.update({
+            "debut_s": round(debut - JOURNAL.debut, 4),
+            "duree_s": round(duree, 4),
+            "cpu_s": round(cpu, 4),
+            "rss_debut_mo": _mo(rss_debut),
+            "rss_fin_mo": _mo(rss_fin),
+            "pic_rss_mo": _mo(pic),
+        })
+        JOURNAL.ajouter(mesure)
+
+
+def _lignes_defaut(args, kwargs):
+    # Taille du premier argument qui en a une (série, DataFrame, tableau)
+    for valeur in list(args) + list(kwargs.values()):
+        if hasattr(valeur, "__len__") and not isinstance(valeur, (str, dict)):
+            return len(valeur)
+    return None
+
+
+def instrumenter(nom=None):
+    """Décorateur : chaque appel est mesuré par `mesurer`, lignes = taille du premier argument."""
+    def decorateur(fonction):
+        libelle = nom or fonction.__name__
+
+        @functools.wraps(fonction)
+        def enveloppe(*args, **kwargs):
+            if not JOURNAL.actif:
+                return fonction(*args, **kwargs)
+            with mesurer(libelle, lignes=_lignes_defaut(args, kwargs)):
+                return fonction(*args, **kwargs)
+        return enveloppe
+    return decorateur
+
+
+@contextmanager
+def collecter(actif=None):
+    """Mesures enregistrées dans le bloc, pour les renvoyer d'un processus de travail au parent.
+
+    `actif` reprend l'état du journal du parent (un processus lancé par spawn ne l'hérite pas).
+    Les mesures renvoyées sont retirées du journal du processus de travail, réutilisé d'une tâche à l'autre.
+    """
+    precedent = JOURNAL.actif
+    JOURNAL.actif = precedent if actif is None else actif
+    # Pile vidée : un processus créé par fork hérite de celle du parent, que `etendre` rétablira
+    pile = JOURNAL.pile()
+    heritee, pile[:] = pile[:], []
+    debut = len(JOURNAL.mesures)
+    collectees = []
+    try:
+        yield collectees
+    finally:
+        with JOURNAL._verrou:
+            collectees.extend(JOURNAL.mesures[debut:])
+            del JOURNAL.mesures[debut:]
+        pile[:] = heritee
+        JOURNAL.actif = precedent
+
+
+@contextmanager
+def profiler(chemin="outputs/runs/profil.prof", actif=True, n_lignes=40):
+    """Profil cProfile du bloc : `.prof` (lisible par snakeviz ou tout visualiseur flame graph) et résumé texte."""
+    if not actif:
+        yield None
+        return
+    os.makedirs(os.path.dirname(chemin) or ".", exist_ok=True)
+    profil = cProfile.Profile()
+    profil.enable()
+    try:
+        yield profil
+    finally:
+        profil.disable()
+        profil.dump_stats(chemin)
+        with open(os.path.splitext(chemin)[0] + ".txt", "w", encoding="utf-8") as f:
+            pstats.Stats(profil, stream=f).sort_stats("cumulative").print_stats(n_lignes)
+        print(f"🔬 Profil enregistré : {chemin}")
+
+
+def tableau_mesures(mesures=None):
+    df = pd.DataFrame(JOURNAL.mesures if mesures is None else mesures)
+    for colonne in COLONNES_RAPPORT:
+        if colonne not in df.columns:
+            df[colonne] = None
+    autres = [c for c in df.columns if c not in COLONNES_RAPPORT]
+    return df[COLONNES_RAPPORT + autres].sort_values("debut_s", kind="stable").reset_index(drop=True)
+
+
+def ecrire_rapport(dossier="outputs/runs", nom=None, metadonnees=None):
+    """Écrit le rapport du run en JSON (métadonnées + mesures) et en CSV, puis vide le journal ; retourne le chemin JSON."""
+    os.makedirs(dossier, exist_ok=True)
+    nom = nom or datetime.now().strftime("run_%Y%m%d_%H%M%S")
+    df = tableau_mesures()
+    rapport = {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "commande": sys.argv,
+        "python": sys.version.split()[0],
+        "duree_totale_s": round(time.perf_counter() - JOURNAL.debut, 3),
+        "pic_rss_processus_mo": _mo(max([rss_courant()] + [m.get("pic_rss_mo", 0) * 2 ** 20 for m in JOURNAL.mesures])),
+        **(metadonnees or {}),
+        "mesures": json.loads(df.to_json(orient="records")),
+    }
+    chemin_json = os.path.join(dossier, f"{nom}.json")
+    ecrire_json_atomique(rapport, chemin_json)
+    df.to_csv(os.path.join(dossier, f"{nom}.csv"), index=False)
+    print(f"⏱️ Rapport d'exécution : {chemin_json}")
+    JOURNAL.reinitialiser()
+    return chemin_json
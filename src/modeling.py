@@ -1,74 +1,224 @@
 import os
 import pandas as pd
 import numpy as np
-import joblib
 import statsmodels.api as sm
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from sklearn.ensemble import RandomForestRegressor
-from sklearn.feature_selection import SelectFromModel
-from statsmodels.stats.diagnostic import het_breuschpagan
-from statsmodels.stats.stattools import durbin_watson
-from scipy.stats import shapiro, jarque_bera
+from scipy.stats import shapiro
+from threadpoolctl import threadpool_limits
 
 from src.preprocessing import convertir_cod_prd_ref_en_date
-from src.features import enrichir_variables_macro
+from src.features import enrichir_variables_macro, SPEC_FEATURES
+from src.hp_filter import LAMBDA_TRIMESTRIEL
+from src.inference import exporter_segment_compact
+from src.ols import diagnostics_residus, tirages_bootstrap
+from src.selection import calculer_importances, selectionner
+from src.instrumentation import JOURNAL, mesurer, collecter, instrumenter
+from src.utils import dump_atomique, hash_dataframe, hash_objet, lire_json, ecrire_json_atomique
 
-def entrainer_modeles_par_segment(segments_dict, output_dir="models"):
+# Configuration d'entraînement : toute modification invalide les modèles existants
+CONFIG_ENTRAINEMENT = {
+    "n_estimators": 100,
+    "random_state": 0,
+    "hp_lambda": LAMBDA_TRIMESTRIEL,
+    "features": [entree[0] for entree in SPEC_FEATURES],
+    # Sélection des variables : stratégie d'importance (voir src.selection) et seuil
+    "selection": {"strategie": "impurete", "seuil": "mean", "options": {}},
+    # Coefficients OLS réestimés par bootstrap (src.ols), exportés pour les bandes de confiance des projections
+    "bootstrap_ols": {"n_tirages": 1000, "methode": "residus"},
+}
+MANIFESTE = "manifeste_entrainement.json"
+
+
+def chemin_config_rf(output_dir, i):
+    return os.path.join(output_dir, "rf", f"segment_{i}_config.json")
+
+
+def hyperparametres_defaut(config=CONFIG_ENTRAINEMENT):
+    return {"n_estimators": config["n_estimators"], "max_depth": None, "min_samples_leaf": 1, "max_features": 1.0}
+
+
+def hyperparametres_rf(i, output_dir="models", config=CONFIG_ENTRAINEMENT):
+    """Hyperparamètres de la forêt finale du segment : ceux optimisés par `src.tuning` s'ils existent."""
+    parametres = hyperparametres_defaut(config)
+    parametres.update(lire_json(chemin_config_rf(output_dir, i), defaut={}).get("hyperparametres", {}))
+    return parametres
+
+
+def preparer_donnees_segment(df_seg):
+    """Données d'un segment enrichies : (DataFrame enrichi, variables candidates X, cible y)."""
+    df_seg = convertir_cod_prd_ref_en_date(df_seg)
+    df_enrichi = enrichir_variables_macro(df_seg)
+
+    X = df_enrichi.drop(columns=["date", "Indicateur_moyen_Brut"], errors="ignore")
+    y = df_enrichi["Indicateur_moyen_Brut"]
+    X = X.select_dtypes(include=[np.number]).fillna(0)
+    return df_enrichi, X, y
+
+
+def entrainer_segment(i, df_seg, output_dir="models", n_jobs_rf=None, config=CONFIG_ENTRAINEMENT):
+    """Entraîne RF + OLS pour un segment, sauvegarde les artefacts et retourne sa ligne de résumé."""
+    with mesurer("entrainer_segment", lignes=len(df_seg), echantillonner=True, segment=i):
+        return _entrainer_segment(i, df_seg, output_dir, n_jobs_rf, config)
+
+
+def _entrainer_segment(i, df_seg, output_dir, n_jobs_rf, config):
+    df_enrichi, X, y = preparer_donnees_segment(df_seg)
+
+    # Importances mises en cache : le seuil peut changer sans réajuster la forêt de sélection
+    selection = config["selection"]
+    importances, _ = calculer_importances(
+        X, y, strategie=selection["strategie"], n_estimators=config["n_estimators"],
+        random_state=config["random_state"], n_jobs=n_jobs_rf, seuil=selection["seuil"], **selection["options"]
+    )
+    top_vars = selectionner(importances, selection["seuil"])
+    X_sel = df_enrichi[top_vars].fillna(0)
+
+    dump_atomique(top_vars, os.path.join(output_dir, "features", f"selected_features_segment_{i}.pkl"))
+
+    model_rf = RandomForestRegressor(
+        **hyperparametres_rf(i, output_dir, config), random_state=config["random_state"], n_jobs=n_jobs_rf
+    ).fit(X_sel, y)
+    r2_rf = model_rf.score(X_sel, y)
+    dump_atomique((model_rf, top_vars), os.path.join(output_dir, "rf", f"segment_{i}.joblib"))
+
+    X_ols = sm.add_constant(X_sel)
+    model_ols = sm.OLS(y, X_ols).fit()
+    r2_ols = model_ols.rsquared
+    dump_atomique((model_ols, top_vars), os.path.join(output_dir, "ols", f"segment_{i}.joblib"))
+    # Format d'inférence compact : coefficients OLS (et leurs tirages bootstrap) et tableaux de nœuds de la forêt
+    tirages = tirages_bootstrap(X_ols.to_numpy(dtype=float), y.to_numpy(dtype=float),
+                                graine=config["random_state"], **config["bootstrap_ols"])
+    exporter_segment_compact(os.path.join(output_dir, "compact", f"segment_{i}.npz"),
+                             model_rf, top_vars, model_ols, top_vars, tirages_ols=tirages)
+
+    # DW, BP et JB en une passe sur les résidus
+    diagnostics = diagnostics_residus(model_ols.resid.to_numpy(), X_ols.to_numpy(dtype=float))
+    dw = diagnostics["dw"]
+    bp_p = diagnostics["bp_pvalue"]
+    shap_p = shapiro(model_ols.resid)[1]
+    jb_p = diagnostics["jb_pvalue"]
+
+    violations = []
+    if not (1.5 <= dw <= 2.5): violations.append("DW")
+    if bp_p <= 0.05: violations.append("BP")
+    if shap_p <= 0.05: violations.append("Shapiro")
+    if jb_p <= 0.05: violations.append("JB")
+
+    return {
+        "Segment": i,
+        "R2_RF": round(r2_rf, 3),
+        "R2_OLS": round(r2_ols, 3),
+        "Hypothèses non respectées": ", ".join(violations) if violations else "Aucune",
+        "Variables utilisées": ", ".join(top_vars)
+    }
+
+
+def _entrainer_segment_worker(i, df_seg, output_dir, n_jobs_rf, config, instrumente=False):
+    # Un seul thread BLAS par processus : le parallélisme passe par les segments et les arbres
+    # Les mesures du processus de travail sont renvoyées avec le résultat
+    with threadpool_limits(limits=1), collecter(instrumente) as mesures:
+        ligne = entrainer_segment(i, df_seg, output_dir, n_jobs_rf, config)
+    return ligne, mesures
+
+
+def _artefacts_presents(i, output_dir):
+    return all(os.path.exists(os.path.join(output_dir, *parties)) for parties in [
+        ("rf", f"segment_{i}.joblib"),
+        ("ols", f"segment_{i}.joblib"),
+        ("features", f"selected_features_segment_{i}.pkl"),
+        ("compact", f"segment_{i}.npz"),
+    ])
+
+
+def segments_inchanges(segments_dict, output_dir="models", config=CONFIG_ENTRAINEMENT):
+    """Segments dont les données et la configuration n'ont pas changé depuis le dernier entraînement.
+
+    Retourne les empreintes courantes et, pour chaque segment réutilisable, sa ligne
+    du résumé précédent.
+    """
+    empreintes = {str(i): {"donnees": hash_dataframe(df_seg),
+                           "config": hash_objet({**config, "rf": hyperparametres_rf(i, output_dir, config)})}
+                  for i, df_seg in segments_dict.items()}
+    manifeste = lire_json(os.path.join(output_dir, MANIFESTE), defaut={})
+    chemin_resume = os.path.join(output_dir, "resume_modelisation.csv")
+    if not manifeste or not os.path.exists(chemin_resume):
+        return empreintes, {}
+
+    # Lignes indexées par identifiant textuel : les clés de segment ne sont pas forcément entières
+    anciennes_lignes = {str(ligne["Segment"]): ligne for ligne in pd.read_csv(chemin_resume).to_dict("records")}
+    reutilisables = {}
+    for i in segments_dict:
+        if (manifeste.get(str(i)) == empreintes[str(i)] and str(i) in anciennes_lignes
+                and _artefacts_presents(i, output_dir)):
+            reutilisables[i] = anciennes_lignes[str(i)]
+    return empreintes, reutilisables
+
+
+def repartir_jobs(n_jobs, n_segments):
+    """Répartit `n_jobs` cœurs entre processus (segments) et threads (arbres) sans sursouscription."""
+    n_coeurs = os.cpu_count() or 1
+    if n_jobs is None or n_jobs < 1:
+        n_jobs = n_coeurs
+    n_jobs = min(n_jobs, n_coeurs)
+    n_processus = max(1, min(n_jobs, n_segments))
+    return n_processus, max(1, n_jobs // n_processus)
+
+
+@instrumenter()
+def entrainer_modeles_par_segment(segments_dict, output_dir="models", n_jobs=1, config=CONFIG_ENTRAINEMENT,
+                                  forcer=False):
+    """Entraîne tous les segments ; `n_jobs > 1` (ou -1) répartit les segments sur un pool de processus.
+
+    Les segments dont les données et la configuration sont inchangées (voir
+    `segments_inchanges`) réutilisent leurs modèles et leur ligne de résumé,
+    sauf avec `forcer=True`.
+    """
     os.makedirs(os.path.join(output_dir, "rf"), exist_ok=True)
     os.makedirs(os.path.join(output_dir, "ols"), exist_ok=True)
     os.makedirs(os.path.join(output_dir, "features"), exist_ok=True)
 
-    resume = []
-
-    for i, df_seg in segments_dict.items():
-        try:
-            df_seg = convertir_cod_prd_ref_en_date(df_seg)
-            df_enrichi = enrichir_variables_macro(df_seg)
-            df_enrichi["Indicateur_moyen_Brut"] = (
-                df_enrichi["Indicateur_moyen_Brut"]
-                .astype(str).str.replace(",", ".").astype(float)
-            )
-
-            X = df_enrichi.drop(columns=["date", "Indicateur_moyen_Brut"], errors="ignore")
-            y = df_enrichi["Indicateur_moyen_Brut"]
-            X = X.select_dtypes(include=[np.number]).fillna(0)
-
-            selector = SelectFromModel(RandomForestRegressor(n_estimators=100, random_state=0))
-            selector.fit(X, y)
-            top_vars = list(X.columns[selector.get_support()])
-            X_sel = df_enrichi[top_vars].fillna(0)
-
-            joblib.dump(top_vars, os.path.join(output_dir, "features", f"selected_features_segment_{i}.pkl"))
-
-            model_rf = RandomForestRegressor(n_estimators=100, random_state=0).fit(X_sel, y)
-            r2_rf = model_rf.score(X_sel, y)
-            joblib.dump((model_rf, top_vars), os.path.join(output_dir, "rf", f"segment_{i}.joblib"))
-
-            X_ols = sm.add_constant(X_sel)
-            model_ols = sm.OLS(y, X_ols).fit()
-            r2_ols = model_ols.rsquared
-            joblib.dump((model_ols, top_vars), os.path.join(output_dir, "ols", f"segment_{i}.joblib"))
-
-            dw = durbin_watson(model_ols.resid)
-            bp_p = het_breuschpagan(model_ols.resid, X_ols)[1]
-            shap_p = shapiro(model_ols.resid)[1]
-            jb_p = jarque_bera(model_ols.resid)[1]
-
-            violations = []
-            if not (1.5 <= dw <= 2.5): violations.append("DW")
-            if bp_p <= 0.05: violations.append("BP")
-            if shap_p <= 0.05: violations.append("Shapiro")
-            if jb_p <= 0.05: violations.append("JB")
-
-            resume.append({
-                "Segment": i,
-                "R2_RF": round(r2_rf, 3),
-                "R2_OLS": round(r2_ols, 3),
-                "Hypothèses non respectées": ", ".join(violations) if violations else "Aucune",
-                "Variables utilisées": ", ".join(top_vars)
-            })
-
-        except Exception as e:
-            print(f"Erreur segment {i} : {e}")
+    empreintes, reutilisables = segments_inchanges(segments_dict, output_dir, config)
+    if forcer:
+        reutilisables = {}
+    for i in reutilisables:
+        print(f"♻️ Segment {i} inchangé : modèles existants réutilisés")
+    resume = list(reutilisables.values())
+    a_entrainer = {i: df_seg for i, df_seg in segments_dict.items() if i not in reutilisables}
+
+    n_processus, n_jobs_rf = repartir_jobs(n_jobs, len(a_entrainer))
+    if n_processus == 1:
+        for i, df_seg in a_entrainer.items():
+            try:
+                resume.append(entrainer_segment(i, df_seg, output_dir, n_jobs_rf, config))
+            except Exception as e:
+                print(f"Erreur segment {i} : {e}")
+    else:
+        print(f"⚙️ Entraînement parallèle : {n_processus} processus × {n_jobs_rf} thread(s) par forêt")
+        with ProcessPoolExecutor(max_workers=n_processus) as pool:
+            futures = {
+                pool.submit(_entrainer_segment_worker, i, df_seg, output_dir, n_jobs_rf, config, JOURNAL.actif): i
+                for i, df_seg in a_entrainer.items()
+            }
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    ligne, mesures = future.result()
+                    JOURNAL.etendre(mesures)
+                    resume.append(ligne)
+                except Exception as e:
+                    print(f"Erreur segment {i} : {e}")
+    return enregistrer_entrainement(resume, empreintes, output_dir)
+
+
+def enregistrer_entrainement(resume, empreintes, output_dir="models"):
+    """Écrit le résumé de modélisation et le manifeste des empreintes ; retourne le résumé trié."""
+    resume = sorted(resume, key=lambda ligne: ligne["Segment"])
+
+    # Seuls les segments présents dans le résumé (entraînés ou réutilisés) sont marqués comme à jour
+    segments_ok = {str(ligne["Segment"]) for ligne in resume}
+    ecrire_json_atomique({i: h for i, h in empreintes.items() if i in segments_ok},
+                         os.path.join(output_dir, MANIFESTE))
 
     df_resume = pd.DataFrame(resume)
     os.makedirs(output_dir, exist_ok=True)
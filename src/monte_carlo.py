@@ -0,0 +1,194 @@
+# src/monte_carlo.py
+import pandas as pd
+import numpy as np
+
+from src.features import enrichir_variables_macro_batch
+from src.registry import get_registre
+from src.hp_filter import filtre_hp
+from src.plotting import FileFigures
+
+VARIABLES_MACRO = ["PIB", "IPL", "TCH", "Inflation"]
+PERCENTILES = [5, 25, 50, 75, 95]
+
+
+def extraire_chemin_scenario(df_raw, prefix):
+    """Retourne les dates et le chemin (n_trimestres, 4) d'une feuille de scénario."""
+    colonnes = [f"{var}_{prefix}" for var in VARIABLES_MACRO]
+    dates = pd.to_datetime(df_raw["date"]).reset_index(drop=True)
+    return dates, df_raw[colonnes].to_numpy(dtype=float)
+
+
+def _chocs_scenarios(df_raw, scenario, scenarios_ref):
+    """Chocs trimestriels autour des feuilles de scénarios.
+
+    Les écarts des variations trimestrielles de chaque feuille par rapport au
+    scénario simulé, complétés des variations centrées du scénario lui-même.
+    """
+    _, chemin = extraire_chemin_scenario(df_raw, scenario)
+    variations = np.diff(chemin, axis=0)
+    chocs = [variations - variations.mean(axis=0)]
+    for autre in scenarios_ref:
+        if autre == scenario:
+            continue
+        _, chemin_autre = extraire_chemin_scenario(df_raw, autre)
+        chocs.append(np.diff(chemin_autre, axis=0) - variations)
+    return np.concatenate(chocs)
+
+
+def _chocs_historiques(df_hist):
+    variations = df_hist[VARIABLES_MACRO].astype(float).diff().dropna().to_numpy()
+    return variations - variations.mean(axis=0)
+
+
+def _estimer_var1(chocs):
+    """Estime un VAR(1) sans constante sur des chocs centrés : c_t = A c_{t-1} + e_t."""
+    X, Y = chocs[:-1], chocs[1:]
+    A = np.linalg.lstsq(X, Y, rcond=None)[0].T
+    residus = Y - X @ A.T
+    sigma = np.cov(residus, rowvar=False)
+    # Rayon spectral borné pour garantir des simulations stables
+    rayon = np.max(np.abs(np.linalg.eigvals(A)))
+    if rayon >= 0.99:
+        A = A * 0.99 / rayon
+    return A, sigma
+
+
+def generer_chemins_stochastiques(df_raw, n_chemins=10000, scenario="CENT", methode="bootstrap",
+                                  df_hist=None, scenarios_ref=("CENT", "PESS", "OPT"),
+                                  taille_bloc=2, echelle=1.0, graine=0):
+    """Simule `n_chemins` trajectoires macro (PIB, IPL, TCH, Inflation) autour d'un scénario.
+
+    methode="bootstrap" : tirage par blocs de chocs trimestriels (conserve les
+    corrélations entre variables) ; methode="var" : innovations gaussiennes d'un
+    VAR(1) estimé sur ces mêmes chocs. Les chocs proviennent de l'historique macro
+    `df_hist` s'il est fourni, sinon des écarts entre feuilles de scénarios.
+    Retourne les dates et un tableau (n_chemins, n_trimestres, 4).
+    """
+    rng = np.random.default_rng(graine)
+    dates, central = extraire_chemin_scenario(df_raw, scenario)
+    n_pas = len(central) - 1
+
+    if df_hist is not None:
+        chocs = _chocs_historiques(df_hist)
+    else:
+        scenarios_ref = [s for s in scenarios_ref if f"PIB_{s}" in df_raw.columns]
+        chocs = _chocs_scenarios(df_raw, scenario, scenarios_ref)
+
+    if methode == "bootstrap":
+        n_blocs = -(-n_pas // taille_bloc)
+        debuts = rng.integers(0, len(chocs) - taille_bloc + 1, size=(n_chemins, n_blocs))
+        indices = (debuts[:, :, None] + np.arange(taille_bloc)).reshape(n_chemins, -1)[:, :n_pas]
+        innovations = chocs[indices]
+    elif methode == "var":
+        A, sigma = _estimer_var1(chocs)
+        bruit = rng.multivariate_normal(np.zeros(len(VARIABLES_MACRO)), sigma, size=(n_chemins, n_pas))
+        innovations = np.empty_like(bruit)
+        innovations[:, 0] = bruit[:, 0]
+        for t in range(1, n_pas):
+            innovations[:, t] = innovations[:, t - 1] @ A.T + bruit[:, t]
+    else:
+        raise ValueError(f"Méthode inconnue : {methode}")
+
+    ecarts = np.zeros((n_chemins, n_pas + 1, len(VARIABLES_MACRO)))
+    ecarts[:, 1:] = np.cumsum(echelle * innovations, axis=1)
+    return dates, central[None, :, :] + ecarts
+
+
+def preparer_chemins_batch(chemins, dates, filtre_unilateral=None):
+    """Équivalent vectorisé de `prepare_scenario` pour un lot de chemins (n_chemins, n_trimestres, 4).
+
+    Par défaut IPL_diff1 est filtré par HP bilatéral, tous les chemins en une seule
+    résolution. Avec `filtre_unilateral` (un `FiltreHPUnilateral` déjà alimenté par
+    l'historique), seuls les trimestres du scénario sont filtrés, en prolongement de l'historique.
+    """
+    variations = np.diff(chemins, axis=1)
+    ipl_diff1 = variations[..., VARIABLES_MACRO.index("IPL")]
+    if filtre_unilateral is None:
+        _, tendance = filtre_hp(ipl_diff1, axe=1)
+    else:
+        _, tendance = filtre_unilateral.dupliquer(len(ipl_diff1)).mettre_a_jour(ipl_diff1.T)
+        tendance = tendance.T
+    base = {
+        "PIB": chemins[:, 1:, VARIABLES_MACRO.index("PIB")],
+        "TCH_diff1": variations[..., VARIABLES_MACRO.index("TCH")],
+        "Inflation_diff1": variations[..., VARIABLES_MACRO.index("Inflation")],
+        "IPL_diff1_hp": ipl_diff1 - tendance,
+    }
+    return base, pd.Series(dates).iloc[1:].reset_index(drop=True)
+
+
+def predire_chemins_segment(variables, model_rf, features_rf, model_ols, features_ols):
+    """Prédit RF et OLS pour tous les chemins en un seul appel `predict` par modèle."""
+    n_chemins, n_dates = next(iter(variables.values())).shape
+    X_rf = np.stack([variables[f] for f in features_rf], axis=-1).reshape(-1, len(features_rf))
+    pred_rf = model_rf.predict(pd.DataFrame(X_rf, columns=features_rf))
+
+    X_ols = np.stack([variables[f] for f in features_ols], axis=-1).reshape(-1, len(features_ols))
+    params = model_ols.params
+    pred_ols = params["const"] + X_ols @ params[features_ols].to_numpy()
+    return pred_rf.reshape(n_chemins, n_dates), pred_ols.reshape(n_chemins, n_dates)
+
+
+def resumer_percentiles(dates, predictions, percentiles=PERCENTILES):
+    """Construit la table des percentiles par trimestre pour chaque modèle."""
+    df = pd.DataFrame({"date": dates})
+    for modele, pred in predictions.items():
+        quantiles = np.percentile(pred, percentiles, axis=0)
+        for q, valeurs in zip(percentiles, quantiles):
+            df[f"CCF_{modele}_p{q}"] = valeurs
+        df[f"CCF_{modele}_moyenne"] = pred.mean(axis=0)
+    return df
+
+
+def tracer_fan_chart(df_fan, scenario, seg, modele="RF", percentiles=PERCENTILES, figures=None):
+    """Ajoute le fan chart d'un segment à la file de figures (rendu immédiat sans file)."""
+    file_locale = FileFigures() if figures is None else None
+    (file_locale or figures).ajouter(
+        "fan_chart", f"outputs/figures/MC_{scenario}_Segment_{seg}_fan_chart_{modele}.png",
+        df_fan=df_fan[["date"] + [c for c in df_fan.columns if c.startswith(f"CCF_{modele}_p")]],
+        scenario=scenario, seg=seg, modele=modele, percentiles=list(percentiles),
+    )
+    if file_locale:
+        file_locale.rendre()
+
+
+def projeter_monte_carlo(*, df_raw, n_chemins=10000, scenario="CENT", methode="bootstrap",
+                         df_hist=None, filtre_unilateral=None, model_dir="models", graine=0, tracer=True,
+                         figures=None, segments=None):
+    """Projette `n_chemins` scénarios simulés pour chaque segment et résume les percentiles de CCF."""
+    print(f"\n🎲 Monte Carlo : {n_chemins} chemins autour du scénario {scenario} ({methode})")
+    dates, chemins = generer_chemins_stochastiques(
+        df_raw, n_chemins=n_chemins, scenario=scenario, methode=methode, df_hist=df_hist, graine=graine
+    )
+    base, dates_base = preparer_chemins_batch(chemins, dates, filtre_unilateral=filtre_unilateral)
+
+    registre = get_registre(model_dir)
+    modeles = {}
+    for seg in registre.segments_disponibles() if segments is None else segments:
+        try:
+            modeles[seg] = registre.modele_rf(seg) + registre.modele_ols(seg)
+        except Exception as e:
+            print(f"❌ Segment {seg} – erreur : {e}")
+
+    # Seules les features utilisées par au moins un modèle sont calculées
+    colonnes = sorted({f for _, features_rf, _, features_ols in modeles.values() for f in features_rf + features_ols})
+    variables, dates_enrichies = enrichir_variables_macro_batch(base, dates_base, colonnes=colonnes)
+
+    # Sans file fournie, les fan charts sont tracés en fin de projection
+    file_locale = figures is None
+    figures = FileFigures(actif=tracer) if file_locale else figures
+    resultats = {}
+    for seg, (model_rf, features_rf, model_ols, features_ols) in modeles.items():
+        try:
+            pred_rf, pred_ols = predire_chemins_segment(variables, model_rf, features_rf, model_ols, features_ols)
+            df_fan = resumer_percentiles(dates_enrichies, {"RF": pred_rf, "OLS": pred_ols})
+            resultats[seg] = df_fan
+            print(f"✅ Segment {seg} – {n_chemins} chemins × {len(dates_enrichies)} trimestres")
+            if tracer:
+                for modele in ["RF", "OLS"]:
+                    tracer_fan_chart(df_fan, scenario, seg, modele=modele, figures=figures)
+        except Exception as e:
+            print(f"❌ Segment {seg} – erreur : {e}")
+    if file_locale:
+        figures.rendre()
+    return resultats
@@ -0,0 +1,172 @@
+# src/ols.py
+import numpy as np
+from scipy import stats
+
+METHODES_BOOTSTRAP = ("residus", "paires")
+
+
+def avec_constante(X):
+    """Ajoute une colonne de 1 en tête du plan (dernier axe), pour un modèle ou un lot."""
+    X = np.asarray(X, dtype=float)
+    return np.concatenate([np.ones(X.shape[:-1] + (1,)), X], axis=-1)
+
+
+class ResultatsOLS:
+    """Ajustement MCO d'un modèle (X (n, p)) ou d'un lot empilé (X (b, n, p)), obtenu par QR.
+
+    Les facteurs Q et R sont conservés : de nouvelles réponses sur le même plan
+    (rééchantillonnage des résidus) se résolvent sans nouvelle factorisation.
+    """
+
+    def __init__(self, X, y, q, r, coef):
+        self.X = X
+        self.q = q
+        self.r = r
+        self.coef = coef
+        self.ajustes = np.einsum("...np,...p->...n", X, coef)
+        self.residus = y - self.ajustes
+        self.nobs, self.p = X.shape[-2:]
+        self.ddl = self.nobs - np.linalg.matrix_rank(r)
+        self.ssr = np.einsum("...n,...n->...", self.residus, self.residus)
+        centre = y - y.mean(axis=-1, keepdims=True)
+        self.r2 = 1 - self.ssr / np.einsum("...n,...n->...", centre, centre)
+
+    @property
+    def scale(self):
+        """Variance résiduelle estimée σ² = SCR / (n − rang), comme `statsmodels`."""
+        return self.ssr / self.ddl
+
+    def cov_params(self):
+        """Matrice de covariance des coefficients σ² (X'X)⁻¹ : (..., p, p)."""
+        inverse = np.linalg.pinv(np.einsum("...np,...nq->...pq", self.X, self.X))
+        return np.asarray(self.scale)[..., None, None] * inverse
+
+    def resoudre(self, Y):
+        """Coefficients pour d'autres réponses sur le même plan (un seul modèle) : Y (k, n) → (k, p)."""
+        Y = np.atleast_2d(np.asarray(Y, dtype=float))
+        if self.ddl == self.nobs - self.p:
+            return np.linalg.solve(self.r, self.q.T @ Y.T).T
+        return (np.linalg.pinv(self.X) @ Y.T).T
+
+    def predict(self, X):
+        return np.einsum("...mp,...p->...m", np.asarray(X, dtype=float), self.coef)
+
+
+def ajuster_ols(X, y):
+    """MCO par décomposition QR, pour un modèle ou un lot de modèles empilés sur le premier axe.
+
+    `X` contient déjà la constante (voir `avec_constante`). Les éléments du lot de
+    rang incomplet reçoivent la solution de norme minimale (pseudo-inverse), comme `sm.OLS`.
+    """
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    q, r = np.linalg.qr(X)
+    qty = np.einsum("...np,...n->...p", q, y)
+    plein_rang = np.linalg.matrix_rank(r) == X.shape[-1]
+    coef = np.empty(X.shape[:-2] + X.shape[-1:])
+    if np.all(plein_rang):
+        coef[...] = np.linalg.solve(r, qty[..., None])[..., 0]
+    else:
+        coef[...] = np.einsum("...pn,...n->...p", np.linalg.pinv(X), y)
+    return ResultatsOLS(X, y, q, r, coef)
+
+
+# === Diagnostics : une passe sur les résidus pour tout le lot ===
+
+def _z_asymetrie(asymetrie, n):
+    # Test d'asymétrie de D'Agostino (formules de `scipy.stats.skewtest`)
+    y = asymetrie * np.sqrt((n + 1) * (n + 3) / (6.0 * (n - 2)))
+    beta2 = 3.0 * (n ** 2 + 27 * n - 70) * (n + 1) * (n + 3) / ((n - 2.0) * (n + 5) * (n + 7) * (n + 9))
+    w2 = -1 + np.sqrt(2 * (beta2 - 1))
+    delta = 1 / np.sqrt(0.5 * np.log(w2))
+    alpha = np.sqrt(2.0 / (w2 - 1))
+    y = np.where(y == 0, 1, y)
+    return delta * np.log(y / alpha + np.sqrt((y / alpha) ** 2 + 1))
+
+
+def _z_kurtosis(kurtosis, n):
+    # Test d'aplatissement d'Anscombe et Glynn (formules de `scipy.stats.kurtosistest`)
+    esperance = 3.0 * (n - 1) / (n + 1)
+    variance = 24.0 * n * (n - 2) * (n - 3) / ((n + 1) * (n + 1.0) * (n + 3) * (n + 5))
+    x = (kurtosis - esperance) / np.sqrt(variance)
+    sqrtbeta1 = 6.0 * (n * n - 5 * n + 2) / ((n + 7) * (n + 9)) * np.sqrt(6.0 * (n + 3) * (n + 5) / (n * (n - 2) * (n - 3)))
+    a = 6.0 + 8.0 / sqrtbeta1 * (2.0 / sqrtbeta1 + np.sqrt(1 + 4.0 / sqrtbeta1 ** 2))
+    terme1 = 1 - 2 / (9.0 * a)
+    denominateur = 1 + x * np.sqrt(2 / (a - 4.0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        terme2 = np.sign(denominateur) * np.where(denominateur == 0.0, np.nan,
+                                                  np.power((1 - 2.0 / a) / np.abs(denominateur), 1 / 3.0))
+    return (terme1 - terme2) / np.sqrt(2 / (9.0 * a))
+
+
+def diagnostics_residus(residus, X, q=None):
+    """Durbin-Watson, Breusch-Pagan, Jarque-Bera et normalité de D'Agostino-Pearson, vectorisés.
+
+    `residus` (..., n) et `X` (..., n, p) avec constante ; `q` (facteur QR de X de
+    plein rang) évite une nouvelle factorisation. Sans `q`, une base de l'espace
+    colonne est tirée de la SVD de X, ce qui couvre aussi les plans de rang incomplet.
+    Mêmes statistiques que `durbin_watson`, `het_breuschpagan` (version de Koenker)
+    et `jarque_bera` de statsmodels, et que `scipy.stats.normaltest`. Retourne un
+    dictionnaire de tableaux de forme (...).
+    """
+    e = np.asarray(residus, dtype=float)
+    n = e.shape[-1]
+    if q is None:
+        u, s, _ = np.linalg.svd(np.asarray(X, dtype=float), full_matrices=False)
+        retenues = s > s[..., :1] * max(u.shape[-2:]) * np.finfo(float).eps
+        q = u * retenues[..., None, :]
+    e2 = e ** 2
+    ssr = e2.sum(axis=-1)
+
+    # Moments centrés des résidus, partagés par Jarque-Bera et D'Agostino-Pearson
+    centre = e - e.mean(axis=-1, keepdims=True)
+    m2 = (centre ** 2).mean(axis=-1)
+    asymetrie = (centre ** 3).mean(axis=-1) / m2 ** 1.5
+    kurtosis = (centre ** 4).mean(axis=-1) / m2 ** 2
+    jb = n / 6.0 * (asymetrie ** 2 + (kurtosis - 3) ** 2 / 4)
+    k2 = _z_asymetrie(asymetrie, n) ** 2 + _z_kurtosis(kurtosis, n) ** 2
+
+    # Breusch-Pagan : n·R² de la régression des résidus au carré sur X (même facteur Q)
+    ajustes_e2 = np.einsum("...np,...p->...n", q, np.einsum("...np,...n->...p", q, e2))
+    centre_e2 = e2 - e2.mean(axis=-1, keepdims=True)
+    r2_e2 = 1 - ((e2 - ajustes_e2) ** 2).sum(axis=-1) / (centre_e2 ** 2).sum(axis=-1)
+    bp = n * r2_e2
+
+    return {
+        "dw": (np.diff(e, axis=-1) ** 2).sum(axis=-1) / ssr,
+        "bp_stat": bp,
+        "bp_pvalue": stats.chi2.sf(bp, q.shape[-1] - 1),  # p − 1 degrés de liberté, comme statsmodels
+        "jb_stat": jb,
+        "jb_pvalue": stats.chi2.sf(jb, 2),
+        "asymetrie": asymetrie,
+        "kurtosis": kurtosis,
+        "normalite_stat": k2,
+        "normalite_pvalue": stats.chi2.sf(k2, 2),
+    }
+
+
+# === Bootstrap ===
+
+def tirages_bootstrap(X, y, n_tirages=1000, methode="residus", graine=0, taille_lot=256):
+    """Coefficients MCO réestimés sur `n_tirages` rééchantillons : tableau (n_tirages, p).
+
+    "residus" : y* = ŷ + e* avec résidus tirés avec remise ; le plan ne change pas,
+    tous les tirages sont résolus avec la même factorisation. "paires" : lignes
+    (x, y) tirées avec remise, ajustées par lots empilés de `taille_lot` tirages.
+    """
+    if methode not in METHODES_BOOTSTRAP:
+        raise ValueError(f"méthode de bootstrap inconnue : {methode}")
+    X = np.asarray(X, dtype=float)
+    y = np.asarray(y, dtype=float)
+    rng = np.random.default_rng(graine)
+    indices = rng.integers(0, len(y), size=(n_tirages, len(y)))
+    if methode == "residus":
+        base = ajuster_ols(X, y)
+        return base.resoudre(base.ajustes + base.residus[indices])
+    return np.concatenate([ajuster_ols(X[lot], y[lot]).coef
+                           for lot in np.array_split(indices, max(1, -(-n_tirages // taille_lot)))])
+
+
+def bandes_confiance(X, tirages, percentiles=(5, 95)):
+    """Percentiles des prédictions X β* sur les tirages : tableau (len(percentiles), n_obs)."""
+    return np.percentile(np.asarray(X, dtype=float) @ np.asarray(tirages).T, percentiles, axis=-1)
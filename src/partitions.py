@@ -0,0 +1,199 @@
+# src/partitions.py
+import os
+import time
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from threadpoolctl import threadpool_limits
+
+from src.features import enrichir_variables_macro
+from src.modeling import (
+    CONFIG_ENTRAINEMENT, entrainer_segment, segments_inchanges, enregistrer_entrainement, repartir_jobs,
+)
+from src.preprocessing import CLE_SEGMENT, decouvrir_segments, partitionner, substituer_cycle_hp, fusionner_macro
+from src.registry import get_registre
+from src.scenario_projection import prepare_scenario, projeter_segment, ajouter_figure_projection
+from src.stationarity import (
+    TRANSFORMATIONS, construire_grille, executer_grille, segments_non_stationnaires, appliquer_hp_filter_segments,
+)
+from src.visualization import visualiser_predictions
+from src.plotting import FileFigures
+from src.instrumentation import JOURNAL, mesurer, collecter
+from src.utils import ecrire_json_atomique
+
+DOSSIER_PARTITIONS = "outputs/partitions"
+
+
+def dossier_partition(dossier, seg):
+    return os.path.join(dossier, f"segment_{seg}")
+
+
+def preparer_partition(seg, df_seg, macro, cle=CLE_SEGMENT, cache_path=None):
+    """Étapes 5 et 6 de `main.py` pour un seul segment : cycle HP si non stationnaire, puis fusion macro."""
+    df_seg = df_seg.copy()
+    if seg in segments_non_stationnaires(df_seg, cle, cache_path=cache_path):
+        df_seg = substituer_cycle_hp(appliquer_hp_filter_segments(df_seg, [seg], cle), [seg], cle)
+    return fusionner_macro(df_seg, macro)
+
+
+def traiter_partition(seg, df_seg, macro, scenarios_enrichis, dossier=DOSSIER_PARTITIONS, model_dir="models",
+                      config=CONFIG_ENTRAINEMENT, forcer=False, n_jobs_rf=None, modele="RF", tracer=True,
+                      incertitude=False, cle=CLE_SEGMENT):
+    """Stationnarité, entraînement et projection d'un segment, sorties écrites dans `dossier/segment_{seg}`.
+
+    Une erreur interrompt seulement ce segment : elle est consignée dans `statut.json`
+    avec l'étape en cause. Retourne le statut, la ligne de résumé, l'empreinte
+    d'entraînement et les figures à tracer.
+    """
+    sortie_dir = dossier_partition(dossier, seg)
+    os.makedirs(sortie_dir, exist_ok=True)
+    chemin_predictions = os.path.join(sortie_dir, "predictions.csv")
+    if os.path.exists(chemin_predictions):
+        os.remove(chemin_predictions)
+
+    debut = time.perf_counter()
+    statut = {"segment": seg, "statut": "ok", "etape": None, "erreur": None, "lignes": len(df_seg),
+              "reutilise": False}
+    sortie = {"statut": statut, "resume": None, "empreinte": None, "figures": []}
+    figures = FileFigures(actif=tracer, cache_path=None)
+    etape = "stationnarite"
+    try:
+        with mesurer("partition", lignes=len(df_seg), segment=seg):
+            # Grille complète du segment ; cache propre à la partition, sans écriture concurrente
+            grille = construire_grille({f"Segment {seg}": df_seg["Indicateur_moyen_Brut"]}, tuple(TRANSFORMATIONS),
+                                       ("ADF", "KPSS"), ("c", "ct"))
+            cache_grille = os.path.join(sortie_dir, "cache_stationnarite.json")
+            executer_grille(grille, cache_path=cache_grille).to_csv(os.path.join(sortie_dir, "stationnarite.csv"),
+                                                                    index=False)
+
+            etape = "preparation"
+            df_modele = preparer_partition(seg, df_seg, macro, cle, cache_path=cache_grille)
+
+            etape = "entrainement"
+            empreintes, reutilisables = segments_inchanges({seg: df_modele}, model_dir, config)
+            if seg in reutilisables and not forcer:
+                ligne, statut["reutilise"] = reutilisables[seg], True
+            else:
+                ligne = entrainer_segment(seg, df_modele, model_dir, n_jobs_rf, config)
+            ecrire_json_atomique(ligne, os.path.join(sortie_dir, "resume.json"))
+            sortie["resume"], sortie["empreinte"] = ligne, empreintes[str(seg)]
+
+            etape = "projection"
+            registre = get_registre(model_dir)
+            resultats = {scenario: {seg: projeter_segment(registre, seg, df_enriched, incertitude)}
+                         for scenario, df_enriched in scenarios_enrichis.items()}
+            pd.concat([preds[seg].assign(segment=seg, scenario=scenario) for scenario, preds in resultats.items()]
+                      ).to_csv(chemin_predictions, index=False)
+
+            for scenario, preds in resultats.items():
+                ajouter_figure_projection(figures, preds[seg], scenario, seg)
+            visualiser_predictions(resultats, {seg: df_modele}, modele=modele, model_dir=model_dir, figures=figures)
+    except Exception as e:
+        statut.update({"statut": "erreur", "etape": etape, "erreur": str(e)})
+
+    statut["duree_s"] = round(time.perf_counter() - debut, 3)
+    ecrire_json_atomique(statut, os.path.join(sortie_dir, "statut.json"))
+    sortie["figures"] = figures.specs
+    return sortie
+
+
+def _traiter_partition_worker(*args, instrumente=False, **kwargs):
+    # Un seul thread BLAS par processus ; les mesures du processus de travail sont renvoyées au parent
+    with threadpool_limits(limits=1), collecter(instrumente) as mesures:
+        sortie = traiter_partition(*args, **kwargs)
+    sortie["mesures"] = mesures
+    return sortie
+
+
+def consolider_predictions(dossier, segments, scenarios, output_dir="outputs/predictions"):
+    """Regroupe les prédictions des partitions en un CSV par scénario, une partition à la fois."""
+    os.makedirs(output_dir, exist_ok=True)
+    chemins = {scenario: os.path.join(output_dir, f"predictions_{scenario}.csv") for scenario in scenarios}
+    temporaires = {scenario: chemin + ".tmp" for scenario, chemin in chemins.items()}
+    entetes = dict.fromkeys(scenarios, True)
+    for seg in segments:
+        chemin = os.path.join(dossier_partition(dossier, seg), "predictions.csv")
+        if not os.path.exists(chemin):
+            continue
+        for scenario, df_pred in pd.read_csv(chemin).groupby("scenario", sort=False):
+            if scenario not in temporaires:
+                continue
+            df_pred.drop(columns="scenario").to_csv(temporaires[scenario], mode="w" if entetes[scenario] else "a",
+                                                    header=entetes[scenario], index=False)
+            entetes[scenario] = False
+    for scenario, temporaire in temporaires.items():
+        if os.path.exists(temporaire):
+            os.replace(temporaire, chemins[scenario])
+            print(f"Fichier exporté : {chemins[scenario]}")
+
+
+def executer_par_partition(segment_df, macro, df_scenarios, scenarios=("CENT", "PESS", "OPT"), cle=CLE_SEGMENT,
+                           dossier=DOSSIER_PARTITIONS, model_dir="models", n_jobs=1, config=CONFIG_ENTRAINEMENT,
+                           forcer=False, modele="RF", figures=None, incertitude=False):
+    """Pipeline partitionné : chaque segment découvert dans les données suit seul stationnarité,
+    entraînement et projection, puis ses sorties sont écrites dans sa partition.
+
+    Les partitions sont produites par un unique `groupby` et soumises au plus
+    `2 × n_processus` à la fois, si bien que la mémoire reste bornée quel que soit
+    le nombre de segments. Un segment en échec n'interrompt pas les autres.
+    Retourne (statuts par segment, résumé de modélisation).
+    """
+    segments = decouvrir_segments(segment_df, cle)
+    n_processus, n_jobs_rf = repartir_jobs(n_jobs, len(segments))
+    print(f"\n🧩 Pipeline partitionné : {len(segments)} segments, {n_processus} processus")
+    scenarios_enrichis = {scenario: enrichir_variables_macro(prepare_scenario(df_scenarios, scenario))
+                          for scenario in scenarios}
+    options = {"dossier": dossier, "model_dir": model_dir, "config": config, "forcer": forcer,
+               "n_jobs_rf": n_jobs_rf, "modele": modele, "tracer": figures is not None and figures.actif,
+               "incertitude": incertitude, "cle": cle}
+
+    statuts, resume, empreintes = [], [], {}
+
+    def recevoir(seg, sortie):
+        JOURNAL.etendre(sortie.get("mesures", []))
+        statut = sortie["statut"]
+        statuts.append(statut)
+        if sortie["resume"] is not None:
+            resume.append(sortie["resume"])
+            empreintes[str(seg)] = sortie["empreinte"]
+        if statut["statut"] == "ok":
+            print(f"✅ Segment {seg} – {'modèles réutilisés' if statut['reutilise'] else 'entraîné'}, "
+                  f"{statut['duree_s']} s")
+        else:
+            print(f"❌ Segment {seg} – erreur ({statut['etape']}) : {statut['erreur']}")
+        for spec in sortie["figures"]:
+            figures.ajouter(spec["type"], spec["path"], **spec["donnees"])
+
+    def echec(seg, e):
+        statuts.append({"segment": seg, "statut": "erreur", "etape": "processus", "erreur": str(e)})
+        print(f"❌ Segment {seg} – erreur : {e}")
+
+    if n_processus == 1:
+        for seg, df_seg in partitionner(segment_df, cle):
+            recevoir(seg, traiter_partition(seg, df_seg, macro, scenarios_enrichis, **options))
+    else:
+        with ProcessPoolExecutor(max_workers=n_processus) as pool:
+            en_cours = {}
+
+            def recuperer(termines):
+                for future in termines:
+                    seg = en_cours.pop(future)
+                    try:
+                        recevoir(seg, future.result())
+                    except Exception as e:
+                        echec(seg, e)
+
+            for seg, df_seg in partitionner(segment_df, cle):
+                if len(en_cours) >= 2 * n_processus:
+                    recuperer(wait(en_cours, return_when=FIRST_COMPLETED).done)
+                en_cours[pool.submit(_traiter_partition_worker, seg, df_seg, macro, scenarios_enrichis,
+                                     instrumente=JOURNAL.actif, **options)] = seg
+            recuperer(wait(en_cours).done)
+
+    df_statuts = pd.DataFrame(statuts).sort_values("segment").reset_index(drop=True)
+    os.makedirs(dossier, exist_ok=True)
+    df_statuts.to_csv(os.path.join(dossier, "statuts.csv"), index=False)
+    df_resume = enregistrer_entrainement(resume, empreintes, model_dir)
+    consolider_predictions(dossier, df_statuts.loc[df_statuts["statut"] == "ok", "segment"], scenarios)
+    n_erreurs = int((df_statuts["statut"] != "ok").sum())
+    print(f"🧩 {len(segments) - n_erreurs} segments traités, {n_erreurs} en erreur (détail : {dossier}/statuts.csv)")
+    return df_statuts, df_resume
@@ -0,0 +1,185 @@
+# src/plotting.py
+import os
+import hashlib
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from src.utils import hash_dataframe, hash_objet, lire_json, ecrire_json_atomique
+
+CACHE_FIGURES = "outputs/cache/figures.json"
+# À incrémenter si le rendu d'une figure change, pour forcer un nouveau tracé
+VERSION_RENDU = 1
+COULEURS_SCENARIOS = {"CENT": "blue", "PESS": "red", "OPT": "green"}
+
+
+# === Rendus : chaque fonction construit une figure à partir de données déjà calculées ===
+
+def _pyplot():
+    # matplotlib n'est importé qu'au premier rendu : collecter des figures ne le charge pas
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def bornes_bande(colonnes, prefixe):
+    """(percentile bas, colonne bas, percentile haut, colonne haut) des colonnes `<prefixe><q>`, ou None."""
+    bandes = sorted((int(c[len(prefixe):]), c) for c in colonnes
+                    if c.startswith(prefixe) and c[len(prefixe):].isdigit())
+    if len(bandes) < 2:
+        return None
+    (bas, col_bas), (haut, col_haut) = bandes[0], bandes[-1]
+    return bas, col_bas, haut, col_haut
+
+
+def _figure_projection(df_result, scenario, seg):
+    fig, ax = _pyplot().subplots(figsize=(10, 4))
+    ligne_rf, = ax.plot(df_result["date"], df_result["CCF_RF"], label="RF", linestyle="-", marker="x")
+    ligne_ols, = ax.plot(df_result["date"], df_result["CCF_OLS"], label="OLS", linestyle="--", marker="o")
+    # Bandes : quantiles des arbres RF, confiance OLS (bootstrap), intervalle de prédiction OLS
+    for prefixe, ligne, libelle, remplie in (("CCF_RF_p", ligne_rf, "RF p{}–p{} (arbres)", True),
+                                            ("CCF_OLS_p", ligne_ols, "OLS p{}–p{} (bootstrap)", True),
+                                            ("CCF_OLS_ip", ligne_ols, "OLS intervalle de prédiction p{}–p{}", False)):
+        bornes = bornes_bande(df_result.columns, prefixe)
+        if bornes is None:
+            continue
+        bas, col_bas, haut, col_haut = bornes
+        if remplie:
+            ax.fill_between(df_result["date"], df_result[col_bas], df_result[col_haut], alpha=0.2,
+                            color=ligne.get_color(), label=libelle.format(bas, haut))
+        else:
+            ax.plot(df_result["date"], df_result[col_bas], linestyle=":", color=ligne.get_color(),
+                    label=libelle.format(bas, haut))
+            ax.plot(df_result["date"], df_result[col_haut], linestyle=":", color=ligne.get_color())
+    ax.set_title(f"{scenario} – Segment {seg} – CCF projeté (RF vs OLS)")
+    ax.set_xlabel("Date")
+    ax.set_ylabel("CCF prédite")
+    ax.grid(True)
+    ax.legend()
+    fig.tight_layout()
+    return fig
+
+
+def _figure_historique(df_hist, df_pred, seg, modele):
+    fig, ax = _pyplot().subplots(figsize=(12, 5))
+    ax.plot(df_hist["trimestre"], df_hist["Indicateur_moyen_Brut"],
+            label="Historique réel", marker="o", linestyle="--", color="black")
+    for scenario, df_scen in df_pred.groupby("scenario", sort=False):
+        ligne, = ax.plot(df_scen["trimestre"], df_scen["CCF"], label=f"{scenario} – {modele}",
+                         marker="x", linestyle="-", color=COULEURS_SCENARIOS.get(scenario))
+        if {"CCF_bas", "CCF_haut"} <= set(df_scen.columns) and df_scen["CCF_bas"].notna().any():
+            ax.fill_between(df_scen["trimestre"], df_scen["CCF_bas"], df_scen["CCF_haut"], alpha=0.15,
+                            color=ligne.get_color())
+    ax.set_title(f"Segment {seg} – CCF ({modele}) : Réel + Prédictions")
+    ax.set_xlabel("Trimestre")
+    ax.set_ylabel("CCF")
+    ax.grid(True)
+    ax.legend()
+    ax.tick_params(axis="x", labelrotation=45)
+    fig.tight_layout()
+    return fig
+
+
+def _figure_fan_chart(df_fan, scenario, seg, modele, percentiles):
+    fig, ax = _pyplot().subplots(figsize=(10, 4))
+    milieu = len(percentiles) // 2
+    for k in range(milieu):
+        bas, haut = percentiles[k], percentiles[-k - 1]
+        ax.fill_between(df_fan["date"], df_fan[f"CCF_{modele}_p{bas}"], df_fan[f"CCF_{modele}_p{haut}"],
+                        alpha=0.2 + 0.2 * k, color="tab:blue", label=f"p{bas}–p{haut}")
+    ax.plot(df_fan["date"], df_fan[f"CCF_{modele}_p{percentiles[milieu]}"],
+            color="tab:blue", marker="x", label="Médiane")
+    ax.set_title(f"{scenario} – Segment {seg} – CCF Monte Carlo ({modele})")
+    ax.set_xlabel("Date")
+    ax.set_ylabel("CCF prédite")
+    ax.grid(True)
+    ax.legend()
+    fig.tight_layout()
+    return fig
+
+
+RENDUS = {
+    "projection": _figure_projection,
+    "historique": _figure_historique,
+    "fan_chart": _figure_fan_chart,
+}
+
+
+def _empreinte(spec):
+    """Empreinte d'une figure : type, chemin et contenu des données d'entrée."""
+    h = hashlib.sha256(f"{spec['type']}|{spec['path']}|{VERSION_RENDU}".encode())
+    for nom, valeur in sorted(spec["donnees"].items()):
+        contenu = hash_dataframe(valeur) if isinstance(valeur, pd.DataFrame) else hash_objet(valeur)
+        h.update(f"|{nom}={contenu}".encode())
+    return h.hexdigest()
+
+
+def rendre_figure(spec):
+    """Trace et enregistre une figure (PNG écrit atomiquement) ; retourne l'erreur éventuelle."""
+    try:
+        fig = RENDUS[spec["type"]](**spec["donnees"])
+        dossier = os.path.dirname(spec["path"]) or "."
+        os.makedirs(dossier, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=dossier, prefix=".tmp_", suffix=".png")
+        os.close(fd)
+        try:
+            fig.savefig(tmp, format="png")
+            os.replace(tmp, spec["path"])
+        finally:
+            _pyplot().close(fig)
+            if os.path.exists(tmp):
+                os.remove(tmp)
+        return None
+    except Exception as e:
+        return str(e)
+
+
+class FileFigures:
+    """Figures collectées pendant la projection puis tracées ensemble, hors des boucles de calcul.
+
+    Avec `actif=False`, rien n'est collecté ni tracé. Une figure dont les données
+    d'entrée n'ont pas changé depuis le dernier rendu (et dont le PNG existe) n'est
+    pas retracée.
+    """
+
+    def __init__(self, actif=True, cache_path=CACHE_FIGURES):
+        self.actif = actif
+        self.cache_path = cache_path
+        self.specs = []
+
+    def ajouter(self, type_figure, path, **donnees):
+        if self.actif:
+            self.specs.append({"type": type_figure, "path": path, "donnees": donnees})
+
+    def rendre(self, n_jobs=1, forcer=False):
+        """Trace les figures en attente, sur `n_jobs` processus (-1 = tous les cœurs)."""
+        specs, self.specs = self.specs, []
+        if not specs:
+            return []
+        cache = lire_json(self.cache_path, defaut={}) if self.cache_path else {}
+        empreintes = [_empreinte(spec) for spec in specs]
+        a_rendre = [(spec, empreinte) for spec, empreinte in zip(specs, empreintes)
+                    if forcer or cache.get(spec["path"]) != empreinte or not os.path.exists(spec["path"])]
+        print(f"\n🖼️ Figures : {len(a_rendre)} à tracer, {len(specs) - len(a_rendre)} inchangée(s)")
+
+        if n_jobs == 1 or len(a_rendre) <= 1:
+            erreurs = [rendre_figure(spec) for spec, _ in a_rendre]
+        else:
+            n_processus = min(n_jobs if n_jobs > 0 else (os.cpu_count() or 1), len(a_rendre))
+            with ProcessPoolExecutor(max_workers=n_processus) as pool:
+                erreurs = list(pool.map(rendre_figure, [spec for spec, _ in a_rendre]))
+
+        traces = []
+        for (spec, empreinte), erreur in zip(a_rendre, erreurs):
+            if erreur:
+                print(f"❌ Figure {spec['path']} – erreur : {erreur}")
+                cache.pop(spec["path"], None)
+            else:
+                cache[spec["path"]] = empreinte
+                traces.append(spec["path"])
+                print(f"Figure enregistrée : {spec['path']}")
+        if self.cache_path and a_rendre:
+            ecrire_json_atomique(cache, self.cache_path)
+        return traces
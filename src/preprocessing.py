@@ -1,6 +1,11 @@
 # src/preprocessing.py
 import pandas as pd
 
+CLE_SEGMENT = "note_ref"
+# Colonnes macro brutes retirées après fusion : seules leurs transformations servent de variables
+COLONNES_MACRO_RETIREES = ["cycle_hp", "PIB_diff1", "IPL", "TCH", "Inflation", "IPL_diff1"]
+
+
 def convertir_cod_prd_ref_en_date(df):
     df = df.copy()
     df["period"] = df["cod_prd_ref"].str.replace("T", "Q")
@@ -8,4 +13,30 @@ def convertir_cod_prd_ref_en_date(df):
     df["date"] = pd.PeriodIndex(df["period"].astype(str), freq="Q").to_timestamp()
     df["year"] = df["period"].dt.year
     df["quarter"] = df["period"].dt.quarter
-    return df
\ No newline at end of file
+    return df
+
+
+def decouvrir_segments(df, cle=CLE_SEGMENT):
+    """Identifiants de segment présents dans les données, triés."""
+    return sorted(df[cle].dropna().unique().tolist())
+
+
+def partitionner(df, cle=CLE_SEGMENT):
+    """Découpe `df` par segment en un seul `groupby` ; chaque partition est produite à la demande."""
+    for seg, df_seg in df.groupby(cle, sort=True):
+        yield (seg.item() if hasattr(seg, "item") else seg), df_seg
+
+
+def substituer_cycle_hp(segment_df, segments_hp, cle=CLE_SEGMENT):
+    """Remplace le CCF brut par son cycle HP (colonne `cycle_hp`) pour les segments de `segments_hp`."""
+    if "cycle_hp" not in segment_df.columns:
+        return segment_df
+    hp = segment_df[cle].isin(segments_hp)
+    segment_df.loc[hp, "Indicateur_moyen_Brut"] = segment_df.loc[hp, "cycle_hp"]
+    return segment_df
+
+
+def fusionner_macro(segment_df, macro):
+    """Ajoute les variables macro du trimestre à chaque ligne de segment."""
+    df = pd.merge(segment_df, macro, on="cod_prd_ref", how="left")
+    return df.drop(columns=COLONNES_MACRO_RETIREES, errors="ignore")
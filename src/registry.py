@@ -0,0 +1,127 @@
+# src/registry.py
+import os
+import re
+from collections import OrderedDict
+
+from src.inference import ForetCompacte, OLSCompact, charger_segment_compact
+
+
+class RegistreModeles:
+    """Registre des artefacts de segment (RF, OLS, features) chargés une seule fois.
+
+    Les objets sont gardés dans un cache LRU indexé par chemin de fichier ; une
+    entrée est rechargée dès que la date de modification ou la taille du fichier
+    change.
+    """
+
+    def __init__(self, model_dir="models", taille_max=32):
+        self.model_dir = model_dir
+        self.taille_max = taille_max
+        self._cache = OrderedDict()
+        self._avertis = set()
+
+    def _signature(self, chemin):
+        stat = os.stat(chemin)
+        return stat.st_mtime_ns, stat.st_size
+
+    def charger(self, *parties, lecteur=None):
+        chemin = os.path.join(self.model_dir, *parties)
+        signature = self._signature(chemin)
+        entree = self._cache.get(chemin)
+        if entree is not None and entree[0] == signature:
+            self._cache.move_to_end(chemin)
+            return entree[1]
+
+        if lecteur is None:
+            # joblib (et scikit-learn/statsmodels au dépicklage) seulement pour les artefacts complets
+            import joblib
+            objet = joblib.load(chemin)
+        else:
+            objet = lecteur(chemin)
+        self._cache[chemin] = (signature, objet)
+        self._cache.move_to_end(chemin)
+        while len(self._cache) > self.taille_max:
+            self._cache.popitem(last=False)
+        return objet
+
+    def modele_rf(self, seg):
+        return self.charger("rf", f"segment_{seg}.joblib")
+
+    def modele_ols(self, seg):
+        return self.charger("ols", f"segment_{seg}.joblib")
+
+    def features(self, seg):
+        return self.charger("features", f"selected_features_segment_{seg}.pkl")
+
+    def segment(self, seg):
+        model_rf, features_rf = self.modele_rf(seg)
+        model_ols, features_ols = self.modele_ols(seg)
+        return {
+            "rf": model_rf,
+            "features_rf": features_rf,
+            "ols": model_ols,
+            "features_ols": features_ols,
+            "features": self.features(seg),
+        }
+
+    def modeles_compacts(self, seg):
+        """(ForetCompacte, OLSCompact) du segment, lus depuis `compact/segment_{seg}.npz`.
+
+        Ce chargement ne nécessite que NumPy. Pour des modèles entraînés avant
+        l'export compact, la conversion est faite à la volée depuis les artefacts joblib.
+        """
+        if os.path.exists(os.path.join(self.model_dir, "compact", f"segment_{seg}.npz")):
+            return self.charger("compact", f"segment_{seg}.npz", lecteur=charger_segment_compact)
+        model_rf, features_rf = self.modele_rf(seg)
+        model_ols, features_ols = self.modele_ols(seg)
+        return (ForetCompacte.depuis_sklearn(model_rf, features_rf),
+                OLSCompact.depuis_statsmodels(model_ols, features_ols))
+
+    def ols_incertitude(self, seg):
+        """OLSCompact du segment avec la covariance des coefficients, pour les intervalles de prédiction.
+
+        Un modèle compact exporté avant la covariance est complété depuis le modèle statsmodels
+        enregistré ; l'absence de covariance ou de tirages bootstrap est signalée une fois par segment.
+        """
+        _, ols = self.modeles_compacts(seg)
+        if ols.cov is None:
+            complet = OLSCompact.depuis_statsmodels(*self.modele_ols(seg))
+            ols.cov, ols.scale, ols.ddl = complet.cov, complet.scale, complet.ddl
+            print(f"⚠️ Segment {seg} – covariance OLS absente du modèle compact, lue depuis ols/segment_{seg}.joblib "
+                  "(réentraîner avec --forcer)")
+        if ols.tirages is None and seg not in self._avertis:
+            self._avertis.add(seg)
+            print(f"⚠️ Segment {seg} – modèle compact sans tirages bootstrap : pas de bandes CCF_OLS_p* "
+                  "(réentraîner avec --forcer)")
+        return ols
+
+    def segments_disponibles(self):
+        """Segments ayant un modèle RF enregistré, triés (identifiants entiers d'abord, puis textuels)."""
+        dossier = os.path.join(self.model_dir, "rf")
+        if not os.path.isdir(dossier):
+            return []
+        segments = []
+        for nom in os.listdir(dossier):
+            match = re.fullmatch(r"segment_(.+)\.joblib", nom)
+            if match:
+                segments.append(identifiant_segment(match.group(1)))
+        return sorted(segments, key=lambda seg: (isinstance(seg, str), seg))
+
+    def vider(self):
+        self._cache.clear()
+
+
+def identifiant_segment(texte):
+    """Identifiant de segment lu dans un nom de fichier : entier s'il est numérique (note_ref), texte sinon."""
+    return int(texte) if re.fullmatch(r"-?\d+", texte) else texte
+
+
+_registres = {}
+
+
+def get_registre(model_dir="models"):
+    """Registre partagé du processus pour un dossier de modèles donné."""
+    cle = os.path.abspath(model_dir)
+    if cle not in _registres:
+        _registres[cle] = RegistreModeles(model_dir)
+    return _registres[cle]
@@ -1,17 +1,24 @@
 # src/scenario_projection.py
-import os
 import pandas as pd
 import numpy as np
-import joblib
-import matplotlib.pyplot as plt
-import statsmodels.api as sm
-from statsmodels.tsa.filters.hp_filter import hpfilter
-from src.utils import save_plot
+from src.hp_filter import filtre_hp
 from src.features import enrichir_variables_macro
+from src.registry import get_registre
+from src.plotting import FileFigures
+from src.instrumentation import mesurer, instrumenter
 
+# Percentiles des bandes : confiance OLS (tirages bootstrap), quantiles des arbres RF et intervalles de prédiction OLS
+PERCENTILES_BANDES = (5, 95)
 
 
-def prepare_scenario(df_raw, prefix):
+def prepare_scenario(df_raw, prefix, filtre_unilateral=None):
+    """Variables macro d'un scénario, avec le cycle HP de IPL_diff1.
+
+    Par défaut le cycle est tiré du filtre HP bilatéral sur la fenêtre du scénario.
+    Avec `filtre_unilateral` (un `FiltreHPUnilateral` déjà alimenté par l'historique),
+    les trimestres du scénario sont filtrés en prolongement de l'historique ; le
+    filtre fourni n'est pas modifié et peut servir à d'autres scénarios.
+    """
     df = df_raw[["date", f"PIB_{prefix}", f"IPL_{prefix}", f"TCH_{prefix}", f"Inflation_{prefix}"]].copy()
     df.columns = ["date", "PIB", "IPL", "TCH", "Inflation"]
     df["PIB_diff1"] = df["PIB"].diff()
@@ -19,50 +26,77 @@ def prepare_scenario(df_raw, prefix):
     df["Inflation_diff1"] = df["Inflation"].diff()
     df["IPL_diff1"] = df["IPL"].diff()
     df["IPL_diff1_hp"] = np.nan
-    cycle_ipl, _ = hpfilter(df["IPL_diff1"].dropna(), lamb=1600)
-    df.loc[df["IPL_diff1"].dropna().index, "IPL_diff1_hp"] = cycle_ipl
+    ipl_diff1 = df["IPL_diff1"].dropna()
+    if filtre_unilateral is None:
+        cycle_ipl, _ = filtre_hp(ipl_diff1)
+    else:
+        cycle_ipl, _ = filtre_unilateral.dupliquer(1).mettre_a_jour(ipl_diff1.to_numpy())
+    df.loc[ipl_diff1.index, "IPL_diff1_hp"] = cycle_ipl
     return df.dropna().reset_index(drop=True)
 
 
-def enrichir_macro_scenario(df):
-    df = df.copy()
-    df["date"] = pd.to_datetime(df["date"])
-    df["PIB_lag1"] = df["PIB"].shift(1)
-    df["TCH_diff1_lag1"] = df["TCH_diff1"].shift(1)
-    df["Inflation_diff1_lag1"] = df["Inflation_diff1"].shift(1)
-    df["IPL_diff1_hp_lag1"] = df["IPL_diff1_hp"].shift(1)
-    df["PIB_lag2"] = df["PIB"].shift(2)
-    df["TCH_diff1_lag2"] = df["TCH_diff1"].shift(2)
-    df["Inflation_diff1_lag2"] = df["Inflation_diff1"].shift(2)
-    df["IPL_diff1_hp_lag2"] = df["IPL_diff1_hp"].shift(2)
-    df["PIB_ma3"] = df["PIB"].rolling(window=3).mean()
-    df["TCH_ma3"] = df["TCH_diff1"].rolling(window=3).mean()
-    df["Inflation_ma3"] = df["Inflation_diff1"].rolling(window=3).mean()
-    df["IPL_ma3"] = df["IPL_diff1_hp"].rolling(window=3).mean()
-    df["PIB_ma5"] = df["PIB"].rolling(window=5).mean()
-    df["TCH_ma5"] = df["TCH_diff1"].rolling(window=5).mean()
-    df["Inflation_ma5"] = df["Inflation_diff1"].rolling(window=5).mean()
-    df["IPL_ma5"] = df["IPL_diff1_hp"].rolling(window=5).mean()
-    df["PIB_x_TCH"] = df["PIB"] * df["TCH_diff1"]
-    df["PIB_x_Inflation"] = df["PIB"] * df["Inflation_diff1"]
-    df["TCH_x_IPL"] = df["TCH_diff1"] * df["IPL_diff1_hp"]
-    df["Inflation_x_IPL"] = df["Inflation_diff1"] * df["IPL_diff1_hp"]
-    df["PIB_x_TCH_ma3"] = df["PIB"] * df["TCH_diff1"].rolling(3).mean()
-    df["PIB_squared"] = df["PIB"] ** 2
-    df["TCH_diff1_squared"] = df["TCH_diff1"] ** 2
-    df["Inflation_diff1_squared"] = df["Inflation_diff1"] ** 2
-    df["IPL_diff1_hp_squared"] = df["IPL_diff1_hp"] ** 2
-    df["year"] = df["date"].dt.year
-    df["quarter"] = df["date"].dt.quarter
-    df["is_covid"] = ((df["date"] >= "2020-03-01") & (df["date"] <= "2021-06-30")).astype(int)
-    df["post_covid"] = (df["date"] >= "2021-07-01").astype(int)
-    df["PIB_pct_change"] = df["PIB"].pct_change()
-    df["TCH_diff1_abs"] = df["TCH_diff1"].abs()
-    df["PIB_x_TCH_squared"] = df["PIB"] * (df["TCH_diff1"] ** 2)
-    return df.dropna().reset_index(drop=True)
+def projeter_segment(registre, seg, df_enriched, incertitude=False):
+    """Prédictions RF et OLS d'un segment sur un scénario enrichi (lignes communes aux deux modèles).
+
+    Avec `incertitude`, les prédictions de tous les arbres sont obtenues en un seul
+    parcours (tableau arbres × trimestres) : leur moyenne donne `CCF_RF` et leurs
+    percentiles `CCF_RF_p<q>`. L'intervalle de prédiction OLS `CCF_OLS_ip<q>` est
+    tiré de la covariance des coefficients, sans nouvelle estimation.
+    """
+    # 🔁 Modèles compacts lus depuis le registre (chargés une seule fois par processus)
+    model_rf, model_ols = registre.modeles_compacts(seg)
+    if incertitude:
+        model_ols = registre.ols_incertitude(seg)
+
+    # Filtrage des features pour RF et OLS
+    X_rf = df_enriched[model_rf.features].astype(float).dropna()
+    X_ols = df_enriched[model_ols.features].astype(float).dropna()
+
+    # Prédictions
+    if incertitude:
+        arbres = model_rf.predict_arbres(X_rf)
+        y_pred_rf = arbres.mean(axis=0)
+    else:
+        y_pred_rf = model_rf.predict(X_rf)
+    y_pred_ols = model_ols.predict(X_ols)
+
+    idx_common = X_rf.index.intersection(X_ols.index)
+    n = len(idx_common)
+    # Colonnes de prédiction réunies puis ajoutées en une fois (une insertion pandas par colonne coûte plus que le calcul)
+    colonnes = {"CCF_RF": y_pred_rf[:n], "CCF_OLS": y_pred_ols[:n]}
+    if model_ols.tirages is not None:
+        for p, bande in zip(PERCENTILES_BANDES, model_ols.bandes(X_ols, PERCENTILES_BANDES)):
+            colonnes[f"CCF_OLS_p{p}"] = bande[:n]
+    if incertitude:
+        for p, bande in zip(PERCENTILES_BANDES, np.percentile(arbres, PERCENTILES_BANDES, axis=0)):
+            colonnes[f"CCF_RF_p{p}"] = bande[:n]
+        from scipy import stats
+        ecarts = model_ols.ecarts_types_prediction(X_ols)[:n]
+        for p in PERCENTILES_BANDES:
+            colonnes[f"CCF_OLS_ip{p}"] = y_pred_ols[:n] + stats.t.ppf(p / 100, model_ols.ddl) * ecarts
+    return pd.concat([df_enriched.loc[idx_common], pd.DataFrame(colonnes, index=idx_common)], axis=1)
 
 
-def predict_all_models_scenarios(*, df_raw, top_features_dict, scenarios=["CENT", "PESS", "OPT"], model_dir="models"):
+def colonnes_figure(df_result):
+    """Colonnes transmises au rendu de la figure de projection (date, CCF et bandes éventuelles)."""
+    return ["date"] + [c for c in df_result.columns if c.startswith("CCF_")]
+
+
+def ajouter_figure_projection(figures, df_result, scenario, seg):
+    """Figure différée RF vs OLS (et bandes) d'un segment pour un scénario."""
+    figures.ajouter("projection", f"outputs/figures/{scenario}_Segment_{seg}_predictions.png",
+                    df_result=df_result[colonnes_figure(df_result)], scenario=scenario, seg=seg)
+
+
+@instrumenter()
+def predict_all_models_scenarios(*, df_raw, scenarios=["CENT", "PESS", "OPT"], model_dir="models", figures=None,
+                                 segments=None, incertitude=False):
+    # Sans file fournie, les figures sont tracées en fin de projection
+    file_locale = figures is None
+    figures = FileFigures() if file_locale else figures
+    registre = get_registre(model_dir)
+    # Par défaut, tous les segments ayant un modèle enregistré
+    segments = registre.segments_disponibles() if segments is None else segments
     results = {}
     for scenario in scenarios:
         print(f"\n🔮 Scénario : {scenario}")
@@ -70,44 +104,20 @@ def predict_all_models_scenarios(*, df_raw, top_features_dict, scenarios=["CENT"
         df_enriched = enrichir_variables_macro(df_prepared)
 
         scenario_results = {}
-        for seg in range(1, 6):
+        for seg in segments:
             try:
-                model_rf, features_rf = joblib.load(os.path.join(model_dir, "rf", f"segment_{seg}.joblib"))
-                model_ols, features_ols = joblib.load(os.path.join(model_dir, "ols", f"segment_{seg}.joblib"))
-
-                # 🔁 Chargement automatique des features sélectionnées
-                features_selected = joblib.load(os.path.join(model_dir, "features", f"selected_features_segment_{seg}.pkl"))
-
-                # Filtrage des features pour RF et OLS
-                X_rf = df_enriched[features_rf].astype(float).dropna()
-                X_ols = df_enriched[features_ols].astype(float).dropna()
-                X_ols_const = sm.add_constant(X_ols)
-
-                # Prédictions
-                y_pred_rf = model_rf.predict(X_rf)
-                y_pred_ols = model_ols.predict(X_ols_const)
-
-                idx_common = X_rf.index.intersection(X_ols.index)
-                df_result = df_enriched.loc[idx_common].copy()
-                df_result["CCF_RF"] = y_pred_rf[:len(idx_common)]
-                df_result["CCF_OLS"] = y_pred_ols[:len(idx_common)]
-                scenario_results[seg] = df_result
-
-                print(f"✅ Segment {seg} – {len(idx_common)} prédictions")
-
-                # === 🔽 PLOT ET SAUVEGARDE 🔽 ===
-                fig, ax = plt.subplots(figsize=(10, 4))
-                ax.plot(df_result["date"], df_result["CCF_RF"], label="RF", linestyle="-", marker="x")
-                ax.plot(df_result["date"], df_result["CCF_OLS"], label="OLS", linestyle="--", marker="o")
-                ax.set_title(f"{scenario} – Segment {seg} – CCF projeté (RF vs OLS)")
-                ax.set_xlabel("Date")
-                ax.set_ylabel("CCF prédite")
-                ax.grid(True)
-                ax.legend()
-                plt.tight_layout()
-                save_plot(fig, name=f"{scenario}_Segment_{seg}_predictions")
+                with mesurer("projection_segment", segment=seg, scenario=scenario) as mesure:
+                    df_result = projeter_segment(registre, seg, df_enriched, incertitude)
+                    scenario_results[seg] = df_result
+
+                    mesure["lignes"] = len(df_result)
+                    print(f"✅ Segment {seg} – {len(df_result)} prédictions")
 
+                    # Figure différée : tracée par l'étape de rendu, hors de la boucle de prédiction
+                    ajouter_figure_projection(figures, df_result, scenario, seg)
             except Exception as e:
                 print(f"❌ Segment {seg} – erreur : {e}")
         results[scenario] = scenario_results
-    return results
\ No newline at end of file
+    if file_locale:
+        figures.rendre()
+    return results
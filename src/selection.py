@@ -0,0 +1,124 @@
+# src/selection.py
+import os
+import hashlib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.inspection import permutation_importance
+
+from src.utils import hash_objet, lire_json, ecrire_json_atomique
+
+CACHE_IMPORTANCES = "outputs/cache/importances"
+STRATEGIES = ("impurete", "warm_start", "permutation")
+
+
+# === Stratégies d'importance ===
+# Chaque stratégie retourne (importances, forêt ajustée sur toutes les variables candidates)
+
+def _foret(n_estimators, random_state, n_jobs, **options):
+    return RandomForestRegressor(n_estimators=n_estimators, random_state=random_state, n_jobs=n_jobs, **options)
+
+
+def importances_impurete(X, y, n_estimators=100, random_state=0, n_jobs=None):
+    """Importance moyenne de réduction d'impureté d'une forêt complète (critère de `SelectFromModel`)."""
+    foret = _foret(n_estimators, random_state, n_jobs).fit(X, y)
+    return foret.feature_importances_, foret
+
+
+def importances_warm_start(X, y, n_estimators=100, random_state=0, n_jobs=None, pas=20, seuil="mean"):
+    """Forêt agrandie par paquets de `pas` arbres jusqu'à ce que la sélection ne bouge plus.
+
+    Avec `warm_start`, les arbres ajoutés sont ceux de la forêt complète de même
+    graine : on s'arrête dès que deux paquets successifs donnent les mêmes
+    variables, au plus à `n_estimators` arbres.
+    """
+    foret = _foret(pas, random_state, n_jobs, warm_start=True)
+    precedente = None
+    while True:
+        foret.fit(X, y)
+        selection = frozenset(np.flatnonzero(masque_selection(foret.feature_importances_, seuil)))
+        if selection == precedente or foret.n_estimators >= n_estimators:
+            return foret.feature_importances_, foret
+        precedente = selection
+        foret.set_params(n_estimators=min(foret.n_estimators + pas, n_estimators))
+
+
+def importances_permutation(X, y, n_estimators=100, random_state=0, n_jobs=None, n_max=500, n_repetitions=5):
+    """Baisse de R² quand chaque variable est permutée, mesurée sur au plus `n_max` lignes."""
+    foret = _foret(n_estimators, random_state, n_jobs).fit(X, y)
+    rng = np.random.default_rng(random_state)
+    lignes = np.sort(rng.choice(len(X), size=min(n_max, len(X)), replace=False))
+    resultat = permutation_importance(foret, X.iloc[lignes], y.iloc[lignes], n_repeats=n_repetitions,
+                                      random_state=random_state, n_jobs=n_jobs)
+    return resultat.importances_mean, foret
+
+
+IMPORTANCES = {
+    "impurete": importances_impurete,
+    "warm_start": importances_warm_start,
+    "permutation": importances_permutation,
+}
+
+
+# === Seuils ===
+
+def valeur_seuil(importances, seuil="mean"):
+    """Seuil numérique, avec les conventions de `SelectFromModel` : "mean", "median", "1.25*mean" ou un nombre."""
+    if not isinstance(seuil, str):
+        return float(seuil)
+    facteur, _, reference = seuil.rpartition("*")
+    references = {"mean": np.mean, "median": np.median}
+    if reference.strip() not in references:
+        raise ValueError(f"seuil inconnu : {seuil}")
+    return (float(facteur) if facteur else 1.0) * references[reference.strip()](importances)
+
+
+def masque_selection(importances, seuil="mean"):
+    importances = np.asarray(importances, dtype=float)
+    return importances >= valeur_seuil(importances, seuil)
+
+
+def selectionner(importances, seuil="mean"):
+    """Variables retenues (ordre des colonnes) à partir d'une série d'importances, sans réajustement."""
+    return list(importances.index[masque_selection(importances.to_numpy(), seuil)])
+
+
+# === Calcul mis en cache ===
+
+def _cle_importances(X, y, parametres):
+    h = hashlib.sha256()
+    h.update("|".join(map(str, X.columns)).encode())
+    h.update(np.ascontiguousarray(X.to_numpy(dtype=float)).tobytes())
+    h.update(np.ascontiguousarray(np.asarray(y, dtype=float)).tobytes())
+    h.update(hash_objet(parametres).encode())
+    return h.hexdigest()
+
+
+def calculer_importances(X, y, strategie="impurete", n_estimators=100, random_state=0, n_jobs=None,
+                         cache_dir=CACHE_IMPORTANCES, seuil="mean", **options):
+    """Importances des variables candidates, mémorisées par (données, stratégie, hyperparamètres).
+
+    Retourne (importances en `pd.Series` indexée par colonne, forêt de sélection) ;
+    la forêt vaut None quand les importances viennent du cache. Un fichier par clé,
+    si bien que des processus d'entraînement parallèles n'écrivent jamais le même fichier.
+    `seuil` n'intervient (et n'entre dans la clé) que pour `warm_start`, dont l'arrêt
+    dépend de la sélection obtenue.
+    """
+    if strategie not in IMPORTANCES:
+        raise ValueError(f"stratégie de sélection inconnue : {strategie} ({', '.join(STRATEGIES)})")
+    if strategie == "warm_start":
+        options = {"seuil": seuil, **options}
+    parametres = {"strategie": strategie, "n_estimators": n_estimators, "random_state": random_state, **options}
+    chemin = os.path.join(cache_dir, f"{_cle_importances(X, y, parametres)}.json") if cache_dir else None
+
+    if chemin and os.path.exists(chemin):
+        valeurs = lire_json(chemin)
+        return pd.Series(valeurs["importances"], index=valeurs["colonnes"]), None
+
+    importances, foret = IMPORTANCES[strategie](X, y, n_estimators=n_estimators, random_state=random_state,
+                                                n_jobs=n_jobs, **options)
+    importances = pd.Series(np.asarray(importances, dtype=float), index=list(X.columns))
+    if chemin:
+        ecrire_json_atomique({"colonnes": list(importances.index), "importances": importances.tolist(),
+                              "parametres": parametres}, chemin)
+    return importances, foret
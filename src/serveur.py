@@ -0,0 +1,242 @@
+# src/serveur.py
+import json
+import time
+import queue
+import argparse
+import threading
+from collections import deque
+from concurrent.futures import Future
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import numpy as np
+import pandas as pd
+
+from src.features import enrichir_variables_macro_batch
+from src.monte_carlo import VARIABLES_MACRO, preparer_chemins_batch
+from src.registry import get_registre
+
+
+class Metriques:
+    """Latences et débit du serveur, sur une fenêtre glissante des dernières requêtes."""
+
+    def __init__(self, taille_fenetre=10000):
+        self._verrou = threading.Lock()
+        self._latences = deque(maxlen=taille_fenetre)
+        self._horodatages = deque(maxlen=taille_fenetre)
+        self._tailles_lots = deque(maxlen=taille_fenetre)
+        self.debut = time.time()
+        self.n_requetes = 0
+        self.n_erreurs = 0
+
+    def enregistrer_requete(self, latence, erreur=False):
+        with self._verrou:
+            self._latences.append(latence)
+            self._horodatages.append(time.time())
+            self.n_requetes += 1
+            self.n_erreurs += int(erreur)
+
+    def enregistrer_lot(self, taille):
+        with self._verrou:
+            self._tailles_lots.append(taille)
+
+    def resume(self):
+        with self._verrou:
+            latences = np.array(self._latences) * 1000
+            horodatages = np.array(self._horodatages)
+            tailles = np.array(self._tailles_lots)
+            resume = {
+                "uptime_s": round(time.time() - self.debut, 1),
+                "requetes": self.n_requetes,
+                "erreurs": self.n_erreurs,
+                "lots": len(tailles),
+                "taille_lot_moyenne": round(float(tailles.mean()), 2) if len(tailles) else None,
+            }
+        if len(latences):
+            p50, p95, p99 = np.percentile(latences, [50, 95, 99])
+            resume.update({"latence_ms_p50": round(p50, 3), "latence_ms_p95": round(p95, 3),
+                           "latence_ms_p99": round(p99, 3)})
+            # Débit sur les 60 dernières secondes
+            recentes = horodatages[horodatages >= time.time() - 60]
+            if len(recentes) > 1:
+                duree = max(recentes[-1] - recentes[0], 1e-9)
+                resume["debit_req_s"] = round(len(recentes) / duree, 2)
+        return resume
+
+
+class ServiceProjection:
+    """Modèles de segment chargés une fois ; projette des lots de chemins macro."""
+
+    def __init__(self, model_dir="models", segments=None):
+        registre = get_registre(model_dir)
+        segments = segments or registre.segments_disponibles()
+        self.modeles = {seg: registre.modeles_compacts(seg) for seg in segments}
+        self.colonnes = sorted({f for foret, ols in self.modeles.values() for f in foret.features + ols.features})
+        print(f"🚀 Service de projection : {len(self.modeles)} segments chargés")
+
+    def projeter_lot(self, dates, chemins):
+        """Projette des chemins (n_chemins, n_trimestres, 4) partageant les mêmes dates.
+
+        Même calcul que `predict_all_models_scenarios`, vectorisé sur l'ensemble du lot.
+        """
+        base, dates_base = preparer_chemins_batch(chemins, dates)
+        variables, dates_enrichies = enrichir_variables_macro_batch(base, dates_base, colonnes=self.colonnes)
+        n_chemins, n_dates = len(chemins), len(dates_enrichies)
+        if n_dates == 0:
+            raise ValueError("scénario trop court : aucun trimestre projetable après calcul des retards")
+
+        resultats = {}
+        for seg, (foret, ols) in self.modeles.items():
+            X_rf = np.stack([variables[f] for f in foret.features], axis=-1).reshape(-1, len(foret.features))
+            X_ols = np.stack([variables[f] for f in ols.features], axis=-1).reshape(-1, len(ols.features))
+            resultats[seg] = {
+                "CCF_RF": foret.predict(X_rf).reshape(n_chemins, n_dates),
+                "CCF_OLS": ols.predict(X_ols).reshape(n_chemins, n_dates),
+            }
+        return dates_enrichies, resultats
+
+
+class MicroBatcher:
+    """Regroupe les requêtes concurrentes en un seul appel vectorisé.
+
+    Un thread unique attend une première requête, puis collecte les suivantes
+    pendant au plus `delai_max` secondes ou jusqu'à `taille_max` requêtes. Les
+    requêtes de même calendrier sont empilées et projetées ensemble.
+    """
+
+    def __init__(self, service, metriques, taille_max=256, delai_max=0.005):
+        self.service = service
+        self.metriques = metriques
+        self.taille_max = taille_max
+        self.delai_max = delai_max
+        self._file = queue.Queue()
+        self._thread = threading.Thread(target=self._boucle, daemon=True)
+        self._thread.start()
+
+    def soumettre(self, dates, chemin):
+        future = Future()
+        self._file.put((dates, chemin, future))
+        return future
+
+    def _boucle(self):
+        while True:
+            lot = [self._file.get()]
+            echeance = time.monotonic() + self.delai_max
+            while len(lot) < self.taille_max:
+                restant = echeance - time.monotonic()
+                if restant <= 0:
+                    break
+                try:
+                    lot.append(self._file.get(timeout=restant))
+                except queue.Empty:
+                    break
+            self._traiter(lot)
+
+    def _traiter(self, lot):
+        self.metriques.enregistrer_lot(len(lot))
+        groupes = {}
+        for dates, chemin, future in lot:
+            groupes.setdefault(tuple(dates), []).append((chemin, future))
+        for dates, requetes in groupes.items():
+            try:
+                dates_proj, resultats = self.service.projeter_lot(
+                    pd.to_datetime(list(dates)), np.stack([chemin for chemin, _ in requetes])
+                )
+            except Exception as e:
+                for _, future in requetes:
+                    future.set_exception(e)
+                continue
+            dates_iso = [d.strftime("%Y-%m-%d") for d in dates_proj]
+            for k, (_, future) in enumerate(requetes):
+                future.set_result({
+                    "date": dates_iso,
+                    "segments": {str(seg): {m: v[k].tolist() for m, v in preds.items()}
+                                 for seg, preds in resultats.items()},
+                })
+
+
+def lire_requete(corps):
+    """Valide une requête JSON : {"date": [...], "PIB": [...], "IPL": [...], "TCH": [...], "Inflation": [...]}."""
+    manquantes = [c for c in ["date"] + VARIABLES_MACRO if c not in corps]
+    if manquantes:
+        raise ValueError(f"champs manquants : {', '.join(manquantes)}")
+    dates = [pd.Timestamp(d).strftime("%Y-%m-%d") for d in corps["date"]]
+    chemin = np.column_stack([np.asarray(corps[var], dtype=float) for var in VARIABLES_MACRO])
+    if len(chemin) != len(dates):
+        raise ValueError("les séries macro doivent avoir la même longueur que `date`")
+    # Une valeur manquante supprimerait ses trimestres pour toutes les requêtes du même lot
+    non_finies = [var for k, var in enumerate(VARIABLES_MACRO) if not np.isfinite(chemin[:, k]).all()]
+    if non_finies:
+        raise ValueError(f"valeurs manquantes ou non finies : {', '.join(non_finies)}")
+    return dates, chemin
+
+
+def creer_handler(batcher, metriques, timeout=30):
+    class Handler(BaseHTTPRequestHandler):
+        def _repondre(self, code, contenu):
+            corps = json.dumps(contenu, ensure_ascii=False).encode()
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(corps)))
+            self.end_headers()
+            self.wfile.write(corps)
+
+        def do_GET(self):
+            if self.path == "/metriques":
+                self._repondre(200, metriques.resume())
+            elif self.path == "/sante":
+                self._repondre(200, {"statut": "ok"})
+            else:
+                self._repondre(404, {"erreur": f"route inconnue : {self.path}"})
+
+        def do_POST(self):
+            if self.path != "/projeter":
+                self._repondre(404, {"erreur": f"route inconnue : {self.path}"})
+                return
+            debut = time.perf_counter()
+            try:
+                longueur = int(self.headers.get("Content-Length", 0))
+                dates, chemin = lire_requete(json.loads(self.rfile.read(longueur)))
+                reponse = batcher.soumettre(dates, chemin).result(timeout=timeout)
+            except Exception as e:
+                metriques.enregistrer_requete(time.perf_counter() - debut, erreur=True)
+                self._repondre(400, {"erreur": str(e)})
+                return
+            metriques.enregistrer_requete(time.perf_counter() - debut)
+            self._repondre(200, reponse)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class ServeurHTTP(ThreadingHTTPServer):
+    # File d'attente de connexions assez longue pour des rafales de clients concurrents
+    request_queue_size = 256
+    daemon_threads = True
+
+
+def lancer_serveur(hote="127.0.0.1", port=8080, model_dir="models", taille_lot=256, delai_ms=5.0):
+    """Démarre le serveur HTTP de projection (bloquant)."""
+    metriques = Metriques()
+    batcher = MicroBatcher(ServiceProjection(model_dir), metriques,
+                           taille_max=taille_lot, delai_max=delai_ms / 1000)
+    serveur = ServeurHTTP((hote, port), creer_handler(batcher, metriques))
+    print(f"🌐 Serveur de projection sur http://{hote}:{port} (POST /projeter, GET /metriques)")
+    try:
+        serveur.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        serveur.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hote", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--model-dir", type=str, default="models")
+    parser.add_argument("--taille-lot", type=int, default=256)
+    parser.add_argument("--delai-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    lancer_serveur(args.hote, args.port, args.model_dir, args.taille_lot, args.delai_ms)
@@ -1,53 +1,203 @@
 # src/stationarity.py
+import os
+import hashlib
+import warnings
 import pandas as pd
 import numpy as np
-from statsmodels.tsa.stattools import adfuller
-from statsmodels.tsa.filters.hp_filter import hpfilter
+from concurrent.futures import ProcessPoolExecutor
+from statsmodels.tsa.stattools import adfuller, kpss
 from scipy.stats import boxcox
 
-def tester_stationnarite_macro(df_macro, colonnes=None, verbose=True):
+from src.utils import lire_json, ecrire_json_atomique
+from src.hp_filter import filtre_hp
+from src.preprocessing import CLE_SEGMENT, partitionner
+from src.instrumentation import instrumenter
+
+CACHE_STATIONNARITE = "outputs/cache/stationnarite.json"
+# Entrées conservées dans le cache (les moins récemment utilisées sont retirées au-delà)
+TAILLE_MAX_CACHE = 2000
+# À incrémenter si le calcul d'un test change, pour invalider le cache
+VERSION_TESTS = 1
+
+
+# === Transformations candidates ===
+
+def _brute(serie):
+    return serie
+
+
+def _diff(serie):
+    return np.diff(serie)
+
+
+def _hp_cycle(serie):
+    cycle, _ = filtre_hp(serie)
+    return cycle
+
+
+def _log_diff(serie):
+    if not (serie > 0).all():
+        raise ValueError("série non strictement positive")
+    return np.diff(np.log(serie))
+
+
+def _boxcox_diff(serie):
+    if not (serie > 0).all():
+        raise ValueError("série non strictement positive")
+    bc_trans, _ = boxcox(serie)
+    return np.diff(bc_trans)
+
+
+TRANSFORMATIONS = {
+    "Brute": _brute,
+    "Diff(2)": _diff,
+    "HP Cycle": _hp_cycle,
+    "Log-Diff": _log_diff,
+    "BoxCox-Diff": _boxcox_diff,
+}
+
+
+# === Tests de racine unitaire ===
+# Chaque test retourne (statistique, p-value, hypothèse nulle = stationnarité ?)
+
+@instrumenter("ADF")
+def _test_adf(serie, regression):
+    stat, p_value = adfuller(serie, regression=regression)[:2]
+    return stat, p_value, False
+
+
+def _test_kpss(serie, regression):
+    with warnings.catch_warnings():
+        # p-values tronquées aux bornes de la table de KPSS
+        warnings.simplefilter("ignore")
+        stat, p_value = kpss(serie, regression=regression, nlags="auto")[:2]
+    return stat, p_value, True
+
+
+def _test_pp(serie, regression):
+    try:
+        from arch.unitroot import PhillipsPerron
+    except ImportError:
+        raise ImportError("le test PP nécessite le paquet `arch`")
+    test = PhillipsPerron(serie, trend=regression)
+    return test.stat, test.pvalue, False
+
+
+TESTS = {"ADF": _test_adf, "KPSS": _test_kpss, "PP": _test_pp}
+
+
+def construire_grille(series, transformations=("Brute",), tests=("ADF",), regressions=("ct",)):
+    """Liste des tests à exécuter : produit (série × transformation × test × régression).
+
+    `series` associe un nom à une série ; les valeurs manquantes sont retirées.
+    """
+    jobs = []
+    for nom, serie in series.items():
+        valeurs = np.asarray(pd.Series(serie).dropna(), dtype=float)
+        for transformation in transformations:
+            for test in tests:
+                for regression in regressions:
+                    jobs.append({
+                        "serie": nom,
+                        "transformation": transformation,
+                        "test": test,
+                        "regression": regression,
+                        "valeurs": valeurs,
+                    })
+    return jobs
+
+
+def _cle_job(job):
+    h = hashlib.sha256(job["valeurs"].tobytes())
+    h.update(f"|{job['transformation']}|{job['test']}|{job['regression']}|{VERSION_TESTS}".encode())
+    return h.hexdigest()
+
+
+def executer_test(job):
+    """Applique la transformation puis le test d'un job ; les erreurs sont renvoyées dans le résultat."""
+    resultat = {"n_obs": None, "statistique": None, "p_value": None, "stationnaire": None, "erreur": None}
+    try:
+        serie = TRANSFORMATIONS[job["transformation"]](job["valeurs"])
+        serie = np.asarray(serie, dtype=float)
+        serie = serie[~np.isnan(serie)]
+        stat, p_value, h0_stationnaire = TESTS[job["test"]](serie, job["regression"])
+        resultat.update({
+            "n_obs": len(serie),
+            "statistique": float(stat),
+            "p_value": float(p_value),
+            "stationnaire": bool(p_value >= 0.05) if h0_stationnaire else bool(p_value < 0.05),
+        })
+    except Exception as e:
+        resultat["erreur"] = str(e)
+    return resultat
+
+
+@instrumenter()
+def executer_grille(jobs, n_jobs=1, cache_path=CACHE_STATIONNARITE):
+    """Exécute une grille de tests et retourne un tableau de résultats.
+
+    Les résultats sont mémorisés sur disque sous l'empreinte du contenu de la série,
+    de la transformation, du test et de la régression : une série inchangée n'est pas
+    retestée. Le cache est élagué en LRU : au-delà de `TAILLE_MAX_CACHE` entrées, celles
+    qu'aucune grille récente n'a utilisées (séries modifiées, anciennes versions des
+    tests) sont retirées. Les jobs restants sont répartis sur `n_jobs` processus.
+    """
+    cache = lire_json(cache_path, defaut={}) if cache_path else {}
+    cles = [_cle_job(job) for job in jobs]
+    a_calculer = {cle: job for cle, job in zip(cles, jobs) if cle not in cache}
+
+    if a_calculer:
+        if n_jobs == 1 or len(a_calculer) == 1:
+            nouveaux = [executer_test(job) for job in a_calculer.values()]
+        else:
+            n_processus = min(n_jobs if n_jobs > 0 else (os.cpu_count() or 1), len(a_calculer))
+            with ProcessPoolExecutor(max_workers=n_processus) as pool:
+                nouveaux = list(pool.map(executer_test, a_calculer.values(),
+                                         chunksize=max(1, len(a_calculer) // (4 * n_processus))))
+        cache.update(zip(a_calculer.keys(), nouveaux))
+
+    lignes = []
+    for cle, job in zip(cles, jobs):
+        ligne = {k: job[k] for k in ("serie", "transformation", "test", "regression")}
+        ligne.update(cache[cle])
+        lignes.append(ligne)
+
+    if cache_path:
+        # Entrées de cette grille placées en fin (les plus récentes), puis élagage des plus anciennes
+        utilisees = dict.fromkeys(cles)
+        elague = {cle: resultat for cle, resultat in cache.items() if cle not in utilisees}
+        elague.update((cle, cache[cle]) for cle in utilisees)
+        elague = dict(list(elague.items())[-max(TAILLE_MAX_CACHE, len(utilisees)):])
+        if a_calculer or list(elague) != list(cache):
+            ecrire_json_atomique(elague, cache_path)
+    return pd.DataFrame(lignes)
+
+
+def _afficher(ligne, libelle=None):
+    prefixe = f"{libelle} : " if libelle is not None else ""
+    if pd.isna(ligne["p_value"]):
+        print(f"{prefixe}❌ Erreur {ligne['test']} → {ligne['erreur']}")
+    else:
+        etat = "✅ Stationnaire" if ligne["stationnaire"] else "❌ Non stationnaire"
+        print(f"{prefixe}p-value = {ligne['p_value']:.4f} → {etat}")
+
+
+def tester_stationnarite_macro(df_macro, colonnes=None, verbose=True, n_jobs=1):
     if colonnes is None:
         colonnes = [col for col in df_macro.columns if col != "cod_prd_ref"]
+    table = executer_grille(construire_grille({col: df_macro[col] for col in colonnes}), n_jobs=n_jobs)
     resultats = {}
-    for col in colonnes:
-        serie = df_macro[col].dropna()
-        try:
-            p_value = adfuller(serie, regression='ct')[1]
-            resultats[col] = p_value
-            if verbose:
-                etat = "✅ Stationnaire" if p_value < 0.05 else "❌ Non stationnaire"
-                print(f"{col} : p-value = {p_value:.4f} → {etat}")
-        except Exception as e:
-            resultats[col] = None
-            print(f"{col} : ❌ Erreur ADF → {e}")
+    for _, ligne in table.iterrows():
+        resultats[ligne["serie"]] = None if pd.isna(ligne["p_value"]) else ligne["p_value"]
+        if verbose or resultats[ligne["serie"]] is None:
+            _afficher(ligne, ligne["serie"])
     return resultats
 
 def tester_transformations_ipl(df, col="IPL_diff1"):
-    serie = df[col].dropna()
+    table = executer_grille(construire_grille({col: df[col]}, transformations=list(TRANSFORMATIONS)))
     resultats = {}
-    resultats["Brute"] = adfuller(serie, regression='ct')[1]
-    try:
-        resultats["Diff(2)"] = adfuller(serie.diff().dropna(), regression='ct')[1]
-    except: resultats["Diff(2)"] = None
-    try:
-        cycle, _ = hpfilter(serie, lamb=1600)
-        resultats["HP Cycle"] = adfuller(cycle.dropna(), regression='ct')[1]
-    except: resultats["HP Cycle"] = None
-    try:
-        if (serie > 0).all():
-            log_diff = np.log(serie).diff().dropna()
-            resultats["Log-Diff"] = adfuller(log_diff, regression='ct')[1]
-        else:
-            resultats["Log-Diff"] = None
-    except: resultats["Log-Diff"] = None
-    try:
-        if (serie > 0).all():
-            bc_trans, _ = boxcox(serie)
-            bc_diff = pd.Series(bc_trans).diff().dropna()
-            resultats["BoxCox-Diff"] = adfuller(bc_diff, regression='ct')[1]
-        else:
-            resultats["BoxCox-Diff"] = None
-    except: resultats["BoxCox-Diff"] = None
+    for _, ligne in table.iterrows():
+        resultats[ligne["transformation"]] = None if pd.isna(ligne["p_value"]) else ligne["p_value"]
     print("\nRésultats ADF pour différentes transformations :")
     for k, p in resultats.items():
         if p is None:
@@ -57,44 +207,66 @@ def tester_transformations_ipl(df, col="IPL_diff1"):
             print(f"{k}: p-value = {p:.4f} → {etat}")
     return resultats
 
-def tester_stationnarite_segments(segment_df):
-    for i in range(1, 6):
-        segment_i = segment_df[segment_df["note_ref"] == i].copy()
-        try:
-            serie = segment_i["Indicateur_moyen_Brut"].str.replace(",", ".").astype(float).dropna()
-        except Exception as e:
-            print(f"\n❌ Erreur conversion Segment {i} : {e}")
-            continue
-        print(f"\n🔎 Test ADF - Segment {i}")
-        try:
-            p_value = adfuller(serie, regression='ct')[1]
-            etat = "✅ Stationnaire" if p_value < 0.05 else "❌ Non stationnaire"
-            print(f"p-value = {p_value:.4f} → {etat}")
-        except Exception as e:
-            print(f"⚠️ Erreur ADF pour le segment {i} : {e}")
+def _series_segments(segment_df, cle=CLE_SEGMENT, colonne="Indicateur_moyen_Brut"):
+    return {i: df_seg[colonne] for i, df_seg in partitionner(segment_df, cle)}
+
 
-def appliquer_hp_filter_segments(segment_df, segments_hp):
+def segments_non_stationnaires(segment_df, cle=CLE_SEGMENT, n_jobs=1, cache_path=CACHE_STATIONNARITE):
+    """Segments dont le CCF brut n'est pas stationnaire (ADF avec constante et tendance) : leur CCF
+    est remplacé par son cycle HP.
+
+    Ce sont les tests de `tester_stationnarite_segments`, lus dans le cache s'ils ont déjà été exécutés ;
+    un segment dont le test échoue (série trop courte) n'est pas filtré.
+    """
+    table = executer_grille(construire_grille(_series_segments(segment_df, cle)), n_jobs=n_jobs, cache_path=cache_path)
+    return [i for i, stationnaire in zip(table["serie"].tolist(), table["stationnaire"].tolist())
+            if stationnaire is False]
+
+
+def tester_stationnarite_segments(segment_df, cle=CLE_SEGMENT):
+    table = executer_grille(construire_grille(_series_segments(segment_df, cle)))
+    for _, ligne in table.iterrows():
+        print(f"\n🔎 Test ADF - Segment {ligne['serie']}")
+        if pd.isna(ligne["p_value"]):
+            print(f"⚠️ Erreur ADF pour le segment {ligne['serie']} : {ligne['erreur']}")
+        else:
+            _afficher(ligne)
+
+def tester_stationnarite_grille(macro, segment_df, transformations=tuple(TRANSFORMATIONS),
+                                tests=("ADF", "KPSS"), regressions=("c", "ct"), n_jobs=1, cle=CLE_SEGMENT):
+    """Grille complète (variables macro et CCF par segment) retournée sous forme de tableau."""
+    series = {col: macro[col] for col in macro.columns if col != "cod_prd_ref"}
+    for i, serie in _series_segments(segment_df, cle).items():
+        series[f"Segment {i}"] = serie
+    return executer_grille(construire_grille(series, transformations, tests, regressions), n_jobs=n_jobs)
+
+def appliquer_hp_filter_segments(segment_df, segments_hp, cle=CLE_SEGMENT):
+    # Les segments de même longueur sont filtrés ensemble (un second membre par segment)
+    par_longueur = {}
     for i in segments_hp:
-        segment_i = segment_df[segment_df["note_ref"] == i].copy()
+        serie = segment_df.loc[segment_df[cle] == i, "Indicateur_moyen_Brut"].dropna()
+        par_longueur.setdefault(len(serie), []).append((i, serie))
+    for groupe in par_longueur.values():
         try:
-            serie = segment_i["Indicateur_moyen_Brut"].str.replace(",", ".").astype(float).dropna()
-            cycle, _ = hpfilter(serie, lamb=1600)
-            segment_df.loc[segment_df["note_ref"] == i, "cycle_hp"] = cycle.values
-            print(f"✅ HP filter appliqué au segment {i}")
+            cycles, _ = filtre_hp(np.column_stack([serie.to_numpy() for _, serie in groupe]))
         except Exception as e:
-            print(f"❌ Erreur pour le segment {i} : {e}")
+            for i, _ in groupe:
+                print(f"❌ Erreur pour le segment {i} : {e}")
+            continue
+        for k, (i, serie) in enumerate(groupe):
+            segment_df.loc[serie.index, "cycle_hp"] = cycles[:, k]
+            print(f"✅ HP filter appliqué au segment {i}")
     return segment_df
 
-def tester_stationnarite_hp_segments(segment_df, segments_hp):
+def tester_stationnarite_hp_segments(segment_df, segments_hp, cle=CLE_SEGMENT):
     for i in segments_hp:
-        serie_hp = segment_df.loc[segment_df["note_ref"] == i, "cycle_hp"].dropna()
+        serie_hp = segment_df.loc[segment_df[cle] == i, "cycle_hp"].dropna()
         print(f"\n🔎 Test ADF sur cycle HP - Segment {i}")
         if len(serie_hp) < 10:
             print("⚠️ Trop peu de données pour appliquer ADF")
             continue
-        try:
-            p_value = adfuller(serie_hp, regression="ct")[1]
-            etat = "✅ Stationnaire" if p_value < 0.05 else "❌ Non stationnaire"
-            print(f"p-value = {p_value:.4f} → {etat}")
-        except Exception as e:
-            print(f"❌ Erreur ADF pour le segment {i} : {e}")
\ No newline at end of file
+        ligne = executer_grille(construire_grille({i: serie_hp})).iloc[0]
+        if pd.isna(ligne["p_value"]):
+            print(f"❌ Erreur ADF pour le segment {i} : {ligne['erreur']}")
+        else:
+            _afficher(ligne)
@@ -0,0 +1,187 @@
+# src/tuning.py
+import os
+import time
+import shutil
+import tempfile
+import itertools
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from sklearn.ensemble import RandomForestRegressor
+from threadpoolctl import threadpool_limits
+
+from src.modeling import CONFIG_ENTRAINEMENT, preparer_donnees_segment, repartir_jobs, chemin_config_rf
+from src.selection import calculer_importances, selectionner
+from src.utils import ecrire_json_atomique
+
+# Grille des hyperparamètres de forêt ; le nombre d'arbres est la ressource des tours successifs
+ESPACE_RECHERCHE = {
+    "max_depth": [None, 3, 5, 8],
+    "min_samples_leaf": [1, 2, 4, 8],
+    "max_features": [1.0, "sqrt", 0.5],
+}
+RESSOURCES_ARBRES = (25, 50, 100, 200)
+
+
+def plis_temporels(n, n_plis=4, taille_min=20):
+    """Plis à origine croissante : apprentissage [0, début), validation [début, fin)."""
+    bornes = np.linspace(min(taille_min, n - n_plis), n, n_plis + 1).astype(int)
+    return [(int(debut), int(fin)) for debut, fin in zip(bornes[:-1], bornes[1:]) if fin > debut]
+
+
+def candidats_grille(n_candidats=27, graine=0):
+    """Échantillon sans remise de la grille `ESPACE_RECHERCHE`."""
+    grille = [dict(zip(ESPACE_RECHERCHE, valeurs)) for valeurs in itertools.product(*ESPACE_RECHERCHE.values())]
+    rng = np.random.default_rng(graine)
+    indices = rng.choice(len(grille), size=min(n_candidats, len(grille)), replace=False)
+    return [grille[k] for k in sorted(indices)]
+
+
+_DONNEES = {}
+
+
+def _donnees_partagees(chemin_X, chemin_y):
+    # Chaque processus projette une seule fois les matrices en mémoire (lecture seule, sans copie)
+    if chemin_X not in _DONNEES:
+        _DONNEES[chemin_X] = (np.load(chemin_X, mmap_mode="r"), np.load(chemin_y, mmap_mode="r"))
+    return _DONNEES[chemin_X]
+
+
+def evaluer_candidat(candidat, n_estimators, X, y, plis, random_state=0, echeance=None):
+    """Erreur quadratique moyenne de validation, moyennée sur les plis temporels.
+
+    `echeance` (horloge `time.time()`, commune aux processus) est vérifiée avant chaque
+    pli : passé ce délai, l'évaluation est abandonnée et renvoie None.
+    """
+    if isinstance(X, str):
+        X, y = _donnees_partagees(X, y)
+    erreurs = []
+    with threadpool_limits(limits=1):
+        for debut, fin in plis:
+            if echeance is not None and time.time() >= echeance:
+                return None
+            modele = RandomForestRegressor(n_estimators=n_estimators, random_state=random_state, n_jobs=1,
+                                           **candidat).fit(X[:debut], y[:debut])
+            erreurs.append(np.mean((modele.predict(X[debut:fin]) - y[debut:fin]) ** 2))
+    return float(np.mean(erreurs))
+
+
+def successive_halving(X, y, candidats, ressources=RESSOURCES_ARBRES, facteur=3, plis=None, n_jobs=1,
+                       budget_s=None, random_state=0):
+    """Recherche par divisions successives : à chaque tour, le tiers des meilleurs passe avec plus d'arbres.
+
+    Les matrices sont écrites une fois sur disque et projetées en mémoire par les
+    processus. Au-delà de `budget_s` secondes, les évaluations en cours sont
+    abandonnées et le meilleur candidat déjà évalué au plus haut tour est retenu.
+    Une évaluation ne s'interrompt qu'entre deux plis : le budget peut être dépassé
+    de la durée d'un ajustement de forêt.
+    """
+    debut = time.monotonic()
+    echeance = time.time() + budget_s if budget_s else None
+    plis = plis or plis_temporels(len(X))
+    n_processus, _ = repartir_jobs(n_jobs, len(candidats))
+
+    dossier = tempfile.mkdtemp(prefix="tuning_")
+    pool = ProcessPoolExecutor(max_workers=n_processus) if n_processus > 1 else None
+    try:
+        if pool:
+            chemin_X, chemin_y = os.path.join(dossier, "X.npy"), os.path.join(dossier, "y.npy")
+            np.save(chemin_X, np.ascontiguousarray(X, dtype=float))
+            np.save(chemin_y, np.ascontiguousarray(y, dtype=float))
+            donnees = (chemin_X, chemin_y)
+        else:
+            donnees = (np.asarray(X, dtype=float), np.asarray(y, dtype=float))
+
+        survivants = list(range(len(candidats)))
+        historique, meilleur, budget_atteint = [], None, False
+        for tour, n_estimators in enumerate(ressources):
+            scores = {}
+            if pool:
+                futures = {pool.submit(evaluer_candidat, candidats[k], n_estimators, *donnees, plis,
+                                       random_state, echeance): k for k in survivants}
+                en_cours = set(futures)
+                while en_cours:
+                    restant = None if echeance is None else max(0.0, echeance - time.time())
+                    termines, en_cours = wait(en_cours, timeout=restant, return_when=FIRST_COMPLETED)
+                    for future in termines:
+                        scores[futures[future]] = future.result()
+                    if echeance is not None and time.time() >= echeance and en_cours:
+                        # Les évaluations déjà lancées s'arrêtent d'elles-mêmes au pli suivant
+                        for future in en_cours:
+                            future.cancel()
+                        budget_atteint = True
+                        break
+            else:
+                for k in survivants:
+                    scores[k] = evaluer_candidat(candidats[k], n_estimators, *donnees, plis, random_state, echeance)
+                    if echeance is not None and time.time() >= echeance:
+                        budget_atteint = True
+                        break
+
+            # Évaluations interrompues par le budget : sans score
+            scores = {k: score for k, score in scores.items() if score is not None}
+            budget_atteint = budget_atteint or len(scores) < len(survivants)
+
+            for k, score in scores.items():
+                historique.append({"tour": tour, "n_estimators": n_estimators, **candidats[k], "mse_cv": score})
+            if scores:
+                k_meilleur = min(scores, key=scores.get)
+                meilleur = {"hyperparametres": {"n_estimators": n_estimators, **candidats[k_meilleur]},
+                            "mse_cv": scores[k_meilleur], "tour": tour}
+            if budget_atteint or len(scores) <= 1:
+                break
+            classes = sorted(scores, key=scores.get)
+            survivants = classes[:max(1, int(np.ceil(len(classes) / facteur)))]
+    finally:
+        if pool:
+            pool.shutdown(wait=True, cancel_futures=True)
+        shutil.rmtree(dossier, ignore_errors=True)
+
+    if meilleur is None:
+        raise RuntimeError("budget épuisé avant la première évaluation")
+    meilleur.update({"n_evaluations": len(historique), "duree_s": round(time.monotonic() - debut, 2),
+                     "budget_atteint": budget_atteint})
+    return meilleur, historique
+
+
+def optimiser_hyperparametres(segments_dict, output_dir="models", n_jobs=1, budget_s=300, n_candidats=27,
+                              config=CONFIG_ENTRAINEMENT):
+    """Optimise la forêt de chaque segment sur ses variables sélectionnées et enregistre la configuration.
+
+    Le budget total est partagé entre les segments restants. La configuration
+    retenue est écrite dans `rf/segment_{i}_config.json` et entre dans l'empreinte
+    d'entraînement : le segment est réentraîné avec ces hyperparamètres.
+    """
+    print(f"\n🎛️ Optimisation des forêts : {n_candidats} candidats, budget {budget_s} s")
+    debut = time.monotonic()
+    candidats = candidats_grille(n_candidats, graine=config["random_state"])
+    selection = config["selection"]
+    resultats = {}
+    segments = list(segments_dict.items())
+    for rang, (i, df_seg) in enumerate(segments):
+        try:
+            budget_segment = None
+            if budget_s:
+                budget_segment = (budget_s - (time.monotonic() - debut)) / (len(segments) - rang)
+                if budget_segment <= 0:
+                    print(f"⏱️ Segment {i} – budget épuisé, configuration inchangée")
+                    continue
+            df_enrichi, X, y = preparer_donnees_segment(df_seg)
+            importances, _ = calculer_importances(
+                X, y, strategie=selection["strategie"], n_estimators=config["n_estimators"],
+                random_state=config["random_state"], seuil=selection["seuil"], **selection["options"]
+            )
+            top_vars = selectionner(importances, selection["seuil"])
+            # Plis temporels : lignes triées par date, comme pour le backtest
+            df_enrichi = df_enrichi.sort_values("date", kind="stable")
+            X_sel = df_enrichi[top_vars].fillna(0).to_numpy(dtype=float)
+            y_sel = df_enrichi["Indicateur_moyen_Brut"].to_numpy(dtype=float)
+
+            meilleur, _ = successive_halving(X_sel, y_sel, candidats, n_jobs=n_jobs,
+                                             budget_s=budget_segment, random_state=config["random_state"])
+            ecrire_json_atomique(meilleur, chemin_config_rf(output_dir, i))
+            resultats[i] = meilleur
+            print(f"✅ Segment {i} – {meilleur['hyperparametres']} (MSE CV = {meilleur['mse_cv']:.5f}, "
+                  f"{meilleur['n_evaluations']} évaluations en {meilleur['duree_s']} s)")
+        except Exception as e:
+            print(f"❌ Segment {i} – erreur : {e}")
+    return resultats
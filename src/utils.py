@@ -1,9 +1,48 @@
 import os
-import matplotlib.pyplot as plt
-
-def save_plot(fig, name, folder="outputs/figures"):
-    """Sauvegarde un graphique matplotlib avec un nom donné dans le dossier spécifié."""
-    os.makedirs(folder, exist_ok=True)
-    path = os.path.join(folder, f"{name}.png")
-    fig.savefig(path)
-    plt.close(fig)  # pour libérer la mémoire
+import json
+import hashlib
+import tempfile
+import pandas as pd
+
+# joblib est importé à l'usage : ce module est chargé par toutes les commandes de main.py
+
+def dump_atomique(objet, path):
+    """Écrit un objet joblib via un fichier temporaire puis un renommage atomique."""
+    import joblib
+    dossier = os.path.dirname(path) or "."
+    os.makedirs(dossier, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=dossier, prefix=".tmp_", suffix=os.path.basename(path))
+    os.close(fd)
+    try:
+        joblib.dump(objet, tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+def hash_dataframe(df):
+    """Empreinte SHA-256 du contenu d'un DataFrame (colonnes et valeurs, index ignoré)."""
+    h = hashlib.sha256()
+    h.update("|".join(map(str, df.columns)).encode())
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+def hash_objet(objet):
+    """Empreinte SHA-256 d'un objet sérialisable en JSON (clés triées)."""
+    return hashlib.sha256(json.dumps(objet, sort_keys=True, default=str).encode()).hexdigest()
+
+def lire_json(path, defaut=None):
+    if not os.path.exists(path):
+        return defaut
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def ecrire_json_atomique(objet, path):
+    """Écrit un fichier JSON via un fichier temporaire puis un renommage atomique."""
+    dossier = os.path.dirname(path) or "."
+    os.makedirs(dossier, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=dossier, prefix=".tmp_", suffix=".json")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(objet, f, indent=2, ensure_ascii=False, default=str)
+    os.replace(tmp, path)
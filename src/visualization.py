@@ -1,23 +1,25 @@
-import os
-import matplotlib.pyplot as plt
 import pandas as pd
 
-def visualiser_predictions(results_scenarios, segments, modele="RF"):
-    os.makedirs("outputs/predictions", exist_ok=True)
-    couleurs = {"CENT": "blue", "PESS": "red", "OPT": "green"}
+from src.registry import get_registre
+from src.plotting import FileFigures, bornes_bande
+
+def visualiser_predictions(results_scenarios, segments, modele="RF", model_dir="models", figures=None):
+    # Sans file fournie, les figures sont tracées immédiatement
+    file_locale = figures is None
+    figures = FileFigures() if file_locale else figures
 
     if isinstance(segments, list):
         segments_dict = {i + 1: df.copy() for i, df in enumerate(segments)}
     else:
         segments_dict = segments
 
-    for seg in range(1, 6):
-        fig, ax = plt.subplots(figsize=(12, 5))
-        df_hist = segments_dict[seg].copy()
-        df_hist["Indicateur_moyen_Brut"] = (
-            df_hist["Indicateur_moyen_Brut"]
-            .astype(str).str.replace(",", ".").astype(float)
-        )
+    # Segments ayant un modèle entraîné dans le registre
+    segments_modeles = get_registre(model_dir).segments_disponibles() or sorted(segments_dict)
+
+    for seg in segments_modeles:
+        if seg not in segments_dict:
+            continue
+        df_hist = segments_dict[seg]
         df_hist = df_hist.dropna(subset=["Indicateur_moyen_Brut"]).reset_index(drop=True)
         if "date" not in df_hist.columns:
             nb_hist = len(df_hist)
@@ -25,11 +27,8 @@ def visualiser_predictions(results_scenarios, segments, modele="RF"):
         df_hist["trimestre"] = pd.to_datetime(df_hist["date"]).dt.to_period("Q").astype(str)
         df_hist = df_hist.sort_values("date")
 
-        ax.plot(df_hist["trimestre"],
-                df_hist["Indicateur_moyen_Brut"],
-                label="Historique réel", marker="o", linestyle="--", color="black")
-
-        for scenario in ["CENT", "PESS", "OPT"]:
+        predictions = []
+        for scenario in results_scenarios:
             try:
                 df_pred = results_scenarios[scenario][seg].copy()
                 df_pred["date"] = pd.to_datetime(df_pred["date"])
@@ -40,20 +39,22 @@ def visualiser_predictions(results_scenarios, segments, modele="RF"):
                 if y_col not in df_pred.columns:
                     raise ValueError(f"Colonne {y_col} non trouvée.")
 
-                ax.plot(df_pred["trimestre"], df_pred[y_col],
-                        label=f"{scenario} – {modele.upper()}",
-                        marker="x", linestyle="-", color=couleurs.get(scenario, None))
+                df_scen = pd.DataFrame({"scenario": scenario, "trimestre": df_pred["trimestre"], "CCF": df_pred[y_col]})
+                # Bande d'incertitude du modèle : intervalle de prédiction OLS de préférence, sinon percentiles
+                for prefixe in (f"{y_col}_ip", f"{y_col}_p"):
+                    bornes = bornes_bande(df_pred.columns, prefixe)
+                    if bornes is not None:
+                        df_scen["CCF_bas"], df_scen["CCF_haut"] = df_pred[bornes[1]], df_pred[bornes[3]]
+                        break
+                predictions.append(df_scen)
             except Exception as e:
                 print(f"Segment {seg} – Scénario {scenario} erreur : {e}")
 
-        ax.set_title(f"Segment {seg} – CCF ({modele.upper()}) : Réel + Prédictions")
-        ax.set_xlabel("Trimestre")
-        ax.set_ylabel("CCF")
-        ax.grid(True)
-        ax.legend()
-        plt.xticks(rotation=45)
-        plt.tight_layout()
-        path = f"outputs/predictions/segment_{seg}_predictions_{modele.upper()}.png"
-        plt.savefig(path)
-        plt.close()
-        print(f"Figure enregistrée : {path}")
+        df_pred = (pd.concat(predictions, ignore_index=True) if predictions
+                   else pd.DataFrame(columns=["scenario", "trimestre", "CCF"]))
+        figures.ajouter("historique", f"outputs/predictions/segment_{seg}_predictions_{modele.upper()}.png",
+                        df_hist=df_hist[["trimestre", "Indicateur_moyen_Brut"]].reset_index(drop=True),
+                        df_pred=df_pred, seg=seg, modele=modele.upper())
+
+    if file_locale:
+        figures.rendre()
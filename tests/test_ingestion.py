@@ -0,0 +1,18 @@
+# tests/test_ingestion.py
+import numpy as np
+import pandas as pd
+
+from src.ingestion import convertir_numerique
+
+
+def test_convertir_numerique_signale_valeurs_illisibles(capsys):
+    serie = pd.Series(["0,42", " 1,5 ", None, "", "n.d.", "1,2,3"], name="Indicateur_moyen_Brut")
+    valeurs = convertir_numerique(serie)
+    np.testing.assert_allclose(valeurs.to_numpy(), [0.42, 1.5, np.nan, np.nan, np.nan, np.nan])
+    sortie = capsys.readouterr().out
+    assert "Indicateur_moyen_Brut : 2 valeur(s)" in sortie and "'n.d.'" in sortie
+
+
+def test_convertir_numerique_silencieux_sans_erreur(capsys):
+    convertir_numerique(pd.Series(["0,42", None, ""], name="PIB"))
+    assert capsys.readouterr().out == ""
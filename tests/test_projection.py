@@ -0,0 +1,73 @@
+# tests/test_projection.py
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.features import enrichir_variables_macro
+from src.hp_filter import FiltreHPUnilateral, filtre_hp_unilateral
+from src.registry import RegistreModeles
+from src.scenario_projection import prepare_scenario, projeter_segment
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
+
+
+@pytest.fixture(scope="module")
+def scenario_enrichi():
+    rng = np.random.default_rng(0)
+    n = 20
+    df = pd.DataFrame({
+        "date": pd.date_range("2025-03-31", periods=n, freq="QE-DEC"),
+        "PIB_CENT": 1 + 0.3 * rng.standard_normal(n),
+        "IPL_CENT": 100 + np.cumsum(rng.standard_normal(n)),
+        "TCH_CENT": 7 + 0.1 * np.cumsum(rng.standard_normal(n)),
+        "Inflation_CENT": 2 + 0.2 * rng.standard_normal(n),
+    })
+    return enrichir_variables_macro(prepare_scenario(df, "CENT"))
+
+
+def test_modeles_compacts_avec_bandes(scenario_enrichi):
+    registre = RegistreModeles(MODEL_DIR)
+    for seg in registre.segments_disponibles():
+        df = projeter_segment(registre, seg, scenario_enrichi, incertitude=True)
+        for colonne in ["CCF_OLS_p5", "CCF_OLS_p95", "CCF_OLS_ip5", "CCF_OLS_ip95", "CCF_RF_p5", "CCF_RF_p95"]:
+            assert colonne in df.columns and df[colonne].notna().all()
+
+
+def test_covariance_reprise_des_modeles_statsmodels(scenario_enrichi, tmp_path, capsys):
+    # Modèles compacts exportés avant la covariance : seuls coefficients et forêt
+    shutil.copytree(MODEL_DIR, tmp_path / "models")
+    for seg in RegistreModeles(MODEL_DIR).segments_disponibles():
+        chemin = tmp_path / "models" / "compact" / f"segment_{seg}.npz"
+        with np.load(chemin) as d:
+            anciens = {k: d[k] for k in d.files if k not in ("ols_cov", "ols_scale", "ols_ddl", "ols_tirages")}
+        np.savez(chemin, **anciens)
+
+    complet, ancien = RegistreModeles(MODEL_DIR), RegistreModeles(str(tmp_path / "models"))
+    for seg in complet.segments_disponibles():
+        attendu = projeter_segment(complet, seg, scenario_enrichi, incertitude=True)
+        obtenu = projeter_segment(ancien, seg, scenario_enrichi, incertitude=True)
+        np.testing.assert_allclose(obtenu["CCF_OLS_ip95"], attendu["CCF_OLS_ip95"])
+        assert "CCF_OLS_p95" not in obtenu.columns
+        projeter_segment(ancien, seg, scenario_enrichi, incertitude=True)
+    sortie = capsys.readouterr().out
+    assert sortie.count("covariance OLS absente") == len(complet.segments_disponibles())
+    assert sortie.count("sans tirages bootstrap") == len(complet.segments_disponibles())
+
+
+def test_filtre_unilateral_prolonge_l_historique():
+    rng = np.random.default_rng(1)
+    ipl = 100 + np.cumsum(rng.standard_normal(60))
+    historique, scenario = ipl[:48], ipl[47:]
+    filtre = FiltreHPUnilateral()
+    filtre.mettre_a_jour(np.diff(historique))
+    df = pd.DataFrame({"date": pd.date_range("2021-12-31", periods=len(scenario), freq="QE-DEC"),
+                       "PIB_CENT": 1.0, "IPL_CENT": scenario, "TCH_CENT": 7.0, "Inflation_CENT": 2.0})
+
+    cycle = prepare_scenario(df, "CENT", filtre_unilateral=filtre)["IPL_diff1_hp"].to_numpy()
+    cycle_complet, _ = filtre_hp_unilateral(np.diff(ipl))
+    np.testing.assert_allclose(cycle, cycle_complet[-len(cycle):])
+    # Le filtre de l'historique n'est pas avancé : un second scénario repart du même état
+    np.testing.assert_allclose(prepare_scenario(df, "CENT", filtre_unilateral=filtre)["IPL_diff1_hp"], cycle)
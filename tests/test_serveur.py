@@ -0,0 +1,85 @@
+# tests/test_serveur.py
+import os
+import json
+import threading
+import urllib.error
+import urllib.request
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.instrumentation import JOURNAL
+from src.serveur import Metriques, MicroBatcher, ServiceProjection, ServeurHTTP, creer_handler, lire_requete
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models")
+
+
+def chemin_macro(n_trimestres=16, graine=0):
+    rng = np.random.default_rng(graine)
+    return {
+        "date": [d.strftime("%Y-%m-%d") for d in pd.date_range("2024-03-31", periods=n_trimestres, freq="QE-DEC")],
+        "PIB": (1 + 0.3 * rng.standard_normal(n_trimestres)).tolist(),
+        "IPL": (100 + np.cumsum(rng.standard_normal(n_trimestres))).tolist(),
+        "TCH": (7 + 0.1 * np.cumsum(rng.standard_normal(n_trimestres))).tolist(),
+        "Inflation": (2 + 0.2 * rng.standard_normal(n_trimestres)).tolist(),
+    }
+
+
+def poster(url, corps):
+    requete = urllib.request.Request(url, data=json.dumps(corps).encode(), method="POST",
+                                     headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(requete, timeout=30) as reponse:
+            return reponse.status, json.loads(reponse.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+@pytest.fixture(scope="module")
+def url_serveur():
+    metriques = Metriques()
+    # Délai de regroupement long : les requêtes envoyées ensemble tombent dans le même lot
+    batcher = MicroBatcher(ServiceProjection(MODEL_DIR), metriques, delai_max=0.3)
+    serveur = ServeurHTTP(("127.0.0.1", 0), creer_handler(batcher, metriques))
+    thread = threading.Thread(target=serveur.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{serveur.server_address[1]}/projeter"
+    serveur.shutdown()
+    serveur.server_close()
+
+
+@pytest.mark.parametrize("valeur", [None, float("nan"), float("inf")])
+def test_lire_requete_rejette_valeurs_non_finies(valeur):
+    corps = chemin_macro()
+    corps["PIB"][6] = valeur
+    with pytest.raises(ValueError, match="PIB"):
+        lire_requete(json.loads(json.dumps(corps)))
+
+
+def test_requete_invalide_sans_effet_sur_le_lot(url_serveur):
+    bonne, mauvaise = chemin_macro(graine=1), chemin_macro(graine=2)
+    mauvaise["PIB"][6] = None
+    mauvaise["TCH"] = [None] * len(mauvaise["TCH"])
+    _, seule = poster(url_serveur, bonne)
+
+    reponses = {}
+    threads = [threading.Thread(target=lambda nom=nom, corps=corps: reponses.__setitem__(nom, poster(url_serveur, corps)))
+               for nom, corps in (("bonne", bonne), ("mauvaise", mauvaise))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    code, contenu = reponses["mauvaise"]
+    assert code == 400 and "PIB" in contenu["erreur"] and "TCH" in contenu["erreur"]
+    code, contenu = reponses["bonne"]
+    assert code == 200
+    assert contenu == seule
+
+
+def test_serveur_sans_accumulation_de_mesures(url_serveur):
+    for graine in range(3):
+        code, _ = poster(url_serveur, chemin_macro(graine=graine))
+        assert code == 200
+    assert not JOURNAL.actif and JOURNAL.mesures == []